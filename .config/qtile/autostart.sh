@@ -1,7 +0,0 @@
-#! /bin/bash
-picom --experimental-backends &
-dunst &
-unclutter &
-flashfocus &
-/usr/bin/emacs --daemon &
-thunar --daemon &
@@ -1,17 +1,42 @@
 import os
 import socket
-import subprocess
+from custom.profiler import profiler  # first, so it can time the other imports
 from libqtile import qtile, bar, hook, layout, widget
 from libqtile.config import Click, Drag, Group, KeyChord, Key, Match, Screen
 from libqtile.lazy import lazy
 from libqtile.utils import guess_terminal
 from typing import List  # noqa: F401
-from custom.pomodoro import Pomodoro as CustomPomodoro
+from custom.backlight import Backlight, Brightness as CustomBrightness
+from custom.battery import Battery as CustomBattery, PowerSupply
+from custom.bluetooth import Bluetooth as CustomBluetooth, BluetoothState
+from custom.groupbox import SegmentedGroupBox as CustomGroupBox
+from custom.icons import IconTheme
+from custom.instrument import instrument
+from custom.layouticon import LayoutIcon as CustomLayoutIcon
+from custom.nordvpn import VpnMenu, status_text as nordvpn_status_text
+from custom.pill import Pill as CustomPill
+from custom.poll import PollService, PollText, Source
+from custom.pomodoro import Pomodoro as CustomPomodoro, PomodoroTimer
+from custom.procs import ProcessPicker
+from custom.reload import HotReload
+from custom.rules import WindowRules
+from custom.search import SearchLauncher
+from custom.supervisor import Service, Supervisor, bus_name, path_exists
+from custom.updates import UpdateCount, UpdateCounter
+from custom.volume import Mixer, Volume as CustomVolume
+from custom.wallpaper import Wallpaper
 from custom.windowname import WindowName as CustomWindowName
+from custom.wlan import Wireless, Wlan as CustomWlan
 
 mod = "mod4"                  # Sets mod key to SUPER/WINDOWS
 terminal = "alacritty"         # My terminal of choice
 dmscripts = "/home/tony/.dmscripts/"   # Root directory for dmenu scripts
+mixer = Mixer(device = "pulse")        # One amixer process for all volume keys
+backlight = Backlight(device = "amdgpu_bl0")   # Writes /sys/class/backlight directly
+process_picker = ProcessPicker(key = "cpu")    # Reads /proc itself, no ps
+search_launcher = SearchLauncher(browser = "firefox")   # Most used engines first
+vpn_menu = VpnMenu(on_change = lambda: poll_service.refresh("nordvpn"))   # Cached server lists
+hot_reload = HotReload()               # Applies theme and widget edits to the running bars
 
 keys = [
     ### The essentials
@@ -35,6 +60,10 @@ keys = [
         lazy.restart(),
         desc="Restart Qtile"
         ),
+    Key([mod, "control"], "r",
+        lazy.function(hot_reload.reload),
+        desc="Reload theme and widget settings"
+        ),
     Key([mod, "shift"], "q",
         lazy.shutdown(),
         desc="Shutdown Qtile"
@@ -136,7 +165,7 @@ keys = [
             desc="Take screenshots via dmenu"
             ),
         Key([], "k",
-            lazy.spawn(dmscripts+"dmkill"),
+            lazy.function(lambda qtile: process_picker.open()),
             desc="Kill processes via dmenu"
             ),
         Key([], "l",
@@ -148,44 +177,44 @@ keys = [
             desc="Search manpages in dmenu"
             ),
         Key([], "s",
-            lazy.spawn(dmscripts+"dmsearch"),
+            lazy.function(lambda qtile: search_launcher.open()),
             desc="Search various search engines via dmenu"
             ),
         Key([], "v",
-            lazy.spawn(dmscripts+"dmnord"),
+            lazy.function(lambda qtile: vpn_menu.open()),
             desc="Manage NordVPN connections"
             )
     ]),
     ### Thinkpad function keys
     Key([], "XF86AudioMute",
-        lazy.spawn("amixer -D pulse set Master toggle")
+        lazy.function(lambda qtile: mixer.toggle_mute())
         ),
     Key([], "XF86AudioLowerVolume",
-        lazy.spawn("amixer -D pulse set Master 5%-")
+        lazy.function(lambda qtile: mixer.change(-5))
         ),
     Key([mod], "XF86AudioLowerVolume",
-        lazy.spawn("amixer -D pulse set Master 1%-")
+        lazy.function(lambda qtile: mixer.change(-1))
         ),
     Key([], "XF86AudioRaiseVolume",
-        lazy.spawn("amixer -D pulse set Master 5%+")
+        lazy.function(lambda qtile: mixer.change(5))
         ),
     Key([mod], "XF86AudioRaiseVolume",
-        lazy.spawn("amixer -D pulse set Master 1%+")
+        lazy.function(lambda qtile: mixer.change(1))
         ),
     Key([], "XF86AudioMicMute",
         lazy.spawn("amixer -D pulse set Capture toggle")
         ),
     Key([], "XF86MonBrightnessUp",
-        lazy.spawn("brightnessctl -d 'amdgpu_bl0' set 5%+")
+        lazy.function(lambda qtile: backlight.change(5))
         ),
     Key([mod], "XF86MonBrightnessUp",
-        lazy.spawn("brightnessctl -d 'amdgpu_bl0' set 1%+")
+        lazy.function(lambda qtile: backlight.change(1))
         ),
     Key([], "XF86MonBrightnessDown",
-        lazy.spawn("brightnessctl -d 'amdgpu_bl0' set 5%-")
+        lazy.function(lambda qtile: backlight.change(-5))
         ),
     Key([mod], "XF86MonBrightnessDown",
-        lazy.spawn("brightnessctl -d 'amdgpu_bl0' set 1%-")
+        lazy.function(lambda qtile: backlight.change(-1))
         )
 ]
 
@@ -196,20 +225,6 @@ def update():
 def open_powermenu():
     qtile.cmd_spawn(dmscripts + "dmlogout")
 
-def nordvpn():
-    return (
-        subprocess.check_output(["./.config/qtile/get-nordvpn.sh"])
-        .decode("utf-8")
-        .strip()
-    )
-
-def bluetooth():
-    return (
-        subprocess.check_output(["./.config/qtile/system-bluetooth-bluetoothctl.sh"])
-        .decode("utf-8")
-        .strip()
-    )
-
 def toggle_bluetooth():
     qtile.cmd_spawn("./.config/qtile/system-bluetooth-bluetoothctl.sh --toggle")
 
@@ -221,7 +236,7 @@ def open_wifi_menu():
     qtile.cmd_spawn("networkmanager_dmenu")
 
 def open_vpn_menu():
-    qtile.cmd_spawn(dmscripts+"dmnord")
+    vpn_menu.open()
 
 # Define colors
 
@@ -258,26 +273,27 @@ workspaces = [
 
 groups = []
 
-for workspace in workspaces:
-    ws_matches = workspace["matches"] if "matches" in workspace else None
-    ws_layout = workspace["layout"] if "layout" in workspace else "monadtall"
-    groups.append(Group(workspace["name"], matches=ws_matches, layout=ws_layout))
-    keys.append(
-        Key(
-            [mod],
-            workspace["key"],
-            lazy.group[workspace["name"]].toscreen(),
-            desc="Focus this desktop",
+with profiler.span("keys and groups"):
+    for workspace in workspaces:
+        # Window placement is handled by window_rules in the client_new hook
+        ws_layout = workspace["layout"] if "layout" in workspace else "monadtall"
+        groups.append(Group(workspace["name"], layout=ws_layout))
+        keys.append(
+            Key(
+                [mod],
+                workspace["key"],
+                lazy.group[workspace["name"]].toscreen(),
+                desc="Focus this desktop",
+            )
         )
-    )
-    keys.append(
-        Key(
-            [mod, "shift"],
-            workspace["key"],
-            lazy.window.togroup(workspace["name"]),
-            desc="Move focused window to another group",
+        keys.append(
+            Key(
+                [mod, "shift"],
+                workspace["key"],
+                lazy.window.togroup(workspace["name"]),
+                desc="Move focused window to another group",
+            )
         )
-    )
 
 layout_theme = {
     "border_width": 2,
@@ -308,6 +324,44 @@ layouts = [
         layout.Floating(**layout_theme)
 ]
 
+### Shell-backed bar segments
+poll_service = PollService(max_concurrent = 2)
+
+poll_service.add(Source(
+    "nordvpn",
+    ["nordvpn", "status"],
+    interval = 5,
+    timeout = 5,
+    parser = nordvpn_status_text
+))
+
+icon_theme = IconTheme(theme_dir = "~/.icons/Nord-Icon")   # Indexed app icons for the window name
+update_counter = UpdateCounter(ttl = 1800)
+power_supply = PowerSupply(battery = "BAT0", low_percentage = 0.15)
+wireless = Wireless(interface = "wlan0")
+bluetooth_state = BluetoothState()
+pomodoro_timer = PomodoroTimer(
+    timer_visible = False,
+    notification_ready = lambda: services.is_ready("dunst")
+)
+
+### Startup services
+if "XDG_RUNTIME_DIR" in os.environ:
+    emacs_socket = os.path.join(os.environ["XDG_RUNTIME_DIR"], "emacs", "server")
+else:
+    emacs_socket = "/tmp/emacs{0}/server".format(os.getuid())
+
+services = Supervisor([
+    Service("picom", ["picom", "--experimental-backends"]),
+    Service("dunst", ["dunst"], ready = bus_name("org.freedesktop.Notifications")),
+    Service("unclutter", ["unclutter"]),
+    Service("flashfocus", ["flashfocus"], requires = ["picom"]),
+    # --fg-daemon keeps emacs in the foreground so it can be supervised
+    Service("emacs", ["/usr/bin/emacs", "--fg-daemon"],
+            ready = path_exists(emacs_socket), ready_timeout = 60),
+    Service("thunar", ["thunar", "--daemon"]),
+])
+
 prompt = "{0}@{1}".format(os.environ["USER"], socket.gethostname())
 
 ##### DEFAULT WIDGET SETTINGS #####
@@ -328,22 +382,13 @@ def separator(padding, size_percent = 50):
         size_percent = size_percent
     )
 
-def group_head():
-    return widget.TextBox(
-            text = "",
-            foreground = colors[14],
-            background = colors[0],
-            fontsize = 28,
-            padding = 0
-    )
-
-def group_tail():
-    return widget.TextBox(
-        text = "",
+def pill(*widgets, margin = 10):
+    return CustomPill(
+        *widgets,
         foreground = colors[14],
         background = colors[0],
         fontsize = 28,
-        padding = 0
+        margin = margin
     )
 
 group_box_settings = {
@@ -370,147 +415,157 @@ group_box_settings = {
 def init_widgets_list():
     widgets_list = [
         separator(20, 40),
-        group_head(),
-#        widget.GroupBox(**group_box_settings),
-        widget.GroupBox(
-            visible_groups = [""],
-            **group_box_settings
-        ),
-        widget.GroupBox(
-            visible_groups = ["", "", "", "", ""],
-            **group_box_settings
-        ),
-        widget.GroupBox(
-            visible_groups = ["", ""],
-            **group_box_settings
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.CurrentLayoutIcon(
-            custom_icon_paths = [os.path.expanduser("~/.config/qtile/icons")],
-            foreground = colors[2],
-            background = colors[14],
-            padding = -2,
-            scale = 0.55
-        ),
-        group_tail(),
-        separator(10),
-        widget.CheckUpdates(
+        pill(
+            CustomGroupBox(
+                clusters = [
+                    [""],
+                    ["", "", "", "", ""],
+                    ["", ""]
+                ],
+                **group_box_settings
+            )
+        ),
+        pill(
+            CustomLayoutIcon(
+                custom_icon_paths = [os.path.expanduser("~/.config/qtile/icons")],
+                foreground = colors[2],
+                background = colors[14],
+                padding = -2,
+                scale = 0.55
+            )
+        ),
+        UpdateCount(
+            provider = update_counter,
             background = colors[0],
             foreground = colors[3],
             fontsize = 16,
-            update_interval = 1800,
-            distro = "Arch_checkupdates",
             display_format = "⟳ {updates} Updates",
             mouse_callbacks = {"Button1": lambda: qtile.cmd_spawn(terminal+" -e sudo pacman -Syu")},
             padding = 5
         ),
-        widget.Spacer(),
-        group_head(),
-        CustomPomodoro(
-            background=colors[14],
-            fontsize=26,
-            color_active=colors[3],
-            color_break=colors[6],
-            color_inactive=colors[10],
-            timer_visible=False,
-            prefix_active="",
-            prefix_break="",
-            prefix_inactive="",
-            prefix_long_break="",
-            prefix_paused=""
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.TextBox(
-            text = " ",
-            foreground = colors[8],
-            background = colors[14],
-            font = "Font Awesome 5 Free Solid",
-            fontsize = 20
-        ),
-        widget.Volume(
-            background = colors[14],
-            foreground = colors[8],
-            fontsize = 16,
-            device = "pulse",
-            padding = 5
-            ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.GenPollText(
-            func = bluetooth,
-            background = colors[14],
-            foreground = colors[6],
-            fontsize = 16,
-            update_interval = 3,
-            mouse_callbacks = {
-                "Button1": toggle_bluetooth,
-                "Button3": open_bt_menu
-            }
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.Wlan(
+        CustomWindowName(
+            icon_theme = icon_theme,
+            background = colors[0],
             foreground = colors[7],
-            background = colors[14],
             fontsize = 16,
-            format = "  {essid}",
-            padding = 5,
-            mouse_callbacks = { "Button1": open_wifi_menu }
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.GenPollText(
-            func = nordvpn,
-            background = colors[14],
-            foreground = colors[11],
-            fontsize = 16,
-            update_interval = 3,
-            mouse_callbacks = {
-                "Button1": open_vpn_menu
-            }
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.Clock(
-            fontsize = 16,
-            format = "  %a, %b %d",
-            background = colors[14],
-            foreground = colors[5]
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.Clock(
-            fontsize = 16,
-            format = "  %I:%M %p",
-            background = colors[14],
-            foreground = colors[4]
-        ),
-        group_tail(),
-        separator(10),
-        group_head(),
-        widget.Battery(
-            background = colors[14],
-            foreground = colors[8],
-            fontsize = 16,
-            low_foreground = colors[3],
-            low_percentage = 0.15,
-            charge_char = "",
-            discharge_char = "",
-            emtpy_char = "",
-            format = "{char}  {percent:3.0%} ({hour:d}:{min:02d})",
-            padding = 5
+            max_chars = 60,
+            padding = 10
+        ),
+        pill(
+            CustomPomodoro(
+                provider=pomodoro_timer,
+                background=colors[14],
+                fontsize=26,
+                color_active=colors[3],
+                color_break=colors[6],
+                color_inactive=colors[10],
+                prefix_active="",
+                prefix_break="",
+                prefix_inactive="",
+                prefix_long_break="",
+                prefix_paused="",
+            )
+        ),
+        pill(
+            widget.TextBox(
+                text = " ",
+                foreground = colors[8],
+                background = colors[14],
+                font = "Font Awesome 5 Free Solid",
+                fontsize = 20
+            ),
+            CustomVolume(
+                provider = mixer,
+                background = colors[14],
+                foreground = colors[8],
+                fontsize = 16,
+                padding = 5
+                )
+        ),
+        pill(
+            widget.TextBox(
+                text = "\uf185 ",
+                foreground = colors[13],
+                background = colors[14],
+                font = "Font Awesome 5 Free Solid",
+                fontsize = 20
+            ),
+            CustomBrightness(
+                provider = backlight,
+                background = colors[14],
+                foreground = colors[13],
+                fontsize = 16,
+                padding = 5
+                )
+        ),
+        pill(
+            CustomBluetooth(
+                provider = bluetooth_state,
+                background = colors[14],
+                foreground = colors[6],
+                fontsize = 16,
+                color_on = colors[6][0],
+                color_off = colors[10][0],
+                mouse_callbacks = {
+                    "Button1": toggle_bluetooth,
+                    "Button3": open_bt_menu
+                }
+            )
+        ),
+        pill(
+            CustomWlan(
+                provider = wireless,
+                foreground = colors[7],
+                background = colors[14],
+                fontsize = 16,
+                display_format = "  {essid}",
+                padding = 5,
+                mouse_callbacks = { "Button1": open_wifi_menu }
+            )
+        ),
+        pill(
+            PollText(
+                provider = poll_service["nordvpn"],
+                background = colors[14],
+                foreground = colors[11],
+                fontsize = 16,
+                mouse_callbacks = {
+                    "Button1": open_vpn_menu
+                }
+            )
+        ),
+        pill(
+            widget.Clock(
+                fontsize = 16,
+                format = "  %a, %b %d",
+                background = colors[14],
+                foreground = colors[5]
+            )
+        ),
+        pill(
+            widget.Clock(
+                fontsize = 16,
+                format = "  %I:%M %p",
+                background = colors[14],
+                foreground = colors[4]
+            )
+        ),
+        pill(
+            CustomBattery(
+                provider = power_supply,
+                background = colors[14],
+                foreground = colors[8],
+                fontsize = 16,
+                low_foreground = colors[3],
+                low_percentage = 0.15,
+                charge_char = "",
+                discharge_char = "",
+                empty_char = "",
+                display_format = "{char}  {percent:3.0%} ({hour:d}:{min:02d})",
+                padding = 5
+            ),
+            margin = 20
         ),
-        group_tail(),
-        separator(20),
         widget.TextBox(
             text = "⏻",
             foreground = colors[13],
@@ -521,22 +576,46 @@ def init_widgets_list():
         ),
         separator(20)
         ]
-    return widgets_list
+    return instrument(widgets_list)
+
+def connected_monitors(drm_root = "/sys/class/drm"):
+    # Read from sysfs, the X server can't be asked while the config loads
+    count = 0
+    try:
+        outputs = os.listdir(drm_root)
+    except OSError:
+        outputs = []
+    for output in outputs:
+        try:
+            with open(os.path.join(drm_root, output, "status")) as f:
+                count += f.read().strip() == "connected"
+        except OSError:
+            pass
+    return max(count, 1)
+
+# Painted from a per-resolution cache after startup and whenever the screens
+# change, see startup_wallpaper()
+wallpaper = Wallpaper(
+    "~/Git/Personal/Dotfiles/backgrounds/dnord4k_dark.png",
+    mode = "fill"
+)
 
 def init_screens():
+    # The data comes from the providers above, so every extra bar only adds
+    # widgets that draw, not more polling.
     return [
         Screen(
-            wallpaper = "~/Git/Personal/Dotfiles/backgrounds/dnord4k_dark.png",
-            wallpaper_mode = "fill",
             top = bar.Bar(
                 widgets = init_widgets_list(),
                 size = 34,
             ),
         )
+        for _ in range(connected_monitors())
     ]
 
 if __name__ in ["config", "__main__"]:
-    screens = init_screens()
+    with profiler.span("init_screens"):
+        screens = init_screens()
 
 # Drag floating layouts.
 mouse = [
@@ -554,7 +633,7 @@ follow_mouse_focus = True
 bring_front_click = False
 cursor_warp = False
 
-floating_layout = layout.Floating(float_rules=[
+float_rules = [
     # Run the utility of `xprop` to see the wm class and name of an X client.
     *layout.Floating.default_float_rules,
     Match(wm_class='confirmreset'),  # gitk
@@ -563,26 +642,46 @@ floating_layout = layout.Floating(float_rules=[
     Match(wm_class='ssh-askpass'),  # ssh-askpass
     Match(title='branchdialog'),  # gitk
     Match(title='pinentry'),  # GPG key password entry
-])
+]
+
+# Indexed lookup over the workspace matches and float rules, built once
+window_rules = WindowRules(workspaces, float_rules)
+
+floating_layout = layout.Floating(float_rules=[Match(func=window_rules.floats)])
 auto_fullscreen = True
 focus_on_window_activation = "smart"
 
+@hook.subscribe.startup_complete
+def finish_profile():
+    # Give the first polls and draws a moment to happen before writing
+    if profiler.enabled:
+        qtile.call_later(5, profiler.finish)
+
+@hook.subscribe.startup_complete
+def startup_wallpaper():
+    wallpaper.paint(qtile)
+
+@hook.subscribe.screen_change
+def repaint_wallpaper(event):
+    # RandR changed the outputs and the root window may have been resized
+    # and cleared. qtile 0.17 keeps its screens until a restart, so this
+    # paints the current ones again from the cache.
+    wallpaper.paint(qtile)
+
 @hook.subscribe.startup_once
 def start_once():
-    home = os.path.expanduser("~")
-    subprocess.call([home + "/.config/qtile/autostart.sh"])
+    services.start()
 
 # Go to group when app opens on matched gropu
 @hook.subscribe.client_new
 def modify_window(client):
-    for group in groups:  # follow on auto-move
-        match = next((m for m in group.matches if m.compare(client)), None)
-        if match:
-            targetgroup = client.qtile.groups_map[
-                group.name
-            ]  # there can be multiple instances of a group
-            targetgroup.cmd_toscreen(toggle=False)
-            break
+    group_name = window_rules.group_for(client)
+    if group_name is not None:  # follow on auto-move
+        client.togroup(group_name)
+        targetgroup = client.qtile.groups_map[
+            group_name
+        ]  # there can be multiple instances of a group
+        targetgroup.cmd_toscreen(toggle=False)
 
 # XXX: Gasp! We're lying here. In fact, nobody really uses or cares about this
 # string besides java UI toolkits; you can see several discussions on the
@@ -0,0 +1,236 @@
+import asyncio
+import math
+import os
+
+from libqtile.log_utils import logger
+
+from custom.provider import Provider, ProviderText
+
+
+class Backlight(Provider):
+    """Brightness control by writing the backlight's sysfs file directly
+
+    ``max_brightness`` is read once and ``brightness`` is kept open, so a key
+    press is a single write instead of a brightnessctl process. Presses only
+    move the target; once per ``frame`` seconds the level steps towards it,
+    reaching it within ``ramp`` seconds (0 jumps straight there). The value
+    is the brightness in percent. ``sysfs_root`` can point at a fake
+    directory with ``<device>/brightness`` and ``<device>/max_brightness``.
+
+    Without write access to sysfs (no udev rule), the steps are set through
+    logind's ``Session.SetBrightness`` instead, or with ``brightnessctl``
+    when logind refuses.
+    """
+
+    def __init__(
+        self,
+        device="amdgpu_bl0",
+        sysfs_root="/sys/class/backlight",
+        frame=0.02,
+        ramp=0.15,
+        minimum=1,
+        brightnessctl="brightnessctl",
+    ):
+        Provider.__init__(self)
+        self.device = device
+        self.path = os.path.join(sysfs_root, device)
+        self.frame = frame
+        self.ramp = ramp
+        self.minimum = minimum
+        self.brightnessctl = brightnessctl
+
+        self.max_brightness = None
+        self.brightness = None
+        self.target = None
+        self.writable = False
+        self.use_logind = True
+        self._fd = None
+        self._failed = False
+        self._bus = None
+        self._writing = False
+        self._step = 1
+        self._handle = None
+
+    def start(self):
+        if self._open():
+            self.publish(self.percent())
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._bus is not None:
+            self._bus.disconnect()
+            self._bus = None
+
+    def _open(self):
+        if self._fd is not None:
+            return True
+        if self._failed:
+            # Already logged, a missing device doesn't come back.
+            return False
+        brightness = os.path.join(self.path, "brightness")
+        try:
+            with open(os.path.join(self.path, "max_brightness")) as f:
+                self.max_brightness = int(f.read())
+            try:
+                self._fd = os.open(brightness, os.O_RDWR)
+                self.writable = True
+            except PermissionError:
+                logger.info(
+                    "Backlight: %s is read-only, setting it through logind", brightness
+                )
+                self._fd = os.open(brightness, os.O_RDONLY)
+                self.writable = False
+            self.brightness = int(os.pread(self._fd, 32, 0))
+        except (OSError, ValueError) as e:
+            logger.error("Backlight: unable to open %s: %s", self.path, e)
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._failed = True
+            return False
+        self.target = self.brightness
+        return True
+
+    def _sync(self):
+        """Pick up changes made by others (firmware hotkeys, other tools)"""
+        if self._handle is not None or self._writing:
+            return
+        try:
+            brightness = int(os.pread(self._fd, 32, 0))
+        except (OSError, ValueError):
+            return
+        if brightness != self.brightness:
+            self.brightness = self.target = brightness
+            self.publish(self.percent())
+
+    def percent(self):
+        return round(self.brightness * 100 / self.max_brightness)
+
+    def change(self, percent):
+        """Move the target by ``percent`` of the full range"""
+        if not self._open():
+            return
+        self._sync()
+        delta = percent * self.max_brightness / 100
+        self.set(self.target + (math.ceil(delta) if delta > 0 else math.floor(delta)))
+
+    def set(self, value):
+        """Move the target to the raw brightness ``value``"""
+        if not self._open():
+            return
+        self.target = max(self.minimum, min(self.max_brightness, int(value)))
+        frames = max(1, self.ramp / self.frame)
+        self._step = max(1, math.ceil(abs(self.target - self.brightness) / frames))
+        self._schedule()
+
+    def _schedule(self):
+        if self._handle is None and not self._writing:
+            self._handle = asyncio.get_event_loop().call_later(self.frame, self._tick)
+
+    def _tick(self):
+        self._handle = None
+        if self._fd is None:
+            return
+        distance = self.target - self.brightness
+        if not distance:
+            return
+        if self.ramp > 0:
+            distance = max(-self._step, min(self._step, distance))
+        value = self.brightness + distance
+        if not self.writable:
+            self._writing = True
+            asyncio.ensure_future(self._write_fallback(value))
+            return
+        try:
+            os.pwrite(self._fd, b"%d\n" % value, 0)
+        except OSError as e:
+            logger.error("Backlight: unable to write %s: %s", self.path, e)
+            self.target = self.brightness
+            return
+        self._written(value)
+
+    def _written(self, value):
+        self.brightness = value
+        self.publish(self.percent())
+        if value != self.target:
+            self._schedule()
+
+    async def _write_fallback(self, value):
+        try:
+            if self.use_logind:
+                try:
+                    await self._set_logind(value)
+                except Exception as e:
+                    logger.warning(
+                        "Backlight: logind SetBrightness failed (%s), "
+                        "using %s from now on",
+                        e,
+                        self.brightnessctl,
+                    )
+                    self.use_logind = False
+            if not self.use_logind:
+                await self._set_brightnessctl(value)
+        except Exception as e:
+            logger.error("Backlight: unable to set %s: %s", self.path, e)
+            self.target = self.brightness
+            return
+        finally:
+            self._writing = False
+        self._written(value)
+
+    async def _set_logind(self, value):
+        from dbus_next import BusType, Message, MessageType
+        from dbus_next.aio import MessageBus
+
+        if self._bus is None:
+            self._bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+        reply = await self._bus.call(
+            Message(
+                destination="org.freedesktop.login1",
+                path="/org/freedesktop/login1/session/auto",
+                interface="org.freedesktop.login1.Session",
+                member="SetBrightness",
+                signature="ssu",
+                body=["backlight", self.device, value],
+            )
+        )
+        if reply.message_type == MessageType.ERROR:
+            raise RuntimeError(reply.error_name)
+
+    async def _set_brightnessctl(self, value):
+        proc = await asyncio.create_subprocess_exec(
+            self.brightnessctl,
+            "-d",
+            self.device,
+            "set",
+            str(value),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        if await proc.wait():
+            raise RuntimeError("%s exited with %d" % (self.brightnessctl, proc.returncode))
+
+
+class Brightness(ProviderText):
+    """Displays the brightness of a Backlight"""
+
+    defaults = [
+        ("step", 5, "Brightness change per mouse wheel step, in percent"),
+        ("fmt", "{}%", "Format of the brightness"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(Brightness.defaults)
+        self.add_callbacks(
+            {
+                "Button4": lambda: self.provider.change(self.step),
+                "Button5": lambda: self.provider.change(-self.step),
+            }
+        )
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import socket
+from collections import deque, namedtuple
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+from custom.instrument import redraw
+from custom.provider import Provider, ProviderText
+
+# linux/netlink.h, the kernel multicasts uevents to group 1
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_GROUP = 1
+
+BatteryStatus = namedtuple("BatteryStatus", "state percent seconds")
+
+
+def read_uevent(path):
+    """Return the POWER_SUPPLY_* fields of a supply's uevent file"""
+    fields = {}
+    with open(os.path.join(path, "uevent")) as f:
+        for line in f:
+            key, _, value = line.strip().partition("=")
+            if key.startswith("POWER_SUPPLY_"):
+                fields[key[13:]] = value
+    return fields
+
+
+def _number(fields, *names):
+    for name in names:
+        if name in fields:
+            try:
+                return int(fields[name])
+            except ValueError:
+                pass
+    return None
+
+
+class PowerSupply(Provider):
+    """Battery state read from sysfs, pushed on power_supply uevents
+
+    Plugging and unplugging is seen immediately through a netlink uevent
+    socket. Between events the battery is read on a schedule that depends on
+    its state: every ``idle_interval`` seconds when full on AC, every
+    ``low_interval`` seconds below twice ``low_percentage`` while discharging,
+    and every ``poll_interval`` seconds otherwise. The time estimate uses the
+    mean power draw of the last ``window`` seconds, so it doesn't jump with
+    every sample.
+
+    ``sysfs_root`` can point at a fake tree with ``<battery>/uevent`` files,
+    and ``uevent_socket`` at any datagram socket (e.g. one end of a
+    socketpair) to feed fake uevents instead of the kernel's.
+    """
+
+    def __init__(
+        self,
+        battery="BAT0",
+        sysfs_root="/sys/class/power_supply",
+        low_percentage=0.15,
+        poll_interval=60,
+        low_interval=10,
+        idle_interval=300,
+        window=300,
+        netlink=True,
+        uevent_socket=None,
+    ):
+        Provider.__init__(self)
+        self.path = os.path.join(sysfs_root, battery)
+        self.low_percentage = low_percentage
+        self.poll_interval = poll_interval
+        self.low_interval = low_interval
+        self.idle_interval = idle_interval
+        self.window = window
+        self.netlink = netlink
+
+        self.samples = deque()
+        self.reads = 0
+        self.uevents = 0
+        self._state = None
+        self._socket = uevent_socket
+        self._own_socket = False
+        self._handle = None
+        self._pending = None
+
+    def start(self):
+        if self._socket is None and self.netlink:
+            try:
+                self._socket = socket.socket(
+                    socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT
+                )
+                self._socket.bind((0, UEVENT_GROUP))
+                self._own_socket = True
+            except (OSError, AttributeError) as e:
+                logger.warning("PowerSupply: no uevents, polling only: %s", e)
+                self._socket = None
+        if self._socket is not None:
+            self._socket.setblocking(False)
+            asyncio.get_event_loop().add_reader(self._socket.fileno(), self._on_uevent)
+        self.read()
+
+    def stop(self):
+        for handle in (self._handle, self._pending):
+            if handle is not None:
+                handle.cancel()
+        self._handle = self._pending = None
+        if self._socket is not None:
+            asyncio.get_event_loop().remove_reader(self._socket.fileno())
+            if self._own_socket:
+                self._socket.close()
+                self._socket = None
+
+    def _on_uevent(self):
+        changed = False
+        while True:
+            try:
+                data = self._socket.recv(8192)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                logger.warning("PowerSupply: uevent socket failed: %s", e)
+                break
+            if b"SUBSYSTEM=power_supply" in data.split(b"\0"):
+                changed = True
+        if changed and self._pending is None:
+            # A plug event usually comes for the adapter and the battery at
+            # once, read only once for both.
+            self.uevents += 1
+            self._pending = asyncio.get_event_loop().call_soon(self.read)
+
+    def read(self):
+        self._pending = None
+        if self._handle is not None:
+            self._handle.cancel()
+        self.reads += 1
+        try:
+            status = self._status(read_uevent(self.path))
+        except OSError as e:
+            logger.warning("PowerSupply: unable to read %s: %s", self.path, e)
+            status = BatteryStatus("Unknown", 0.0, None)
+        self._handle = asyncio.get_event_loop().call_later(
+            self.next_interval(status), self.read
+        )
+        self.publish(status)
+
+    def next_interval(self, status):
+        if status.state in ("Full", "Not charging"):
+            return self.idle_interval
+        if status.state == "Discharging" and status.percent < 2 * self.low_percentage:
+            return self.low_interval
+        return self.poll_interval
+
+    def _status(self, fields):
+        state = fields.get("STATUS", "Unknown")
+        now = _number(fields, "ENERGY_NOW", "CHARGE_NOW")
+        full = _number(fields, "ENERGY_FULL", "CHARGE_FULL")
+        rate = _number(fields, "POWER_NOW", "CURRENT_NOW")
+
+        if now is not None and full:
+            percent = min(1.0, now / full)
+        else:
+            percent = (_number(fields, "CAPACITY") or 0) / 100
+
+        if state != self._state:
+            # The draw while charging says nothing about discharging.
+            self.samples.clear()
+            self._state = state
+        timestamp = monotonic()
+        if rate:
+            self.samples.append((timestamp, abs(rate)))
+        while self.samples and timestamp - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+        seconds = None
+        if self.samples and now is not None:
+            mean = sum(rate for _, rate in self.samples) / len(self.samples)
+            if state == "Discharging":
+                seconds = int(now / mean * 3600)
+            elif state == "Charging" and full:
+                seconds = int(max(0, full - now) / mean * 3600)
+        return BatteryStatus(state, percent, seconds)
+
+
+class Battery(ProviderText):
+    """Displays the state of a PowerSupply"""
+
+    defaults = [
+        ("charge_char", "^", "Character shown while charging"),
+        ("discharge_char", "V", "Character shown while discharging"),
+        ("empty_char", "x", "Character shown when empty"),
+        ("full_char", "=", "Character shown when full"),
+        ("unknown_char", "?", "Character shown when the state is unknown"),
+        (
+            "display_format",
+            "{char} {percent:2.0%} {hour:d}:{min:02d}",
+            "Format with {char}, {percent}, {hour} and {min}",
+        ),
+        ("low_percentage", 0.10, "Below this the low_foreground is used"),
+        ("low_foreground", "FF0000", "Font colour when low"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(Battery.defaults)
+
+    def on_value(self, value):
+        low = value.state == "Discharging" and value.percent <= self.low_percentage
+        colour = self.low_foreground if low else self.foreground
+        old_colour = self.layout.colour
+        self.layout.colour = colour
+        text = self.format(value)
+        if text != self.text:
+            self.update(text)
+        elif colour != old_colour:
+            redraw(self.cause, self.draw)
+
+    def format(self, value):
+        if value.state == "Charging":
+            char = self.charge_char
+        elif value.state == "Discharging":
+            char = self.empty_char if value.percent <= 0.01 else self.discharge_char
+        elif value.state in ("Full", "Not charging"):
+            char = self.full_char
+        else:
+            char = self.unknown_char
+
+        minutes = (value.seconds or 0) // 60
+        return self.display_format.format(
+            char=char,
+            percent=value.percent,
+            hour=minutes // 60,
+            min=minutes % 60,
+        )
@@ -0,0 +1,211 @@
+import asyncio
+
+from libqtile import pangocffi
+from libqtile.log_utils import logger
+
+from custom.provider import Provider, ProviderText
+
+BLUEZ = "org.bluez"
+ADAPTER_INTERFACE = "org.bluez.Adapter1"
+DEVICE_INTERFACE = "org.bluez.Device1"
+OBJECT_MANAGER_INTERFACE = "org.freedesktop.DBus.ObjectManager"
+
+MATCH_RULES = [
+    "type='signal',sender='org.bluez',interface='org.freedesktop.DBus.Properties',"
+    "member='PropertiesChanged'",
+    "type='signal',sender='org.bluez',interface='org.freedesktop.DBus.ObjectManager'",
+    "type='signal',sender='org.freedesktop.DBus',interface='org.freedesktop.DBus',"
+    "member='NameOwnerChanged',arg0='org.bluez'",
+]
+
+
+def _unpack(properties):
+    return {name: variant.value for name, variant in properties.items()}
+
+
+class BluetoothState(Provider):
+    """The bluetooth adapter state and the connected devices
+
+    A model of the BlueZ adapters and devices is fed by D-Bus signals, so
+    nothing is polled. The value is a ``(powered, devices)`` tuple of the
+    sorted names of the connected devices, published only when it changes.
+    ``bus_address`` can point at a private bus running a mock BlueZ service
+    instead of the system bus. dbus_next is only imported on start; without
+    it the adapter is shown as off.
+    """
+
+    def __init__(self, bus_address=None):
+        Provider.__init__(self)
+        self.bus_address = bus_address
+        self.bus = None
+        self.adapters = {}
+        self.devices = {}
+
+    def start(self):
+        asyncio.ensure_future(self._connect())
+
+    def stop(self):
+        if self.bus is not None:
+            self.bus.disconnect()
+            self.bus = None
+
+    async def _connect(self):
+        try:
+            from dbus_next import BusType, Message
+            from dbus_next.aio import MessageBus
+        except ImportError as e:
+            logger.error("Bluetooth: %s, no bluetooth state", e)
+            self.refresh()
+            return
+
+        if self.bus_address:
+            bus = MessageBus(bus_address=self.bus_address)
+        else:
+            bus = MessageBus(bus_type=BusType.SYSTEM)
+
+        try:
+            self.bus = await bus.connect()
+        except Exception:
+            logger.exception("Bluetooth: unable to connect to D-Bus")
+            self.refresh()
+            return
+
+        self.bus.add_message_handler(self._on_message)
+        for rule in MATCH_RULES:
+            await self.bus.call(
+                Message(
+                    destination="org.freedesktop.DBus",
+                    path="/org/freedesktop/DBus",
+                    interface="org.freedesktop.DBus",
+                    member="AddMatch",
+                    signature="s",
+                    body=[rule],
+                )
+            )
+
+        await self._load_objects()
+
+    async def _load_objects(self):
+        from dbus_next import Message, MessageType
+
+        self.adapters.clear()
+        self.devices.clear()
+
+        reply = await self.bus.call(
+            Message(
+                destination=BLUEZ,
+                path="/",
+                interface=OBJECT_MANAGER_INTERFACE,
+                member="GetManagedObjects",
+            )
+        )
+        if reply.message_type == MessageType.ERROR:
+            # BlueZ is not running, NameOwnerChanged tells us when it is.
+            logger.info("Bluetooth: %s", reply.error_name)
+        else:
+            for path, interfaces in reply.body[0].items():
+                self._add_interfaces(path, interfaces)
+
+        self.refresh()
+
+    def _add_interfaces(self, path, interfaces):
+        if ADAPTER_INTERFACE in interfaces:
+            self.adapters[path] = _unpack(interfaces[ADAPTER_INTERFACE])
+        if DEVICE_INTERFACE in interfaces:
+            self.devices[path] = _unpack(interfaces[DEVICE_INTERFACE])
+
+    def _on_message(self, message):
+        from dbus_next import MessageType
+
+        if message.message_type != MessageType.SIGNAL:
+            return
+
+        if message.member == "PropertiesChanged":
+            interface, changed, invalidated = message.body
+            if interface == ADAPTER_INTERFACE:
+                model = self.adapters.setdefault(message.path, {})
+            elif interface == DEVICE_INTERFACE:
+                model = self.devices.setdefault(message.path, {})
+            else:
+                return
+            model.update(_unpack(changed))
+            for name in invalidated:
+                model.pop(name, None)
+
+        elif message.member == "InterfacesAdded":
+            path, interfaces = message.body
+            self._add_interfaces(path, interfaces)
+
+        elif message.member == "InterfacesRemoved":
+            path, interfaces = message.body
+            if ADAPTER_INTERFACE in interfaces:
+                self.adapters.pop(path, None)
+            if DEVICE_INTERFACE in interfaces:
+                self.devices.pop(path, None)
+
+        elif message.member == "NameOwnerChanged":
+            _, _, new_owner = message.body
+            if new_owner:
+                asyncio.ensure_future(self._load_objects())
+                return
+            self.adapters.clear()
+            self.devices.clear()
+
+        else:
+            return
+
+        self.refresh()
+
+    @property
+    def powered(self):
+        return any(adapter.get("Powered") for adapter in self.adapters.values())
+
+    def connected_devices(self):
+        return sorted(
+            device.get("Alias") or device.get("Name") or device.get("Address", "")
+            for device in self.devices.values()
+            if device.get("Connected")
+        )
+
+    def refresh(self):
+        self.publish((self.powered, tuple(self.connected_devices())))
+
+
+class Bluetooth(ProviderText):
+    """Displays the state of a BluetoothState"""
+
+    defaults = [
+        ("icon", "\uf293", "Icon shown in front of the device list"),
+        ("icon_font", "Font Awesome 5 Brands", "Font used for the icon"),
+        ("color_on", "#81a1c1", "Colour when the adapter is powered"),
+        ("color_off", "#4c566a", "Colour when the adapter is powered off"),
+        ("off_text", "Off", "Text shown when the adapter is powered off"),
+        ("device_separator", ", ", "Separator between connected devices"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(Bluetooth.defaults)
+
+    def format(self, value):
+        powered, devices = value
+        if not powered:
+            return (
+                "<span font_desc='{font}' foreground='{color}'>{icon}</span> "
+                "<span foreground='{color}'>{off}</span>"
+            ).format(
+                font=self.icon_font,
+                color=self.color_off,
+                icon=self.icon,
+                off=self.off_text,
+            )
+
+        devices = self.device_separator.join(
+            "<span foreground='{}'>{}</span>".format(
+                self.color_on, pangocffi.markup_escape_text(alias)
+            )
+            for alias in devices
+        )
+        return "<span font_desc='{}' foreground='{}'>{}</span>{}".format(
+            self.icon_font, self.color_on, self.icon, devices
+        )
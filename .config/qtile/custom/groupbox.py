@@ -0,0 +1,208 @@
+from libqtile import hook
+from libqtile.log_utils import logger
+from libqtile.widget import GroupBox
+
+from custom.instrument import redraw
+
+# box_style() and draw() follow GroupBox.draw() of this qtile version and
+# call the GroupBox methods below. When one of them is missing the widget
+# says so and draws like a plain GroupBox instead of breaking.
+QTILE_VERSION = "0.17.0"
+GROUPBOX_METHODS = ("drawbox", "box_width", "group_has_urgent")
+
+
+class SegmentedGroupBox(GroupBox):
+    """A GroupBox that shows its groups as visually separated clusters
+
+    One widget replaces several GroupBox instances with disjoint
+    ``visible_groups``. Box positions are laid out once and only recomputed
+    when the group list or labels change. Hooks repaint just the boxes whose
+    state changed instead of redrawing the whole bar.
+    """
+
+    defaults = [
+        ("clusters", [], "List of lists of group names, one list per cluster"),
+        ("cluster_gap", 6, "Space between two clusters"),
+    ]
+
+    def __init__(self, **config):
+        GroupBox.__init__(self, **config)
+        self.add_defaults(SegmentedGroupBox.defaults)
+        self.boxes = []
+        self._layout_key = None
+        self._painted = {}
+        self._clusters_length = 0
+        self.compatible = True
+
+    def _configure(self, qtile, bar):
+        missing = [name for name in GROUPBOX_METHODS if not hasattr(GroupBox, name)]
+        if missing:
+            logger.warning(
+                "SegmentedGroupBox: written for qtile %s, GroupBox has no %s, "
+                "drawing a plain GroupBox",
+                QTILE_VERSION,
+                ", ".join(missing),
+            )
+            self.compatible = False
+        GroupBox._configure(self, qtile, bar)
+
+    @property
+    def groups(self):
+        groups = {group.name: group for group in self.qtile.groups}
+        return [
+            groups[name]
+            for cluster in self.clusters
+            for name in cluster
+            if name in groups
+        ]
+
+    def setup_hooks(self):
+        hook.subscribe.client_managed(self.refresh)
+        hook.subscribe.client_urgent_hint_changed(self.refresh)
+        hook.subscribe.client_killed(self.refresh)
+        hook.subscribe.setgroup(self.refresh)
+        hook.subscribe.group_window_add(self.refresh)
+        hook.subscribe.current_screen_change(self.refresh)
+        hook.subscribe.changegroup(self.refresh)
+
+    def refresh(self, *args, **kwargs):
+        if not self.compatible:
+            redraw("bar:SegmentedGroupBox", self.bar.draw)
+            return
+        # Like ProviderText.update: the bar only lays the widgets out again
+        # when the length changed, and a widget it hasn't placed yet is left
+        # for the bar to draw.
+        old_length = self._clusters_length
+        self.update_layout()
+        if self._clusters_length != old_length:
+            redraw("bar:SegmentedGroupBox", self.bar.draw)
+        elif self.offsetx is not None:
+            self.draw()
+
+    def update_layout(self):
+        """Recompute box positions, return True if they changed"""
+        groups = {group.name: group for group in self.qtile.groups}
+        key = tuple(
+            tuple(
+                (name, groups[name].label) for name in cluster if name in groups
+            )
+            for cluster in self.clusters
+        )
+        if key == self._layout_key:
+            return False
+
+        self._layout_key = key
+        self._painted = {}
+        self.boxes = []
+        # Like GroupBox, every box is as wide as the widest label.
+        visible = [groups[name] for cluster in key for name, _ in cluster]
+        width = self.box_width(visible) if visible else 0
+        x = self.margin_x
+        for cluster in key:
+            if not cluster:
+                continue
+            if self.boxes:
+                x += self.cluster_gap - self.spacing
+            for name, _ in cluster:
+                self.boxes.append((groups[name], x, width))
+                x += width + self.spacing
+        self._clusters_length = x - self.spacing + self.margin_x if self.boxes else 0
+        return True
+
+    def reconfigure(self, changes):
+        """Called by HotReload after ``changes`` were set on this widget"""
+        # Lay the boxes out again and repaint all of them.
+        self._layout_key = None
+
+    def calculate_length(self):
+        if not self.compatible:
+            return GroupBox.calculate_length(self)
+        self.update_layout()
+        return self._clusters_length
+
+    def get_clicked_group(self, x, y):
+        if not self.compatible:
+            return GroupBox.get_clicked_group(self, x, y)
+        for group, offset, width in self.boxes:
+            if offset - self.spacing / 2.0 <= x <= offset + width + self.spacing / 2.0:
+                return group
+        return None
+
+    def box_style(self, g):
+        is_block = self.highlight_method == "block"
+        is_line = self.highlight_method == "line"
+        to_highlight = False
+
+        if self.group_has_urgent(g) and self.urgent_alert_method == "text":
+            text_color = self.urgent_text
+        elif g.windows:
+            text_color = self.active
+        else:
+            text_color = self.inactive
+
+        if g.screen:
+            if self.highlight_method == "text":
+                border = self.bar.background
+                text_color = self.this_current_screen_border
+            else:
+                if self.block_highlight_text_color:
+                    text_color = self.block_highlight_text_color
+                if self.bar.screen.group.name == g.name:
+                    if self.qtile.current_screen == self.bar.screen:
+                        border = self.this_current_screen_border
+                        to_highlight = True
+                    else:
+                        border = self.this_screen_border
+                else:
+                    if self.qtile.current_screen == g.screen:
+                        border = self.other_current_screen_border
+                    else:
+                        border = self.other_screen_border
+        elif self.group_has_urgent(g) and self.urgent_alert_method in (
+            "border",
+            "block",
+            "line",
+        ):
+            border = self.urgent_border
+            if self.urgent_alert_method == "block":
+                is_block = True
+            elif self.urgent_alert_method == "line":
+                is_line = True
+        else:
+            border = self.background or self.bar.background
+
+        return (g.label, border, text_color, is_block, is_line, to_highlight)
+
+    def draw(self):
+        if not self.compatible:
+            GroupBox.draw(self)
+            return
+        self.update_layout()
+        background = self.background or self.bar.background
+        if not self._painted:
+            self.drawer.clear(background)
+
+        for group, x, width in self.boxes:
+            style = self.box_style(group)
+            if self._painted.get(group.name) == style:
+                continue
+            if group.name in self._painted:
+                self.drawer.set_source_rgb(background)
+                self.drawer.ctx.rectangle(x, 0, width, self.bar.height)
+                self.drawer.ctx.fill()
+            label, border, text_color, is_block, is_line, to_highlight = style
+            self.drawbox(
+                x,
+                label,
+                border,
+                text_color,
+                highlight_color=self.highlight_color,
+                width=width,
+                rounded=self.rounded,
+                block=is_block,
+                line=is_line,
+                highlighted=to_highlight,
+            )
+            self._painted[group.name] = style
+
+        self.drawer.draw(offsetx=self.offsetx, width=self.width)
@@ -0,0 +1,254 @@
+"""Load config.py against stubbed libqtile objects and time it
+
+Run from ~/.config/qtile, no display or qtile installation needed:
+
+    python -m custom.harness [--runs N] [--trace trace.json] [config.py]
+
+Every run imports the config (and the custom package) from scratch with the
+stubs below in place of libqtile, dbus_next and cairocffi, then the best and
+median load times are printed. With --trace the last run is profiled and
+written as a trace file, and its summary is printed.
+"""
+import argparse
+import enum
+import importlib.util
+import logging
+import os
+import statistics
+import sys
+import types
+from time import perf_counter
+
+
+class Stub:
+    """Stands in for any libqtile object: accepts every call and attribute"""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __getitem__(self, key):
+        return Stub()
+
+    def __iter__(self):
+        return iter(())
+
+
+class Match(Stub):
+    """libqtile.config.Match with the compare() of qtile 0.17.0"""
+
+    def __init__(self, **rules):
+        Stub.__init__(self, **rules)
+        self._rules = rules
+
+    def compare(self, client):
+        for name, rule in self._rules.items():
+            if name == "func":
+                return rule(client)
+            if name == "title":
+                value = client.name
+            elif name == "wm_instance_class":
+                wm_class = client.window.get_wm_class()
+                if not wm_class:
+                    return False
+                value = wm_class[0]
+            elif name == "role":
+                value = client.window.get_wm_window_role()
+            else:
+                value = getattr(client.window, "get_" + name)()
+            if value is None:
+                return False
+
+            if name == "net_wm_pid":
+                matched = value == rule
+            elif name == "wm_class":
+                match = getattr(rule, "match", lambda v: v in rule)
+                matched = value and any(match(v) for v in value)
+            else:
+                matched = getattr(rule, "match", lambda v: rule in v)(value)
+            if not matched:
+                return False
+        return True
+
+
+class Floating(Stub):
+    default_float_rules = []
+
+
+class Configurable:
+    def __init__(self, *args, **config):
+        self._user_config = config
+        for name, value in config.items():
+            setattr(self, name, value)
+
+    def add_defaults(self, defaults):
+        for name, value, _ in defaults:
+            if name not in self._user_config:
+                setattr(self, name, value)
+
+
+class _Widget(Configurable):
+    offsetx = None
+    offsety = None
+
+    @property
+    def offset(self):
+        return self.offsetx
+
+    def add_callbacks(self, callbacks):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+
+# The hooks of qtile 0.17.0, subscribing to any other fails like it would there.
+HOOKS = (
+    "startup_once startup startup_complete shutdown restart setgroup addgroup "
+    "delgroup changegroup focus_change float_change group_window_add client_new "
+    "client_managed client_killed client_focus client_mouse_enter "
+    "client_name_updated client_urgent_hint_changed layout_change "
+    "net_wm_icon_change selection_notify selection_change screen_change "
+    "current_screen_change enter_chord leave_chord"
+).split()
+
+
+class _Subscribe:
+    def __getattr__(self, name):
+        if name not in HOOKS:
+            raise AttributeError("'Subscribe' object has no attribute %r" % name)
+        return lambda func: func
+
+
+class _StubModule(types.ModuleType):
+    """Module whose unknown attributes are Stub subclasses"""
+
+    def __init__(self, name, base=Stub, **attrs):
+        types.ModuleType.__init__(self, name)
+        self.__path__ = []
+        self._base = base
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = type(name, (self._base,), {})
+        setattr(self, name, cls)
+        return cls
+
+
+class MessageType(enum.Enum):
+    METHOD_CALL = 1
+    METHOD_RETURN = 2
+    ERROR = 3
+    SIGNAL = 4
+
+
+class BusType(enum.Enum):
+    SESSION = 1
+    SYSTEM = 2
+
+
+def stub_modules():
+    base = _StubModule(
+        "libqtile.widget.base",
+        base=_Widget,
+        _Widget=_Widget,
+        _TextBox=type("_TextBox", (_Widget,), {}),
+        ThreadPoolText=type("ThreadPoolText", (_Widget,), {}),
+        ORIENTATION_HORIZONTAL=0,
+    )
+    widget = _StubModule("libqtile.widget", base=_Widget)
+    widget.base = base
+    libqtile = _StubModule(
+        "libqtile",
+        qtile=Stub(),
+        bar=_StubModule("libqtile.bar", STRETCH=-1, CALCULATED=-2),
+        hook=_StubModule("libqtile.hook", subscribe=_Subscribe()),
+        layout=_StubModule("libqtile.layout", Floating=Floating),
+        widget=widget,
+        pangocffi=_StubModule(
+            "libqtile.pangocffi", markup_escape_text=lambda text: text
+        ),
+    )
+    modules = {
+        "libqtile": libqtile,
+        "libqtile.bar": libqtile.bar,
+        "libqtile.hook": libqtile.hook,
+        "libqtile.layout": libqtile.layout,
+        "libqtile.widget": widget,
+        "libqtile.widget.base": base,
+        "libqtile.pangocffi": libqtile.pangocffi,
+        "libqtile.config": _StubModule("libqtile.config", Match=Match),
+        "libqtile.lazy": _StubModule("libqtile.lazy", lazy=Stub()),
+        "libqtile.utils": _StubModule(
+            "libqtile.utils", guess_terminal=lambda: "xterm"
+        ),
+        "libqtile.log_utils": _StubModule(
+            "libqtile.log_utils", logger=logging.getLogger("libqtile")
+        ),
+        "dbus_next": _StubModule(
+            "dbus_next", MessageType=MessageType, BusType=BusType
+        ),
+        "dbus_next.aio": _StubModule("dbus_next.aio"),
+        "cairocffi": _StubModule("cairocffi"),
+        "cairocffi.pixbuf": _StubModule("cairocffi.pixbuf"),
+    }
+    return modules
+
+
+def load_config(path):
+    for name in list(sys.modules):
+        if name == "config" or name == "custom" or name.startswith("custom."):
+            del sys.modules[name]
+    spec = importlib.util.spec_from_file_location("config", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["config"] = module
+    start = perf_counter()
+    spec.loader.exec_module(module)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("config", nargs="?", default="config.py")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--trace", help="write a profile of the last run here")
+    args = parser.parse_args()
+
+    config_dir = os.path.dirname(os.path.abspath(args.config))
+    sys.path.insert(0, config_dir)
+    sys.modules.update(stub_modules())
+    os.environ.setdefault("USER", "harness")
+
+    times = []
+    for run in range(args.runs):
+        if args.trace and run == args.runs - 1:
+            os.environ["QTILE_PROFILE"] = args.trace
+        times.append(load_config(args.config))
+
+    print(
+        "config load over %d runs: best %.2f ms, median %.2f ms"
+        % (len(times), min(times) * 1000, statistics.median(times) * 1000)
+    )
+
+    if args.trace:
+        from custom.profiler import profiler
+
+        profiler.uninstall()
+        profiler.write()
+        print(profiler.format_summary())
+
+
+if __name__ == "__main__":
+    main()
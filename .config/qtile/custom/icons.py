@@ -0,0 +1,216 @@
+import json
+import os
+import re
+from collections import OrderedDict
+
+from libqtile.log_utils import logger
+
+SIZE_DIR_RE = re.compile(r"^(\d+)x\1$")
+EXTENSIONS = (".svg", ".png")
+
+
+class IconTheme:
+    """Looks up and rasterizes application icons of a freedesktop icon theme
+
+    The theme is scanned once into an index of icon name to available sizes,
+    saved at ``index_path`` and only rebuilt when the mtime of one of the
+    indexed directories changes. Rasterized icons are kept in an LRU of
+    ``cache_size`` surfaces, so showing an icon that was shown before costs
+    neither a file system access nor parsing an SVG. Icons that fail to load
+    are remembered and not tried again, and without cairocffi.pixbuf, which
+    is imported on first use, no icon is rasterized at all.
+    """
+
+    def __init__(
+        self,
+        theme_dir="~/.icons/Nord-Icon",
+        context="apps",
+        index_path="~/.cache/qtile/icon-index.json",
+        cache_size=64,
+    ):
+        self.theme_dir = os.path.expanduser(theme_dir)
+        self.context = context
+        self.index_path = os.path.expanduser(index_path)
+        self.cache_size = cache_size
+
+        self.dirs = None
+        self.sizes = []
+        self.icons = {}
+        self.surfaces = OrderedDict()
+        self.failed = set()
+        self.can_render = True
+        self.rebuilds = 0
+        self.renders = 0
+        self._preload = None
+
+    def _scan_dirs(self):
+        """Return {directory: mtime_ns} of the theme's fixed size directories"""
+        dirs = {}
+        try:
+            entries = os.listdir(self.theme_dir)
+        except OSError as e:
+            logger.warning("IconTheme: %s", e)
+            return dirs
+        for entry in entries:
+            if SIZE_DIR_RE.match(entry):
+                path = os.path.join(entry, self.context)
+                try:
+                    dirs[path] = os.stat(os.path.join(self.theme_dir, path)).st_mtime_ns
+                except OSError:
+                    pass
+        return dirs
+
+    def load(self):
+        dirs = self._scan_dirs()
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index["theme_dir"] == self.theme_dir and index["dirs"] == dirs:
+                self.sizes = index["sizes"]
+                self.icons = index["icons"]
+                # Last, lookups from the event loop wait for it.
+                self.dirs = dirs
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        self.build(dirs)
+
+    def build(self, dirs):
+        """Index every icon as name: [bit mask of self.sizes, extension]"""
+        self.rebuilds += 1
+        sizes = sorted({int(path.split("x", 1)[0]) for path in dirs})
+        icons = {}
+        for path in dirs:
+            bit = 1 << sizes.index(int(path.split("x", 1)[0]))
+            try:
+                with os.scandir(os.path.join(self.theme_dir, path)) as entries:
+                    for entry in entries:
+                        name, ext = os.path.splitext(entry.name)
+                        if ext not in EXTENSIONS:
+                            continue
+                        icon = icons.setdefault(name, [0, ext])
+                        icon[0] |= bit
+            except OSError as e:
+                logger.warning("IconTheme: %s", e)
+        self.sizes = sizes
+        self.icons = icons
+        self.dirs = dirs
+
+        index = {
+            "theme_dir": self.theme_dir,
+            "dirs": dirs,
+            "sizes": sizes,
+            "icons": icons,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(tmp, self.index_path)
+        except OSError:
+            logger.exception("IconTheme: unable to write %s", self.index_path)
+
+    def preload(self, qtile):
+        """Load the index in a worker thread, returns a future
+
+        Until it is done lookups find nothing instead of loading the index
+        on the event loop.
+        """
+        if self._preload is None:
+            self._preload = qtile.run_in_executor(self.load)
+            self._preload.add_done_callback(self._preloaded)
+        return self._preload
+
+    def _preloaded(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("IconTheme: unable to load the index: %s", future.exception())
+
+    def lookup(self, name, size):
+        """Path of the icon ``name`` closest to ``size``, None if there is none"""
+        if self.dirs is None:
+            if self._preload is not None:
+                return None
+            self.load()
+        icon = self.icons.get(name)
+        if icon is None:
+            return None
+        mask, ext = icon
+        available = [s for n, s in enumerate(self.sizes) if mask & (1 << n)]
+        # The smallest one that is big enough, else the biggest there is.
+        best = next((s for s in available if s >= size), available[-1])
+        return os.path.join(
+            self.theme_dir, "%dx%d" % (best, best), self.context, name + ext
+        )
+
+    def find(self, names, size):
+        """Path of the first of ``names`` that the theme has an icon for"""
+        for name in names:
+            for candidate in (name, name.lower(), name.lower().replace(" ", "-")):
+                path = self.lookup(candidate, size)
+                if path is not None:
+                    return path
+        return None
+
+    def surface(self, names, size):
+        """The icon for the first known of ``names``, rasterized at ``size``"""
+        path = self.find(names, size)
+        if path is None:
+            return None
+        key = (path, size)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        if key in self.failed or not self.can_render:
+            return None
+
+        try:
+            import cairocffi.pixbuf
+        except ImportError as e:
+            logger.error("IconTheme: %s, no icons are shown", e)
+            self.can_render = False
+            return None
+        try:
+            with open(path, "rb") as f:
+                surface, _ = cairocffi.pixbuf.decode_to_image_surface(
+                    f.read(), size, size
+                )
+        except (OSError, cairocffi.pixbuf.ImageLoadingError) as e:
+            logger.warning("IconTheme: unable to load %s: %s", path, e)
+            self.failed.add(key)
+            return None
+        self.renders += 1
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.cache_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def cached(self, names, size):
+        """Like surface() but never renders, None when not rasterized yet"""
+        path = self.find(names, size)
+        surface = self.surfaces.get((path, size))
+        if surface is not None:
+            self.surfaces.move_to_end((path, size))
+        return surface
+
+    def pending(self, names, size):
+        """Whether surface() would render an icon for ``names``"""
+        path = self.find(names, size)
+        key = (path, size)
+        return (
+            self.can_render
+            and path is not None
+            and key not in self.surfaces
+            and key not in self.failed
+        )
+
+    def info(self):
+        return {
+            "icons": len(self.icons),
+            "sizes": self.sizes,
+            "cached": len(self.surfaces),
+            "failed": len(self.failed),
+            "rebuilds": self.rebuilds,
+            "renders": self.renders,
+        }
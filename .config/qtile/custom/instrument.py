@@ -0,0 +1,181 @@
+import functools
+import os
+from time import perf_counter_ns
+
+from libqtile import hook
+
+# Set to anything to wrap the bar widgets at startup, e.g.
+# QTILE_INSTRUMENT=1 qtile start
+# Without it instrument() returns the widgets untouched and costs nothing.
+ENV_VARIABLE = "QTILE_INSTRUMENT"
+
+# Durations are bucketed by powers of two of microseconds: bucket n counts
+# events that took less than 2**n us, the last bucket everything slower.
+BUCKETS = 20
+
+
+class _State:
+    # Switched on by instrument(), so redraw() costs nothing without it.
+    enabled = False
+    # Stack of redraw causes: hooks being fired and the causes given to
+    # redraw(). The innermost one triggered the redraw.
+    triggers = []
+    # Every instrumented widget by name.
+    widgets = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.buckets[min((ns // 1000).bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def info(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / self.count / 1000 if self.count else 0.0,
+            "max_us": self.max_ns / 1000,
+            "buckets_us": {
+                ("<%d" % 2 ** n if n < BUCKETS - 1 else ">=%d" % 2 ** (n - 1)): hits
+                for n, hits in enumerate(self.buckets)
+                if hits
+            },
+        }
+
+
+class WidgetStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.draw = Histogram()
+        self.poll = Histogram()
+        # Draw durations by cause
+        self.triggers = {}
+
+    def info(self):
+        triggers = sorted(self.triggers.items(), key=lambda item: -item[1].count)
+        return {
+            "draw": self.draw.info(),
+            "poll": self.poll.info(),
+            "triggers": {cause: histogram.info() for cause, histogram in triggers},
+        }
+
+
+def redraw(cause, draw):
+    """Call ``draw`` with ``cause`` as the trigger of the draws it does
+
+    Used where widgets redraw themselves or the bar, e.g.
+    ``redraw("bar:Volume", self.bar.draw)``, so the draws of every widget
+    on the bar are attributed to the widget that changed length.
+    """
+    if not _State.enabled:
+        return draw()
+    _State.triggers.append(cause)
+    try:
+        return draw()
+    finally:
+        _State.triggers.pop()
+
+
+def _fire(original):
+    @functools.wraps(original)
+    def fire(event, *args, **kwargs):
+        _State.triggers.append(event)
+        try:
+            return original(event, *args, **kwargs)
+        finally:
+            _State.triggers.pop()
+
+    return fire
+
+
+def _timed(method, histogram_name, stats):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not _State.enabled:
+            return method(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            ns = perf_counter_ns() - start
+            getattr(stats, histogram_name).add(ns)
+            if histogram_name == "draw":
+                cause = _State.triggers[-1] if _State.triggers else "other"
+                histogram = stats.triggers.get(cause)
+                if histogram is None:
+                    histogram = stats.triggers[cause] = Histogram()
+                histogram.add(ns)
+
+    return wrapper
+
+
+def _wrap(widget):
+    stats = WidgetStats()
+    widget.perf = stats
+    widget.draw = _timed(widget.draw, "draw", stats)
+    # on_value handles the values pushed by a Provider.
+    for name in ("poll", "tick", "on_value"):
+        method = getattr(widget, name, None)
+        if callable(method):
+            setattr(widget, name, _timed(method, "poll", stats))
+
+    def cmd_perf_stats():
+        """Draw/poll histograms and draw histograms by cause of this widget"""
+        return stats.info()
+
+    widget.cmd_perf_stats = cmd_perf_stats
+    widget.cmd_perf_reset = cmd_perf_reset
+    widget.cmd_perf_report = cmd_perf_report
+    widget.cmd_perf_enable = cmd_perf_enable
+
+    for child in getattr(widget, "widgets", ()):
+        _wrap(child)
+    _State.widgets[id(widget)] = widget
+
+
+def cmd_perf_report():
+    """Stats of every instrumented widget"""
+    return {
+        "enabled": _State.enabled,
+        "widgets": {
+            "%s@%x" % (widget.name, key): widget.perf.info()
+            for key, widget in _State.widgets.items()
+        },
+    }
+
+
+def cmd_perf_reset():
+    """Clear the stats of every instrumented widget"""
+    for widget in _State.widgets.values():
+        widget.perf.reset()
+
+
+def cmd_perf_enable(enabled=True):
+    """Turn recording on or off without unwrapping the widgets"""
+    _State.enabled = bool(enabled)
+
+
+def instrument(widgets):
+    """Count draws, time draws and polls of ``widgets`` when enabled
+
+    The data is available at runtime through any wrapped widget, e.g.
+    ``qtile cmd-obj -o widget clock -f perf_report``.
+    """
+    if not os.environ.get(ENV_VARIABLE):
+        return widgets
+    _State.enabled = True
+    if not hasattr(hook.fire, "__wrapped__"):
+        hook.fire = _fire(hook.fire)
+    for widget in widgets:
+        _wrap(widget)
+    return widgets
@@ -0,0 +1,113 @@
+from libqtile import hook
+from libqtile.log_utils import logger
+from libqtile.widget import CurrentLayoutIcon
+
+from custom.surfaces import SurfaceCache, scale_png
+
+# Shared by every bar, so each icon is scaled once per size.
+icon_cache = SurfaceCache("~/.cache/qtile/layout-icons")
+
+# LayoutIcon replaces CurrentLayoutIcon internals of this qtile version and
+# relies on the methods below. When one of them is missing the widget says
+# so and behaves like a plain CurrentLayoutIcon instead of breaking.
+QTILE_VERSION = "0.17.0"
+CURRENT_LAYOUT_ICON_METHODS = (
+    "_get_layout_names",
+    "_setup_images",
+    "_setup_hooks",
+    "_update_icon_paths",
+    "find_icon_file_path",
+)
+
+
+class LayoutIcon(CurrentLayoutIcon):
+    """CurrentLayoutIcon drawing pre-scaled icons from a shared cache
+
+    The icons of all configured layouts are taken from ``icon_cache`` when
+    the bar is configured, so neither a restart nor a layout switch decodes
+    or scales a PNG. A layout switch only redraws this widget.
+    """
+
+    compatible = True
+
+    def _configure(self, qtile, bar):
+        missing = [
+            name
+            for name in CURRENT_LAYOUT_ICON_METHODS
+            if not hasattr(CurrentLayoutIcon, name)
+        ]
+        if missing:
+            logger.warning(
+                "LayoutIcon: written for qtile %s, CurrentLayoutIcon has no %s, "
+                "drawing a plain CurrentLayoutIcon",
+                QTILE_VERSION,
+                ", ".join(missing),
+            )
+            self.compatible = False
+        CurrentLayoutIcon._configure(self, qtile, bar)
+
+    def _setup_images(self):
+        if not self.compatible:
+            CurrentLayoutIcon._setup_images(self)
+            return
+        height = max(1, int((self.bar.height - 1) * self.scale))
+        for layout_name in self._get_layout_names():
+            path = self.find_icon_file_path(layout_name)
+            if path is None:
+                logger.warning('No icon found for layout "%s"', layout_name)
+                path = self.find_icon_file_path("unknown")
+            surface = icon_cache.get(path, scale_png, height)
+            if surface is None:
+                continue
+            self.surfaces[layout_name] = surface
+            # Leave the space the unscaled icon would take, like the original.
+            width = int(surface.get_width() / self.scale) + self.actual_padding * 2
+            if width > self.length:
+                self.length = width
+        self.icons_loaded = True
+
+    def reconfigure(self, changes):
+        """Called by HotReload after ``changes`` were set on this widget"""
+        if self.compatible and changes.keys() & {"scale", "padding", "custom_icon_paths"}:
+            if "custom_icon_paths" in changes:
+                self._update_icon_paths()
+            self.surfaces = {}
+            self.length = 0
+            self._setup_images()
+
+    def _setup_hooks(self):
+        if not self.compatible:
+            CurrentLayoutIcon._setup_hooks(self)
+            return
+
+        def hook_response(layout, group):
+            if group.screen is not None and group.screen == self.bar.screen:
+                self.current_layout = layout.name
+                self.draw()
+
+        hook.subscribe.layout_change(hook_response)
+
+    def draw(self):
+        if not self.compatible:
+            CurrentLayoutIcon.draw(self)
+            return
+        surface = self.surfaces.get(self.current_layout) if self.icons_loaded else None
+        if surface is None:
+            CurrentLayoutIcon.draw(self)
+            return
+
+        self.drawer.clear(self.background or self.bar.background)
+        self.drawer.ctx.set_source_surface(
+            surface,
+            (self.length - surface.get_width()) // 2,
+            (self.bar.height - surface.get_height()) // 2,
+        )
+        self.drawer.ctx.paint()
+        offsetx = getattr(self, "offsetx", None)
+        self.drawer.draw(
+            offsetx=self.offset if offsetx is None else offsetx, width=self.length
+        )
+
+    def cmd_icon_cache(self):
+        """Hits, loads and renders of the layout icon cache"""
+        return icon_cache.info()
@@ -0,0 +1,47 @@
+import asyncio
+
+from libqtile.log_utils import logger
+
+
+async def dmenu(items, prompt=None, lines=20, case_insensitive=True, command="dmenu"):
+    """Show ``items`` in dmenu without blocking qtile
+
+    Returns the selected (or typed) line, or None when dmenu was dismissed.
+    """
+    args = [command]
+    if case_insensitive:
+        args.append("-i")
+    if lines:
+        args += ["-l", str(lines)]
+    if prompt:
+        args += ["-p", prompt]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError as e:
+        logger.error("dmenu: unable to start %s: %s", command, e)
+        return None
+    stdout, _ = await process.communicate("\n".join(items).encode())
+    selected = stdout.decode("utf-8", "replace").rstrip("\n")
+    if process.returncode != 0 or not selected:
+        return None
+    return selected
+
+
+async def confirm(question, command="dmenu"):
+    """Ask a No/Yes question, No being the default"""
+    return await dmenu(["No", "Yes"], prompt=question, lines=0, command=command) == "Yes"
+
+
+def launch(coroutine):
+    """Run a menu coroutine from a key binding, logging its errors"""
+
+    def done(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Menu failed", exc_info=task.exception())
+
+    asyncio.ensure_future(coroutine).add_done_callback(done)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+from time import time
+
+from libqtile.log_utils import logger
+
+from custom.menu import dmenu, launch
+from custom.poll import run_command
+
+CONNECTED_FORMAT = " {country}"
+DISCONNECTED_FORMAT = " Disconnected"
+
+
+def parse_status(output):
+    """Parse the key/value lines printed by ``nordvpn status``"""
+    fields = {}
+    for line in output.splitlines():
+        # The CLI prints a spinner made of "\r-\r  \r" in front of the output.
+        line = line.rsplit("\r", 1)[-1].strip()
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip().lower()] = value.strip()
+    return fields
+
+
+def status_text(
+    output, connected_format=CONNECTED_FORMAT, disconnected_format=DISCONNECTED_FORMAT
+):
+    """Render the bar text from a single ``nordvpn status`` invocation"""
+    fields = parse_status(output)
+    if "status" not in fields:
+        raise ValueError("unexpected nordvpn status output")
+    if fields["status"].lower() == "connected":
+        return connected_format.format(**fields)
+    return disconnected_format.format(**fields)
+
+
+def parse_list(output):
+    """Parse the comma separated names printed by ``nordvpn countries/cities``"""
+    names = output.replace("\r", " ").replace(",", " ").split()
+    return sorted(name for name in names if name != "-")
+
+
+class ServerLists:
+    """Country and city lists of the nordvpn CLI, cached on disk
+
+    Lists are served from ``cache_path`` right away. Those older than ``ttl``
+    are fetched again in the background for the next time, only lists never
+    seen before are waited for. ``command`` can be a stub of the CLI.
+    """
+
+    def __init__(
+        self,
+        command="nordvpn",
+        cache_path="~/.cache/qtile/nordvpn.json",
+        ttl=7 * 86400,
+        timeout=30,
+    ):
+        self.command = command
+        self.cache_path = os.path.expanduser(cache_path)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache = None
+        self._fetching = {}
+
+    def load(self):
+        try:
+            with open(self.cache_path) as f:
+                self.cache = json.load(f)
+        except (OSError, ValueError):
+            self.cache = {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.cache, f)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            logger.exception("ServerLists: unable to write %s", self.cache_path)
+
+    async def countries(self):
+        return await self._get("countries", ("countries",))
+
+    async def cities(self, country):
+        return await self._get("cities/" + country, ("cities", country))
+
+    async def _get(self, key, args):
+        if self.cache is None:
+            self.load()
+        entry = self.cache.get(key)
+        if entry is None:
+            return await self._fetch(key, args)
+        if time() - entry["time"] > self.ttl and key not in self._fetching:
+            asyncio.ensure_future(self._fetch(key, args))
+        return entry["items"]
+
+    async def _fetch(self, key, args):
+        if key in self._fetching:
+            return await asyncio.shield(self._fetching[key])
+        self._fetching[key] = future = asyncio.get_event_loop().create_future()
+        items = self.cache.get(key, {}).get("items", [])
+        try:
+            fetched = parse_list(
+                await run_command((self.command,) + args, self.timeout)
+            )
+        except Exception as e:
+            logger.warning("ServerLists: unable to fetch %s: %r", key, e)
+        else:
+            if fetched:
+                items = fetched
+                self.cache[key] = {"time": time(), "items": items}
+                self.save()
+        finally:
+            # Also when cancelled, other waiters get what is cached.
+            del self._fetching[key]
+            future.set_result(items)
+        return items
+
+
+class VpnMenu:
+    """dmenu front end of the nordvpn CLI, the lists come from ServerLists
+
+    ``on_change`` is called after connecting or disconnecting, e.g. to
+    refresh the status in the bar.
+    """
+
+    def __init__(self, lists=None, command="nordvpn", on_change=None):
+        self.lists = lists or ServerLists(command=command)
+        self.command = command
+        self.on_change = on_change
+
+    def open(self):
+        launch(self.run())
+
+    async def menu(self, items, lines=0):
+        return await dmenu(items, prompt="NordVPN:", lines=lines)
+
+    async def run(self):
+        choice = await self.menu(["Connect", "Disconnect", "Status", "Settings"])
+        if choice == "Connect":
+            await self.connect_menu()
+        elif choice == "Disconnect":
+            await self.nordvpn("disconnect")
+        elif choice in ("Status", "Settings"):
+            output = await run_command((self.command, choice.lower()), self.lists.timeout)
+            lines = [line.rsplit("\r", 1)[-1].strip() for line in output.splitlines()]
+            await self.menu([line for line in lines if line and line != "-"], lines=20)
+
+    async def connect_menu(self):
+        choice = await self.menu(["Default", "Countries", "Cities", "p2p", "onion"])
+        if choice == "Default":
+            await self.nordvpn("connect")
+        elif choice in ("Countries", "Cities"):
+            country = await self.menu(await self.lists.countries(), lines=20)
+            if not country:
+                return
+            if choice == "Countries":
+                await self.nordvpn("connect", country)
+                return
+            city = await self.menu(await self.lists.cities(country), lines=20)
+            if city:
+                await self.nordvpn("connect", country, city)
+        elif choice == "p2p":
+            await self.nordvpn("connect", "p2p")
+        elif choice == "onion":
+            await self.nordvpn("connect", "onion_over_vpn")
+        elif choice is not None:
+            await self.run()
+
+    async def nordvpn(self, *args):
+        try:
+            await run_command((self.command,) + args, timeout=60)
+        except Exception as e:
+            logger.warning("VpnMenu: nordvpn %s failed: %r", " ".join(args), e)
+        if self.on_change is not None:
+            self.on_change()
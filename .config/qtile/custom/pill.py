@@ -0,0 +1,116 @@
+from libqtile import bar
+from libqtile.widget import base
+
+
+def _offset(widget):
+    offsetx = getattr(widget, "offsetx", None)
+    return widget.offset if offsetx is None else offsetx
+
+
+def _place(widget, x):
+    # What the bar does for its own widgets, offset is a read-only property.
+    widget.offsetx = x
+
+
+class Pill(base._Widget):
+    """Draws one or more widgets between two rounded cap glyphs
+
+    This replaces a head TextBox, the content widgets, a tail TextBox and a
+    trailing Sep with a single bar widget. The cap glyphs are laid out once
+    and painted in the same pass as the children. Mouse events are forwarded
+    to the child under the pointer. Children must not stretch.
+    """
+
+    orientations = base.ORIENTATION_HORIZONTAL
+    defaults = [
+        ("head", "", "Glyph drawn in front of the children"),
+        ("tail", "", "Glyph drawn after the children"),
+        ("font", "sans", "Font of the cap glyphs"),
+        ("fontsize", 28, "Font size of the cap glyphs"),
+        ("foreground", "#242831", "Colour of the cap glyphs"),
+        ("margin", 0, "Empty space left after the pill"),
+    ]
+
+    def __init__(self, *widgets, **config):
+        base._Widget.__init__(self, bar.CALCULATED, **config)
+        self.add_defaults(Pill.defaults)
+        self.widgets = list(widgets)
+        self.caps = None
+
+    def _configure(self, qtile, bar):
+        base._Widget._configure(self, qtile, bar)
+        self.layout_caps()
+        for widget in self.widgets:
+            widget._configure(qtile, bar)
+            qtile.register_widget(widget)
+
+    def layout_caps(self):
+        self.caps = [
+            self.drawer.textlayout(
+                glyph, self.foreground, self.font, self.fontsize, None, markup=False
+            )
+            for glyph in (self.head, self.tail)
+        ]
+
+    def reconfigure(self, changes):
+        """Called by HotReload after ``changes`` were set on this widget"""
+        if changes.keys() & {"head", "tail", "font", "fontsize", "foreground"}:
+            self.layout_caps()
+
+    def calculate_length(self):
+        if self.caps is None:
+            return 0
+        head, tail = self.caps
+        return (
+            head.width
+            + sum(widget.length for widget in self.widgets)
+            + tail.width
+            + self.margin
+        )
+
+    def draw_cap(self, layout, x, width):
+        self.drawer.clear(self.background or self.bar.background)
+        layout.draw(0, int(self.bar.height / 2.0 - layout.height / 2.0) + 1)
+        self.drawer.draw(offsetx=x, width=width)
+
+    def draw(self):
+        head, tail = self.caps
+        x = _offset(self)
+
+        self.draw_cap(head, x, head.width)
+        x += head.width
+
+        for widget in self.widgets:
+            _place(widget, x)
+            widget.draw()
+            x += widget.length
+
+        self.draw_cap(tail, x, tail.width + self.margin)
+
+    def child_at(self, x):
+        x -= self.caps[0].width
+        for widget in self.widgets:
+            if 0 <= x < widget.length:
+                return widget, x
+            x -= widget.length
+        return None, None
+
+    def button_press(self, x, y, button):
+        widget, x = self.child_at(x)
+        if widget is not None:
+            widget.button_press(x, y, button)
+
+    def button_release(self, x, y, button):
+        widget, x = self.child_at(x)
+        if widget is not None:
+            widget.button_release(x, y, button)
+
+    def info(self):
+        info = base._Widget.info(self)
+        info["widgets"] = [widget.name for widget in self.widgets]
+        return info
+
+    def finalize(self):
+        for widget in self.widgets:
+            widget.finalize()
+        base._Widget.finalize(self)
@@ -0,0 +1,202 @@
+import asyncio
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+from custom.provider import Provider, ProviderText
+
+
+class CommandError(Exception):
+    pass
+
+
+async def run_command(command, timeout, returncodes=(0,)):
+    """Run ``command`` and return its stdout, killing it after ``timeout``
+
+    Exit statuses other than ``returncodes`` raise CommandError.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode not in returncodes:
+        raise CommandError("exited with %d" % proc.returncode)
+    return stdout.decode("utf-8", "replace")
+
+
+class Source(Provider):
+    """A command polled by a PollService
+
+    ``parser`` turns the command's stdout into the published value; if it
+    raises, the run counts as a failure and the last good value is kept.
+    """
+
+    def __init__(
+        self, name, command, interval=60, timeout=10, parser=str.strip, max_backoff=300
+    ):
+        Provider.__init__(self)
+        self.name = name
+        self.command = command
+        self.interval = interval
+        self.timeout = timeout
+        self.parser = parser
+        self.max_backoff = max_backoff
+        self.service = None
+
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.changes = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self._handle = None
+        self._polling = False
+        self._refresh = False
+
+    def start(self):
+        self.service.start(self)
+
+    def stop(self):
+        self.service.stop(self)
+
+    def publish(self, value):
+        if value != self.value:
+            self.changes += 1
+        Provider.publish(self, value)
+
+    def next_delay(self):
+        if not self.consecutive_failures:
+            return self.interval
+        return min(self.interval * 2 ** self.consecutive_failures, self.max_backoff)
+
+    def stats(self):
+        return {
+            "command": " ".join(self.command),
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "changes": self.changes,
+            "last_error": self.last_error,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+            "mean_latency": self.total_latency / self.runs if self.runs else 0.0,
+        }
+
+
+class PollService:
+    """Runs the commands behind shell-backed bar segments
+
+    Each source is polled on its own interval while it has subscribers, at
+    most ``max_concurrent`` commands run at the same time, commands that take
+    longer than their source's timeout are killed, and failing sources back
+    off exponentially.
+    """
+
+    def __init__(self, max_concurrent=2):
+        self.max_concurrent = max_concurrent
+        self.sources = {}
+        self._semaphore = None
+
+    def add(self, source):
+        source.service = self
+        self.sources[source.name] = source
+        return source
+
+    def __getitem__(self, name):
+        return self.sources[name]
+
+    def start(self, source):
+        if source._handle is None and not source._polling:
+            self._schedule(source, 0)
+
+    def stop(self, source):
+        if source._handle is not None:
+            source._handle.cancel()
+            source._handle = None
+
+    def refresh(self, name):
+        """Poll ``name`` now instead of waiting for its next run
+
+        If it is being polled right now, it is polled again once that run is
+        over, as the running command may predate the change.
+        """
+        source = self.sources[name]
+        if source._polling:
+            source._refresh = True
+            return
+        self.stop(source)
+        self._schedule(source, 0)
+
+    def _schedule(self, source, delay):
+        loop = asyncio.get_event_loop()
+        source._handle = loop.call_later(delay, self._due, source)
+
+    def _due(self, source):
+        source._handle = None
+        asyncio.ensure_future(self._poll(source))
+
+    async def _poll(self, source):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        source._polling = True
+        async with self._semaphore:
+            start = monotonic()
+            try:
+                value = source.parser(await run_command(source.command, source.timeout))
+            except asyncio.TimeoutError:
+                source.timeouts += 1
+                self._failed(source, "timed out after %ss" % source.timeout)
+            except Exception as e:
+                self._failed(source, str(e) or type(e).__name__)
+            else:
+                source.consecutive_failures = 0
+                source.last_error = None
+                source.publish(value)
+            finally:
+                latency = monotonic() - start
+                source.runs += 1
+                source.last_latency = latency
+                source.total_latency += latency
+                source.max_latency = max(source.max_latency, latency)
+                source._polling = False
+
+        if source._refresh:
+            source._refresh = False
+            self.stop(source)
+            self._schedule(source, 0)
+        elif source.subscribers and source._handle is None:
+            self._schedule(source, source.next_delay())
+
+    def _failed(self, source, reason):
+        source.failures += 1
+        source.consecutive_failures += 1
+        source.last_error = reason
+        logger.warning(
+            "PollService: %s failed (%s), retrying in %ss",
+            source.name,
+            reason,
+            source.next_delay(),
+        )
+
+    def stats(self):
+        return {name: source.stats() for name, source in self.sources.items()}
+
+
+class PollText(ProviderText):
+    """Displays the value of a PollService source"""
+
+    def cmd_poll_stats(self):
+        """Latency and failure counters of every source of the poll service"""
+        return self.provider.service.stats()
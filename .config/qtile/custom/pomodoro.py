@@ -18,180 +18,264 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import asyncio
 from datetime import datetime, timedelta
-from time import time
+from math import floor
+from time import monotonic
 
 from libqtile.utils import send_notification
-from libqtile.widget import base
 
+from custom.instrument import redraw
+from custom.provider import Provider, ProviderText
 
-class Pomodoro(base.ThreadPoolText):
-    """Pomodoro technique widget"""
+STATUS_START = "start"
+STATUS_INACTIVE = "inactive"
+STATUS_ACTIVE = "active"
+STATUS_BREAK = "break"
+STATUS_LONG_BREAK = "long_break"
+STATUS_PAUSED = "paused"
 
-    orientations = base.ORIENTATION_HORIZONTAL
-    defaults = [
-        ("fmt", "{}", "fmt"),
-        ("num_pomodori", 4, "Number of pomodori to do in a cycle"),
-        ("length_pomodori", 25, "Length of one pomodori in minutes"),
-        ("length_short_break", 5, "Length of a short break in minutes"),
-        ("length_long_break", 15, "Length of a long break in minutes"),
-        ("color_inactive", "ff0000", "Colour then pomodoro is inactive"),
-        ("color_active", "00ff00", "Colour then pomodoro is running"),
-        ("color_break", "ffff00", "Colour then it is break time"),
-        ("notification_on", True, "Turn notifications on"),
-        ("timer_visible", True, "Toggle visibility of the timer"),
-        ("prefix_inactive", "POMODORO", "Prefix when app is inactive"),
-        ("prefix_active", "", "Prefix then app is active"),
-        ("prefix_break", "B ", "Prefix during short break"),
-        ("prefix_long_break", "LB ", "Prefix during long break"),
-        ("prefix_paused", "PAUSE", "Prefix during pause"),
-        (
-            "update_interval",
-            1,
-            "Update interval in seconds, if none, the "
-            "widget updates whenever the event loop is idle.",
-        ),
-    ]
 
-    STATUS_START = "start"
-    STATUS_INACTIVE = "inactive"
-    STATUS_ACTIVE = "active"
-    STATUS_BREAK = "break"
-    STATUS_LONG_BREAK = "long_break"
-    STATUS_PAUSED = "paused"
+class PomodoroTimer(Provider):
+    """Pomodoro technique timer shared by any number of Pomodoro widgets
 
-    status = "inactive"
-    paused_status = None
-    notified = False
-    end_time = datetime.now()
-    time_left = None
-    pomodoros = 1
+    The value is a ``(status, seconds_left)`` tuple, ``seconds_left`` being
+    None while inactive or paused or when ``timer_visible`` is off. Instead
+    of ticking at a fixed rate the timer sleeps until the next moment the
+    value can change: the next whole second when the time left is shown, the
+    end of the current period otherwise, and not at all while inactive or
+    paused.
+    """
 
-    def __init__(self, **config):
-        base.ThreadPoolText.__init__(self, "", **config)
-        self.add_defaults(Pomodoro.defaults)
-        self.prefix = {
-            "inactive": self.prefix_inactive,
-            "active": self.prefix_active,
-            "break": self.prefix_break,
-            "long_break": self.prefix_long_break,
-            "paused": self.prefix_paused,
-        }
+    def __init__(
+        self,
+        num_pomodori=4,
+        length_pomodori=25,
+        length_short_break=5,
+        length_long_break=15,
+        notification_on=True,
+        notification_ready=None,
+        notification_wait=60,
+        timer_visible=True,
+    ):
+        Provider.__init__(self)
+        self.num_pomodori = num_pomodori
+        self.length_pomodori = length_pomodori
+        self.length_short_break = length_short_break
+        self.length_long_break = length_long_break
+        self.notification_on = notification_on
+        # Callable telling whether the notification daemon is up,
+        # notifications are queued until it returns True, or for at most
+        # notification_wait seconds, after which D-Bus activation has to do.
+        self.notification_ready = notification_ready
+        self.notification_wait = notification_wait
+        self.timer_visible = timer_visible
 
-        self.add_callbacks(
-            {
-                "Button1": self._toggle_break,
-                "Button3": self._toggle_active,
-            }
-        )
+        self.status = STATUS_INACTIVE
+        self.paused_status = None
+        self.end_time = 0.0
+        self.time_left = None
+        self.pomodoros = 1
+        self._timer = None
+        self._notifications = []
+        self._notify_handle = None
+
+    def start(self):
+        self.wake()
 
-    def tick(self):
-        self.update(self.poll())
-        return self.update_interval - time() % self.update_interval
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def wake(self):
+        """Publish the current state and sleep until the next deadline"""
+        self.stop()
+        self._update()
+
+        if self.status in [STATUS_INACTIVE, STATUS_PAUSED] or not self.timer_visible:
+            seconds = None
+        else:
+            seconds = max(int(self.end_time - monotonic()), 0)
+        self.publish((self.status, seconds))
+
+        deadline = self._next_deadline()
+        if deadline is not None:
+            self._timer = asyncio.get_event_loop().call_later(
+                max(deadline - monotonic(), 0), self.wake
+            )
+
+    def _next_deadline(self):
+        if self.status in [STATUS_INACTIVE, STATUS_PAUSED]:
+            return None
+
+        if not self.timer_visible:
+            return self.end_time
+
+        # The timer shows whole seconds left, so it changes every time the
+        # remaining time crosses an integer.
+        remaining = self.end_time - monotonic()
+        shown = floor(remaining)
+        if shown == remaining:
+            shown -= 1
+        return self.end_time - shown
+
+    def _end_clock(self):
+        end = datetime.now() + timedelta(seconds=self.end_time - monotonic())
+        return end.strftime("%I:%M %p")
 
     def _update(self):
-        if self.status in [self.STATUS_INACTIVE, self.STATUS_PAUSED]:
+        if self.status in [STATUS_INACTIVE, STATUS_PAUSED]:
             return
 
-        if self.end_time > datetime.now() and self.status != self.STATUS_START:
+        if self.end_time > monotonic() and self.status != STATUS_START:
             return
 
-        if self.status == self.STATUS_ACTIVE and self.pomodoros == self.num_pomodori:
-            self.status = self.STATUS_LONG_BREAK
-            self.end_time = datetime.now() + timedelta(minutes=self.length_long_break)
+        if self.status == STATUS_ACTIVE and self.pomodoros == self.num_pomodori:
+            self.status = STATUS_LONG_BREAK
+            self.end_time = monotonic() + self.length_long_break * 60
             self.pomodoros = 1
             if self.notification_on:
                 self._send_notification(
                     "normal",
-                    "Please take a long break! End Time: "
-                    + self.end_time.strftime("%I:%M %p"),
+                    "Please take a long break! End Time: " + self._end_clock(),
                 )
             return
 
-        if self.status == self.STATUS_ACTIVE:
-            self.status = self.STATUS_BREAK
-            self.end_time = datetime.now() + timedelta(minutes=self.length_short_break)
+        if self.status == STATUS_ACTIVE:
+            self.status = STATUS_BREAK
+            self.end_time = monotonic() + self.length_short_break * 60
             self.pomodoros += 1
             if self.notification_on:
                 self._send_notification(
                     "normal",
-                    "Please take a short break! End Time: "
-                    + self.end_time.strftime("%I:%M %p"),
+                    "Please take a short break! End Time: " + self._end_clock(),
                 )
             return
 
-        self.status = self.STATUS_ACTIVE
-        self.end_time = datetime.now() + timedelta(minutes=self.length_pomodori)
+        self.status = STATUS_ACTIVE
+        self.end_time = monotonic() + self.length_pomodori * 60
         if self.notification_on:
             self._send_notification(
                 "normal",
-                "Please start with the next Pomodori! End Time: "
-                + self.end_time.strftime("%I:%M %p"),
+                "Please start with the next Pomodori! End Time: " + self._end_clock(),
             )
 
         return
 
-    def _get_text(self):
-        self._update()
-
-        if self.status in [self.STATUS_INACTIVE, self.STATUS_PAUSED]:
-            self.layout.colour = self.color_inactive
-            return self.prefix[self.status]
-
-        time_left = self.end_time - datetime.now()
-
-        if self.status == self.STATUS_ACTIVE:
-            self.layout.colour = self.color_active
-        else:
-            self.layout.colour = self.color_break
-
-        if self.timer_visible:
-            time_string = "%i:%i:%s" % (
-                time_left.seconds // 3600,
-                time_left.seconds % 3600 // 60,
-                time_left.seconds % 60,
-            )
-        else:
-            time_string = ""
-        return self.prefix[self.status] + time_string
-
-    def _toggle_break(self):
-        if self.status == self.STATUS_INACTIVE:
-            self.status = self.STATUS_START
-            return
-
-        if self.paused_status is None:
+    def toggle_break(self):
+        if self.status == STATUS_INACTIVE:
+            self.status = STATUS_START
+        elif self.paused_status is None:
             self.paused_status = self.status
-            self.time_left = self.end_time - datetime.now()
-            self.status = self.STATUS_PAUSED
+            self.time_left = self.end_time - monotonic()
+            self.status = STATUS_PAUSED
             if self.notification_on:
                 self._send_notification("low", "Pomodoro has been paused")
         else:
             self.status = self.paused_status
             self.paused_status = None
-            self.end_time = self.time_left + datetime.now()
+            self.end_time = self.time_left + monotonic()
             if self.notification_on:
-                if self.status == self.STATUS_ACTIVE:
+                if self.status == STATUS_ACTIVE:
                     status = "Pomodoro"
                 else:
                     status = "break"
 
                 self._send_notification(
                     "normal",
-                    "Please continue on %s! End Time: " % status
-                    + self.end_time.strftime("%I:%M %p"),
+                    "Please continue on %s! End Time: " % status + self._end_clock(),
                 )
+        self.wake()
 
-    def _toggle_active(self):
-        if self.status != self.STATUS_INACTIVE:
-            self.status = self.STATUS_INACTIVE
+    def toggle_active(self):
+        if self.status != STATUS_INACTIVE:
+            self.status = STATUS_INACTIVE
             if self.notification_on:
                 self._send_notification("normal", "Pomodoro has been suspended")
         else:
-            self.status = self.STATUS_START
+            self.status = STATUS_START
+        self.wake()
 
     def _send_notification(self, urgent, message):
-        send_notification("Pomodoro", message, urgent=urgent)
+        self._notifications.append((monotonic(), urgent, message))
+        if self._notify_handle is None:
+            self._flush_notifications()
+
+    def _flush_notifications(self):
+        self._notify_handle = None
+        ready = self.notification_ready is None or self.notification_ready()
+        while self._notifications:
+            queued, urgent, message = self._notifications[0]
+            if not ready and monotonic() - queued < self.notification_wait:
+                self._notify_handle = asyncio.get_event_loop().call_later(
+                    1, self._flush_notifications
+                )
+                return
+            del self._notifications[0]
+            send_notification("Pomodoro", message, urgent=urgent)
+
+
+class Pomodoro(ProviderText):
+    """Displays the state of a PomodoroTimer"""
 
-    def poll(self):
-        return self.fmt.format(self._get_text())
\ No newline at end of file
+    defaults = [
+        ("color_inactive", "ff0000", "Colour then pomodoro is inactive"),
+        ("color_active", "00ff00", "Colour then pomodoro is running"),
+        ("color_break", "ffff00", "Colour then it is break time"),
+        ("prefix_inactive", "POMODORO", "Prefix when app is inactive"),
+        ("prefix_active", "", "Prefix then app is active"),
+        ("prefix_break", "B ", "Prefix during short break"),
+        ("prefix_long_break", "LB ", "Prefix during long break"),
+        ("prefix_paused", "PAUSE", "Prefix during pause"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(Pomodoro.defaults)
+        self.prefix = self._prefixes()
+        self.add_callbacks(
+            {
+                "Button1": self.provider.toggle_break,
+                "Button3": self.provider.toggle_active,
+            }
+        )
+
+    def _prefixes(self):
+        return {
+            STATUS_INACTIVE: self.prefix_inactive,
+            STATUS_ACTIVE: self.prefix_active,
+            STATUS_BREAK: self.prefix_break,
+            STATUS_LONG_BREAK: self.prefix_long_break,
+            STATUS_PAUSED: self.prefix_paused,
+        }
+
+    def reconfigure(self, changes):
+        """Called by HotReload after ``changes`` were set on this widget"""
+        self.prefix = self._prefixes()
+        ProviderText.reconfigure(self, changes)
+
+    def on_value(self, value):
+        status, _ = value
+        if status in [STATUS_INACTIVE, STATUS_PAUSED]:
+            colour = self.color_inactive
+        elif status == STATUS_ACTIVE:
+            colour = self.color_active
+        else:
+            colour = self.color_break
+
+        old_colour = self.layout.colour
+        self.layout.colour = colour
+        text = self.format(value)
+        if text != self.text:
+            self.update(text)
+        elif colour != old_colour:
+            redraw(self.cause, self.draw)
+
+    def format(self, value):
+        status, seconds = value
+        if seconds is None:
+            time_string = ""
+        else:
+            time_string = "%i:%i:%s" % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+        return self.fmt.format(self.prefix.get(status, "") + time_string)
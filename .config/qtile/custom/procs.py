@@ -0,0 +1,248 @@
+import asyncio
+import os
+import signal
+import threading
+from collections import namedtuple
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+from custom.menu import confirm, dmenu, launch
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+Process = namedtuple("Process", "pid ppid name state ticks start rss command")
+
+
+def read_process(path, pid):
+    """Read one process from ``/proc/<pid>``, None if it is gone"""
+    try:
+        with open(os.path.join(path, "stat"), "rb") as f:
+            stat = f.read().decode("utf-8", "replace")
+        with open(os.path.join(path, "statm"), "rb") as f:
+            statm = f.read().split()
+        with open(os.path.join(path, "cmdline"), "rb") as f:
+            cmdline = f.read(512).replace(b"\0", b" ")
+    except OSError:
+        return None
+    # The name is in parentheses and may itself contain spaces and ")".
+    open_paren = stat.index("(")
+    close_paren = stat.rindex(")")
+    fields = stat[close_paren + 2:].split()
+    return Process(
+        pid=pid,
+        ppid=int(fields[1]),
+        name=stat[open_paren + 1:close_paren],
+        state=fields[0],
+        ticks=int(fields[11]) + int(fields[12]),
+        start=int(fields[19]),
+        rss=int(statm[1]) * PAGE_SIZE,
+        command=" ".join(cmdline.decode("utf-8", "replace").split()),
+    )
+
+
+class ProcessTable:
+    """Snapshot of the user's processes read straight from ``/proc``
+
+    A snapshot is reused for ``ttl`` seconds; the previous one is kept so the
+    CPU usage between the two can be ranked. ``proc_root`` can point at a
+    fake tree of ``<pid>/{stat,statm,cmdline}`` files. Snapshots may be taken
+    from a worker thread.
+    """
+
+    def __init__(self, proc_root="/proc", ttl=2, uid=None):
+        self.proc_root = proc_root
+        self.ttl = ttl
+        self.uid = os.getuid() if uid is None else uid
+
+        self.processes = {}
+        self.taken_at = None
+        self.previous = {}
+        self.previous_at = None
+        self._lock = threading.Lock()
+
+    def fresh(self):
+        """Whether snapshot() would reuse the current snapshot"""
+        return self.taken_at is not None and monotonic() - self.taken_at < self.ttl
+
+    def snapshot(self, force=False):
+        with self._lock:
+            if force or not self.fresh():
+                self._scan()
+            return self.processes
+
+    def _scan(self):
+        now = monotonic()
+        processes = {}
+        with os.scandir(self.proc_root) as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    if entry.stat().st_uid != self.uid:
+                        continue
+                except OSError:
+                    continue
+                process = read_process(entry.path, int(entry.name))
+                if process is not None:
+                    processes[process.pid] = process
+
+        if self.taken_at is not None:
+            self.previous, self.previous_at = self.processes, self.taken_at
+        self.processes, self.taken_at = processes, now
+
+    def cpu(self, process):
+        """CPU usage in percent since the previous snapshot
+
+        Without a previous snapshot this is the average over the process'
+        lifetime so far, which still ranks busy processes first.
+        """
+        previous = self.previous.get(process.pid)
+        if previous is not None and previous.start == process.start:
+            elapsed = self.taken_at - self.previous_at
+            ticks = process.ticks - previous.ticks
+        else:
+            elapsed = max(self._uptime() - process.start / CLOCK_TICKS, 1)
+            ticks = process.ticks
+        return ticks / CLOCK_TICKS / max(elapsed, 0.001) * 100
+
+    def _uptime(self):
+        try:
+            with open(os.path.join(self.proc_root, "uptime")) as f:
+                return float(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return 0.0
+
+    def tree(self, key="cpu", force=False):
+        """Processes depth first, sorted by the ``key`` of their whole tree
+
+        Returns ``(depth, process, value)`` tuples, ``value`` being the CPU
+        percentage or the RSS in bytes.
+        """
+        processes = self.snapshot(force)
+        if key == "cpu":
+            values = {pid: self.cpu(process) for pid, process in processes.items()}
+        else:
+            values = {pid: process.rss for pid, process in processes.items()}
+
+        children = {}
+        roots = []
+        for process in processes.values():
+            if process.ppid in processes:
+                children.setdefault(process.ppid, []).append(process.pid)
+            else:
+                roots.append(process.pid)
+
+        totals = {}
+
+        def total(pid):
+            if pid not in totals:
+                totals[pid] = values[pid] + sum(total(c) for c in children.get(pid, ()))
+            return totals[pid]
+
+        result = []
+        stack = [(0, pid) for pid in sorted(roots, key=total)]
+        while stack:
+            depth, pid = stack.pop()
+            result.append((depth, processes[pid], values[pid]))
+            stack.extend(
+                (depth + 1, child) for child in sorted(children.get(pid, ()), key=total)
+            )
+        return result
+
+
+def _size(value):
+    for unit in ("K", "M", "G"):
+        value /= 1024
+        if value < 1024 or unit == "G":
+            return "%.1f%s" % (value, unit)
+
+
+async def terminate(pid, start=None, timeout=3, proc_root="/proc"):
+    """SIGTERM ``pid``, then SIGKILL it if it is still there after ``timeout``
+
+    ``start`` is the process start time from its stat file, which guards
+    against signalling a new process that reused the pid.
+    """
+
+    def alive():
+        process = read_process(os.path.join(proc_root, str(pid)), pid)
+        return (
+            process is not None
+            and process.state != "Z"
+            and (start is None or process.start == start)
+        )
+
+    if not alive():
+        return True
+    try:
+        os.kill(pid, signal.SIGTERM)
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            if not alive():
+                return True
+        logger.info("terminate: %d ignored SIGTERM, sending SIGKILL", pid)
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        return True
+    except PermissionError as e:
+        logger.warning("terminate: unable to kill %d: %s", pid, e)
+        return False
+    return True
+
+
+class ProcessPicker:
+    """dmenu process killer, listing the process tree by CPU or memory
+
+    /proc is read in a worker thread and the menu opens as soon as the tree
+    is built. Ranked by CPU, the usage shown is the one since the previous
+    snapshot, lifetime averages the first time. As dmenu's list can't change
+    once it is shown, the table is sampled again ``sample`` seconds after
+    the menu opened, so opening it again shortly after shows current usage.
+    """
+
+    def __init__(self, table=None, key="cpu", confirm=True, timeout=3, sample=0.2):
+        self.table = table or ProcessTable()
+        self.key = key
+        self.confirm = confirm
+        self.timeout = timeout
+        self.sample = sample
+
+    def items(self, force=False):
+        entries = self.table.tree(self.key, force)
+        lines = []
+        for depth, process, value in entries:
+            lines.append(
+                "%7d %6s %s%s  %s"
+                % (
+                    process.pid,
+                    "%.1f%%" % value if self.key == "cpu" else _size(value),
+                    "  " * depth,
+                    process.name,
+                    process.command,
+                )
+            )
+        return entries, lines
+
+    def open(self):
+        launch(self.run())
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        entries, lines = await loop.run_in_executor(None, self.items)
+        if self.key == "cpu":
+            loop.call_later(
+                self.sample, loop.run_in_executor, None, self.table.snapshot, True
+            )
+        selected = await dmenu(lines, prompt="Search for process to kill:")
+        if selected is None or selected not in lines:
+            return
+        _, process, _ = entries[lines.index(selected)]
+        name = "%d %s" % (process.pid, process.name)
+        if self.confirm and not await confirm("Kill %s?" % name):
+            return
+        await terminate(
+            process.pid, process.start, self.timeout, proc_root=self.table.proc_root
+        )
@@ -0,0 +1,245 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+from collections import defaultdict
+from time import perf_counter
+
+# Set to the path of the trace file to enable profiling, e.g.
+# QTILE_PROFILE=/tmp/qtile-startup.json qtile start
+ENV_VARIABLE = "QTILE_PROFILE"
+
+# Widget methods that are timed. _configure is recorded on every call, the
+# others only the first time each widget runs them.
+WIDGET_METHODS = ("__init__", "_configure", "timer_setup", "_config_async", "poll", "tick", "draw")
+FIRST_CALL_ONLY = ("timer_setup", "_config_async", "poll", "tick", "draw")
+
+WIDGET_MODULES = ("libqtile.widget", "custom")
+
+
+class _TimedLoader:
+    """Wraps a module loader to time ``exec_module``"""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.span("import " + module.__name__, "import"):
+            self._loader.exec_module(module)
+        self._profiler.instrument_module(module)
+
+
+class _ImportTracer:
+    """Meta path finder that hands out timed loaders"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        finders = sys.meta_path[sys.meta_path.index(self) + 1:]
+        for finder in finders:
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self.profiler)
+        return spec
+
+
+class Profiler:
+    """Records wall time of config imports and widget startup
+
+    Spans are written as a Chrome trace event file, which speedscope and
+    chrome://tracing both open, and a summary sorted by total time is logged.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.events = []
+        self.origin = perf_counter()
+        self._local = threading.local()
+        self._first_calls = set()
+        self._instrumented = set()
+        self._tracer = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def install(self):
+        """Start timing imports and widgets loaded from now on"""
+        if not self.enabled or self._tracer is not None:
+            return
+        self._tracer = _ImportTracer(self)
+        sys.meta_path.insert(0, self._tracer)
+        for name, module in list(sys.modules.items()):
+            if module is not None and name.startswith(WIDGET_MODULES):
+                self.instrument_module(module)
+
+    def uninstall(self):
+        if self._tracer in sys.meta_path:
+            sys.meta_path.remove(self._tracer)
+        self._tracer = None
+
+    def record(self, name, category, start, end):
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+        )
+
+    def span(self, name, category="config"):
+        return _Span(self, name, category)
+
+    def instrument_module(self, module):
+        try:
+            from libqtile.widget.base import _Widget
+        except ImportError:
+            return
+        for obj in list(vars(module).values()):
+            if (
+                inspect.isclass(obj)
+                and issubclass(obj, _Widget)
+                and obj.__module__ == module.__name__
+            ):
+                self.instrument_class(obj)
+
+    def instrument_class(self, cls):
+        if cls in self._instrumented:
+            return
+        self._instrumented.add(cls)
+        for method in WIDGET_METHODS:
+            original = getattr(cls, method, None)
+            if original is not None:
+                setattr(cls, method, self._wrap(cls, method, original))
+
+    def _wrap(self, cls, method, original):
+        profiler = self
+        first_only = method in FIRST_CALL_ONLY
+
+        def should_record(widget):
+            # Only the outermost call is recorded, so super() calls into an
+            # instrumented base class don't show up twice.
+            active = profiler._active()
+            key = (id(widget), method)
+            if key in active:
+                return None
+            if first_only:
+                if key in profiler._first_calls:
+                    return None
+                profiler._first_calls.add(key)
+            active.add(key)
+            return key
+
+        def name(widget):
+            return "%s.%s" % (type(widget).__name__, method)
+
+        if inspect.iscoroutinefunction(original):
+
+            @functools.wraps(original)
+            async def wrapper(widget, *args, **kwargs):
+                key = should_record(widget)
+                if key is None:
+                    return await original(widget, *args, **kwargs)
+                start = perf_counter()
+                try:
+                    return await original(widget, *args, **kwargs)
+                finally:
+                    profiler._active().discard(key)
+                    profiler.record(name(widget), "widget", start, perf_counter())
+
+        else:
+
+            @functools.wraps(original)
+            def wrapper(widget, *args, **kwargs):
+                key = should_record(widget)
+                if key is None:
+                    return original(widget, *args, **kwargs)
+                start = perf_counter()
+                try:
+                    return original(widget, *args, **kwargs)
+                finally:
+                    profiler._active().discard(key)
+                    profiler.record(name(widget), "widget", start, perf_counter())
+
+        return wrapper
+
+    def _active(self):
+        active = getattr(self._local, "active", None)
+        if active is None:
+            active = self._local.active = set()
+        return active
+
+    def summary(self):
+        totals = defaultdict(lambda: [0.0, 0])
+        for event in self.events:
+            total = totals[event["name"]]
+            total[0] += event["dur"] / 1000
+            total[1] += 1
+        return sorted(
+            ((name, ms, count) for name, (ms, count) in totals.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def format_summary(self, limit=40):
+        lines = ["%10s %6s  %s" % ("ms", "calls", "name")]
+        for name, ms, count in self.summary()[:limit]:
+            lines.append("%10.2f %6d  %s" % (ms, count, name))
+        return "\n".join(lines)
+
+    def write(self):
+        if not self.enabled:
+            return
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+    def finish(self):
+        """Write the trace and log the summary"""
+        if not self.enabled:
+            return
+        from libqtile.log_utils import logger
+
+        self.uninstall()
+        self.write()
+        logger.info("Startup profile written to %s\n%s", self.path, self.format_summary())
+
+
+class _Span:
+    def __init__(self, profiler, name, category):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler.enabled:
+            self.profiler.record(self.name, self.category, self.start, perf_counter())
+        return False
+
+
+profiler = Profiler(os.environ.get(ENV_VARIABLE))
+profiler.install()
@@ -0,0 +1,95 @@
+from libqtile.log_utils import logger
+from libqtile.widget import base
+
+from custom.instrument import redraw
+
+
+class Provider:
+    """A data source that pushes its value to subscribed callbacks
+
+    Subclasses implement ``start()`` and ``stop()``, which are called when the
+    first subscriber arrives and the last one leaves, and call ``publish()``
+    with new values. Subscribers are only called when the value changes.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        value = self.value
+        self.subscribers.append(callback)
+        if len(self.subscribers) == 1:
+            self.start()
+        # A value published by start() has already reached the callback.
+        if self.value is not None and self.value is value:
+            callback(self.value)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+            if not self.subscribers:
+                self.stop()
+
+    def publish(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        for callback in list(self.subscribers):
+            try:
+                callback(value)
+            except Exception:
+                logger.exception("%s: subscriber failed", type(self).__name__)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class ProviderText(base._TextBox):
+    """Displays the value of a Provider"""
+
+    orientations = base.ORIENTATION_HORIZONTAL
+    defaults = [
+        ("provider", None, "Provider whose value is displayed"),
+        ("fmt", "{}", "Format string for the value"),
+    ]
+
+    def __init__(self, **config):
+        base._TextBox.__init__(self, "", **config)
+        self.add_defaults(ProviderText.defaults)
+
+    def timer_setup(self):
+        self.provider.subscribe(self.on_value)
+
+    def on_value(self, value):
+        self.update(self.format(value))
+
+    def format(self, value):
+        return self.fmt.format(value)
+
+    @property
+    def cause(self):
+        """What custom.instrument reports as the cause of this widget's draws"""
+        return type(self.provider).__name__
+
+    def update(self, text):
+        if text == self.text:
+            return
+        old_width = self.layout.width
+        self.text = text
+        if self.layout.width == old_width:
+            redraw(self.cause, self.draw)
+        else:
+            redraw("bar:" + self.cause, self.bar.draw)
+
+    def reconfigure(self, changes):
+        """Called by HotReload after ``changes`` were set on this widget"""
+        if self.provider.value is not None:
+            self.on_value(self.provider.value)
+
+    def finalize(self):
+        self.provider.unsubscribe(self.on_value)
+        base._TextBox.finalize(self)
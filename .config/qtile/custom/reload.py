@@ -0,0 +1,258 @@
+import importlib.util
+import sys
+from time import perf_counter
+
+from libqtile import hook
+from libqtile.log_utils import logger
+from libqtile.widget import base
+
+from custom.instrument import redraw
+
+# Settings that text widgets copy into their TextLayout when configured.
+LAYOUT_ATTRIBUTES = {
+    "foreground": "colour",
+    "font": "font",
+    "fontsize": "font_size",
+}
+
+PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+class _MutedSubscribe:
+    """Stands in for hook.subscribe while the config is run again"""
+
+    def __getattr__(self, name):
+        return lambda func: func
+
+
+def _same(a, b):
+    """Whether two config values are equivalent
+
+    Functions are compared by code, so the lambdas and callbacks of a config
+    that was run again match the live ones unless they were edited.
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    code = getattr(a, "__code__", None)
+    if code is not None:
+        return code == getattr(b, "__code__", None)
+    if isinstance(a, PLAIN_TYPES):
+        return a == b
+    return False
+
+
+def _changes(old, new):
+    """Settings of ``new`` that differ from ``old``, both Configurable kwargs"""
+    return {
+        name: value
+        for name, value in new.items()
+        if name not in old or not _same(old[name], value)
+    }
+
+
+def _same_shape(live, new):
+    """Whether ``new`` can be patched onto ``live`` instead of replacing it"""
+    if type(live) is not type(new):
+        return False
+    children = getattr(live, "widgets", None)
+    if not isinstance(children, list):
+        return True
+    return len(children) == len(new.widgets) and all(
+        _same_shape(a, b) for a, b in zip(children, new.widgets)
+    )
+
+
+def _flatten(widgets):
+    for widget in widgets:
+        yield widget
+        children = getattr(widget, "widgets", None)
+        if isinstance(children, list):
+            yield from _flatten(children)
+
+
+class HotReload:
+    """Applies edits of config.py to the running bars without a restart
+
+    ``reload(qtile)`` runs config.py again as a separate module, with hook
+    subscriptions muted, and compares the result with what is running:
+
+    - settings that changed on a widget, through ``widget_defaults`` or its
+      own arguments, are set on the live widget, which keeps its drawer,
+      timers and provider subscription
+    - a widget whose type changed, or that moved, is replaced by the new one
+    - ``layout_theme`` changes are set on the live layouts of every group
+
+    Module-level objects of the custom package (providers, services, menus)
+    are taken from the running config, so nothing starts polling twice and a
+    new widget shows the current data straight away. Changes to keys, groups
+    or those objects still need a restart.
+    """
+
+    def __init__(self, path=None, widgets_function="init_widgets_list"):
+        self.path = path
+        self.widgets_function = widgets_function
+        self.module = None
+        self.last = None
+
+    def load(self):
+        """Run config.py as a new module, with the live custom objects in it"""
+        live = self.module or sys.modules["config"]
+        path = self.path or live.__file__
+        spec = importlib.util.spec_from_file_location("config_reload", path)
+        module = importlib.util.module_from_spec(spec)
+        subscribe = hook.subscribe
+        hook.subscribe = _MutedSubscribe()
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            hook.subscribe = subscribe
+
+        for name, value in vars(module).items():
+            if type(value).__module__.startswith("custom.") and hasattr(live, name):
+                setattr(module, name, getattr(live, name))
+        return live, module
+
+    def reload(self, qtile):
+        """Apply config.py to the running bars and layouts, return a report"""
+        start = perf_counter()
+        try:
+            live, module = self.load()
+        except Exception:
+            logger.exception("HotReload: unable to load the config, nothing changed")
+            return None
+        loaded = perf_counter()
+
+        report = {"patched": [], "rebuilt": [], "layouts": 0}
+        defaults = _changes(
+            getattr(live, "widget_defaults", {}), getattr(module, "widget_defaults", {})
+        )
+        if defaults:
+            base._Widget.global_defaults = module.widget_defaults
+
+        bars = [screen.top for screen in qtile.screens if screen.top is not None]
+        for bar in bars:
+            widgets = getattr(module, self.widgets_function)()
+            self.update_bar(qtile, bar, widgets, defaults, report)
+        report["layouts"] = self.update_layouts(
+            qtile,
+            getattr(live, "layout_theme", {}),
+            getattr(module, "layout_theme", {}),
+        )
+        diffed = perf_counter()
+
+        for bar in bars:
+            redraw("reload", bar.draw)
+        for screen in qtile.screens:
+            if report["layouts"] and screen.group is not None:
+                screen.group.layout_all()
+        self.module = module
+        end = perf_counter()
+
+        report["load_ms"] = (loaded - start) * 1000
+        report["apply_ms"] = (diffed - loaded) * 1000
+        report["draw_ms"] = (end - diffed) * 1000
+        report["total_ms"] = (end - start) * 1000
+        self.last = report
+        logger.info(
+            "HotReload: %d widgets patched, %d rebuilt, %d layouts in %.1f ms"
+            " (load %.1f, apply %.1f, draw %.1f)",
+            len(report["patched"]),
+            len(report["rebuilt"]),
+            report["layouts"],
+            report["total_ms"],
+            report["load_ms"],
+            report["apply_ms"],
+            report["draw_ms"],
+        )
+        return report
+
+    def update_bar(self, qtile, bar, widgets, defaults, report):
+        for index in range(max(len(bar.widgets), len(widgets))):
+            live = bar.widgets[index] if index < len(bar.widgets) else None
+            new = widgets[index] if index < len(widgets) else None
+            if live is not None and new is not None and _same_shape(live, new):
+                for old, widget in zip(_flatten([live]), _flatten([new])):
+                    changes = {
+                        name: value
+                        for name, value in defaults.items()
+                        if name not in widget._user_config
+                    }
+                    settings = _changes(old._user_config, widget._user_config)
+                    changes.update(settings)
+                    if changes:
+                        self.patch(old, changes)
+                        old._user_config.update(settings)
+                        report["patched"].append(old.name)
+                continue
+
+            if live is not None:
+                self.remove(qtile, live)
+            if new is not None:
+                new._configure(qtile, bar)
+                qtile.register_widget(new)
+                report["rebuilt"].append(new.name)
+            if live is None:
+                bar.widgets.append(new)
+            elif new is None:
+                bar.widgets[index] = None
+            else:
+                bar.widgets[index] = new
+        bar.widgets[:] = [widget for widget in bar.widgets if widget is not None]
+
+    def patch(self, widget, changes):
+        """Set ``changes`` on a configured widget and its text layout"""
+        old_callbacks = widget._user_config.get("mouse_callbacks", {})
+        for name, value in changes.items():
+            if name == "mouse_callbacks":
+                # Keep the callbacks the widget added itself.
+                merged = {
+                    button: callback
+                    for button, callback in widget.mouse_callbacks.items()
+                    if button not in old_callbacks or button in value
+                }
+                merged.update(value)
+                value = merged
+            setattr(widget, name, value)
+            layout = getattr(widget, "layout", None)
+            if layout is not None and name in LAYOUT_ATTRIBUTES:
+                setattr(layout, LAYOUT_ATTRIBUTES[name], value)
+
+        reconfigure = getattr(widget, "reconfigure", None)
+        if callable(reconfigure):
+            reconfigure(changes)
+
+    def remove(self, qtile, widget):
+        removed = set(map(id, _flatten([widget])))
+        for name, registered in list(qtile.widgets_map.items()):
+            if id(registered) in removed:
+                del qtile.widgets_map[name]
+        # After the replacement has subscribed, so shared providers keep running.
+        qtile.call_soon(widget.finalize)
+
+    def update_layouts(self, qtile, old_theme, new_theme):
+        """Set changed theme settings on the layouts that were given them"""
+        changes = _changes(old_theme, new_theme)
+        if not changes:
+            return 0
+        layouts = list(qtile.config.layouts)
+        for group in qtile.groups:
+            layouts.extend(group.layouts)
+        count = 0
+        for layout in layouts:
+            applied = False
+            for name, value in changes.items():
+                if name in layout._user_config:
+                    setattr(layout, name, value)
+                    layout._user_config[name] = value
+                    applied = True
+            count += applied
+        return count
+
+    def info(self):
+        return self.last
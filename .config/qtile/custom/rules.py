@@ -0,0 +1,130 @@
+import re
+
+from libqtile.log_utils import logger
+
+# Properties whose value only changes when the client is remapped, so the
+# result of matching them can be memoized.
+CLASS_PROPERTIES = ("wm_class", "wm_instance_class", "wm_type", "role")
+
+
+def _predicate(name, rule):
+    """Test of one property value against ``rule``, as Match.compare does it
+
+    Patterns match at the start of the value. Strings are include matches
+    like in qtile 0.17: the rule must be part of the value, except for
+    wm_class, where the WM_CLASS string must be part of the rule.
+    """
+    if isinstance(rule, re.Pattern):
+        return rule.match
+    if name == "wm_class":
+        return lambda value: value in rule
+    return lambda value: rule in value
+
+
+class RuleIndex:
+    """Memoized lookup over a list of ``(target, Match)`` rules
+
+    Single-property rules (a string or a compiled pattern) are grouped by
+    property. The result for the class properties of a window (WM_CLASS,
+    type, role) is memoized, so only the first window of each kind is
+    tested against them, and the title rules, usually few, are tested for
+    every window. Anything else (several properties, ``func``) falls back to
+    ``Match.compare``. Lookups return the target of the first matching rule
+    in declaration order, like scanning the list would, and strings keep
+    Match's include semantics.
+    """
+
+    def __init__(self, rules):
+        self.rules = {name: [] for name in CLASS_PROPERTIES + ("title",)}
+        self.fallback = []
+        self._memo = {}
+
+        for order, (target, match) in enumerate(rules):
+            properties = getattr(match, "_rules", None) or {}
+            if len(properties) == 1:
+                (name, value), = properties.items()
+                if name in self.rules and isinstance(value, (str, re.Pattern)):
+                    self.rules[name].append((order, target, _predicate(name, value)))
+                    continue
+            self.fallback.append((order, target, match))
+
+    @staticmethod
+    def _properties(client):
+        # Like Match.compare, a wm_class rule is tried against every element
+        # of WM_CLASS, instance and class name alike, and wm_instance_class
+        # only against the first.
+        window = client.window
+        wm_class = tuple(window.get_wm_class() or ())
+        return {
+            "wm_class": wm_class,
+            "wm_instance_class": wm_class[:1],
+            "wm_type": window.get_wm_type(),
+            "role": window.get_wm_window_role(),
+        }
+
+    def _best(self, best, name, values):
+        for order, target, predicate in self.rules[name]:
+            if best is not None and order > best[0]:
+                break
+            if any(predicate(value) for value in values):
+                return (order, target)
+        return best
+
+    def _class_lookup(self, client):
+        properties = self._properties(client)
+        key = tuple(properties.values())
+        if key not in self._memo:
+            best = None
+            for name, value in properties.items():
+                if name in ("wm_class", "wm_instance_class"):
+                    best = self._best(best, name, value)
+                elif value is not None:
+                    best = self._best(best, name, (value,))
+            self._memo[key] = best
+        return self._memo[key]
+
+    def lookup(self, client):
+        best = self._class_lookup(client)
+        if client.name is not None:
+            best = self._best(best, "title", (client.name,))
+
+        for order, target, match in self.fallback:
+            if best is not None and order > best[0]:
+                break
+            try:
+                if match.compare(client):
+                    return target
+            except Exception:
+                logger.exception("RuleIndex: error evaluating %r", match)
+
+        return best[1] if best is not None else None
+
+
+class WindowRules:
+    """Group placement and float decisions for new clients
+
+    qtile calls ``floats`` from Group.add without catching errors, so a
+    failing lookup is logged and treated as no match instead of breaking
+    the managing of the window.
+    """
+
+    def __init__(self, workspaces, float_rules):
+        self.groups = RuleIndex(
+            (workspace["name"], match)
+            for workspace in workspaces
+            for match in workspace.get("matches") or ()
+        )
+        self.floating = RuleIndex((True, match) for match in float_rules)
+
+    def _lookup(self, index, client):
+        try:
+            return index.lookup(client)
+        except Exception:
+            logger.exception("WindowRules: unable to match %r", client)
+            return None
+
+    def group_for(self, client):
+        return self._lookup(self.groups, client)
+
+    def floats(self, client):
+        return bool(self._lookup(self.floating, client))
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import math
+import os
+from time import time
+from urllib.parse import quote
+
+from libqtile.log_utils import logger
+
+from custom.menu import dmenu, launch
+
+# The search terms are quoted and appended to the url. Characters in the
+# second element are left unquoted, for engines that take a path or a url.
+ENGINES = {
+    "amazon": ("https://www.amazon.com/s?k=", ""),
+    "archaur": ("https://aur.archlinux.org/packages/?O=0&K=", ""),
+    "archpkg": ("https://archlinux.org/packages/?sort=&q=", ""),
+    "archwiki": ("https://wiki.archlinux.org/index.php?search=", ""),
+    "arxiv": ("https://arxiv.org/search/?searchtype=all&source=header&query=", ""),
+    "bbcnews": ("https://www.bbc.co.uk/search?q=", ""),
+    "bing": ("https://www.bing.com/search?q=", ""),
+    "cliki": ("https://www.cliki.net/site/search?query=", ""),
+    "cnn": ("https://www.cnn.com/search?q=", ""),
+    "coinbase": ("https://www.coinbase.com/price?query=", ""),
+    "debianpkg": (
+        "https://packages.debian.org/search?suite=default&section=all"
+        "&arch=any&searchon=names&keywords=",
+        "",
+    ),
+    "discogs": ("https://www.discogs.com/search/?&type=all&q=", ""),
+    "duckduckgo": ("https://duckduckgo.com/?q=", ""),
+    "ebay": ("https://www.ebay.com/sch/i.html?&_nkw=", ""),
+    "github": ("https://github.com/search?q=", ""),
+    "gitlab": ("https://gitlab.com/search?search=", ""),
+    "google": ("https://www.google.com/search?q=", ""),
+    "googleimages": ("https://www.google.com/search?hl=en&tbm=isch&q=", ""),
+    "googlenews": ("https://news.google.com/search?q=", ""),
+    "imdb": ("https://www.imdb.com/find?q=", ""),
+    "lbry": ("https://lbry.tv/$/search?q=", ""),
+    "odysee": ("https://odysee.com/$/search?q=", ""),
+    "reddit": ("https://www.reddit.com/search/?q=", ""),
+    "slashdot": ("https://slashdot.org/index2.pl?fhfilter=", ""),
+    "socialblade": ("https://socialblade.com/youtube/user/", ""),
+    "sourceforge": ("https://sourceforge.net/directory/?q=", ""),
+    "stack": ("https://stackoverflow.com/search?q=", ""),
+    "startpage": ("https://www.startpage.com/do/dsearch?query=", ""),
+    "stockquote": ("https://finance.yahoo.com/quote/", ""),
+    "thesaurus": ("https://www.thesaurus.com/misspelling?term=", ""),
+    "translate": ("https://translate.google.com/?sl=auto&tl=en&text=", ""),
+    "urban": ("https://www.urbandictionary.com/define.php?term=", ""),
+    "wayback": ("https://web.archive.org/web/*/", ":/?&="),
+    "webster": ("https://www.merriam-webster.com/dictionary/", ""),
+    "wikipedia": ("https://en.wikipedia.org/wiki/", "/"),
+    "wiktionary": ("https://en.wiktionary.org/wiki/", "/"),
+    "wolfram": ("https://www.wolframalpha.com/input/?i=", ""),
+    "youtube": ("https://www.youtube.com/results?search_query=", ""),
+}
+
+
+class Frecency:
+    """Scores that grow with every use and halve every ``half_life`` seconds
+
+    Only the ``max_entries`` best scores are kept, so the store stays small
+    however long it is used.
+    """
+
+    def __init__(self, entries=None, half_life=14 * 86400, max_entries=100):
+        self.entries = entries or {}
+        self.half_life = half_life
+        self.max_entries = max_entries
+
+    def score(self, key, now=None):
+        if key not in self.entries:
+            return 0.0
+        score, used = self.entries[key]
+        age = (now or time()) - used
+        return score * math.exp(-math.log(2) * max(age, 0) / self.half_life)
+
+    def bump(self, key):
+        now = time()
+        self.entries[key] = [self.score(key, now) + 1, now]
+        if len(self.entries) > self.max_entries:
+            for stale in self.rank(self.entries)[self.max_entries:]:
+                del self.entries[stale]
+
+    def rank(self, keys):
+        now = time()
+        return sorted(keys, key=lambda key: (-self.score(key, now), key))
+
+
+class SearchLauncher:
+    """dmenu web search that offers the most used engines and queries first
+
+    The history is read from ``history_path`` on first use and kept in
+    memory afterwards.
+    """
+
+    def __init__(
+        self,
+        engines=ENGINES,
+        browser="firefox",
+        history_path="~/.cache/qtile/search.json",
+        max_queries=200,
+    ):
+        self.engines = engines
+        self.browser = browser
+        self.history_path = os.path.expanduser(history_path)
+        self.max_queries = max_queries
+        self.engine_history = None
+        self.query_history = None
+
+    def load(self):
+        try:
+            with open(self.history_path) as f:
+                history = json.load(f)
+            engines, queries = history["engines"], history["queries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            engines, queries = {}, {}
+        self.engine_history = Frecency(engines, max_entries=len(self.engines))
+        self.query_history = Frecency(queries, max_entries=self.max_queries)
+
+    def save(self):
+        history = {
+            "engines": self.engine_history.entries,
+            "queries": self.query_history.entries,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            tmp = self.history_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(history, f)
+            os.replace(tmp, self.history_path)
+        except OSError:
+            logger.exception("SearchLauncher: unable to write %s", self.history_path)
+
+    def engine_items(self):
+        return self.engine_history.rank(self.engines)
+
+    def query_items(self, engine):
+        prefix = engine + "\t"
+        return [
+            key[len(prefix):]
+            for key in self.query_history.rank(self.query_history.entries)
+            if key.startswith(prefix)
+        ]
+
+    def url(self, engine, query):
+        url, safe = self.engines[engine]
+        return url + quote(query, safe=safe)
+
+    def open(self):
+        launch(self.run())
+
+    async def run(self):
+        if self.engine_history is None:
+            self.load()
+
+        engine = await dmenu(self.engine_items(), prompt="Choose search engine:")
+        if engine not in self.engines:
+            return
+        queries = self.query_items(engine)
+        query = await dmenu(
+            queries, prompt="Enter search query:", lines=10 if queries else 0
+        )
+        if not query:
+            return
+
+        self.engine_history.bump(engine)
+        self.query_history.bump(engine + "\t" + query)
+        self.save()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.browser,
+                self.url(engine, query),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except OSError as e:
+            logger.error("SearchLauncher: unable to start %s: %s", self.browser, e)
+            return
+        # Reap it; a running browser usually hands the url over and exits.
+        await process.wait()
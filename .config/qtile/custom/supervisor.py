@@ -0,0 +1,277 @@
+import asyncio
+import inspect
+import os
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+
+def path_exists(path):
+    """Readiness probe: ``path`` exists, e.g. a server socket"""
+    path = os.path.expanduser(path)
+    return lambda: os.path.exists(path)
+
+
+def bus_name(name):
+    """Readiness probe: ``name`` is owned on the D-Bus session bus
+
+    Without dbus_next the name can't be checked and the service counts as
+    ready once spawned.
+    """
+    state = {}
+
+    async def probe():
+        try:
+            from dbus_next import Message
+            from dbus_next.aio import MessageBus
+        except ImportError as e:
+            logger.warning("Supervisor: %s, assuming %s is ready", e, name)
+            return True
+
+        if "bus" not in state:
+            state["bus"] = await MessageBus().connect()
+        reply = await state["bus"].call(
+            Message(
+                destination="org.freedesktop.DBus",
+                path="/org/freedesktop/DBus",
+                interface="org.freedesktop.DBus",
+                member="NameHasOwner",
+                signature="s",
+                body=[name],
+            )
+        )
+        return bool(reply.body and reply.body[0])
+
+    def close():
+        if "bus" in state:
+            state.pop("bus").disconnect()
+
+    # Called by the Supervisor once probing is over, ready or not.
+    probe.close = close
+    return probe
+
+
+class Service:
+    """A program started and watched by the Supervisor
+
+    ``requires`` names services that must be ready before this one starts,
+    ``ready`` is a probe (plain or async callable) that returns True once the
+    service can be used; without one the service is ready when spawned. A
+    service that can't be started or isn't ready within ``ready_timeout``
+    fails, and so do the services requiring it.
+
+    ``restart`` is "on-failure" to restart after a non-zero exit only, which
+    leaves one-shots and daemons that fork alone, "always", or False.
+    """
+
+    def __init__(
+        self,
+        name,
+        command,
+        requires=(),
+        ready=None,
+        ready_timeout=30,
+        restart="on-failure",
+        max_restarts=5,
+        backoff=1,
+        max_backoff=60,
+    ):
+        self.name = name
+        self.command = command
+        self.requires = requires
+        self.ready = ready
+        self.ready_timeout = ready_timeout
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.state = "waiting"
+        self.failed = False
+        self.process = None
+        self.restarts = 0
+        self.spawned_after = None
+        self.ready_after = None
+        # Created by Supervisor.start() so they belong to qtile's loop
+        self.ready_event = None
+        # Set once the service is ready or has failed
+        self.settled_event = None
+
+    def should_restart(self, returncode):
+        if self.restarts >= self.max_restarts:
+            return False
+        if self.restart == "on-failure":
+            return returncode != 0
+        return bool(self.restart)
+
+
+class Supervisor:
+    """Starts services concurrently without blocking qtile's event loop
+
+    Services are started as soon as their requirements are ready, polled
+    with their readiness probe, and restarted with exponential backoff when
+    they fail. ``report()`` gives per-service startup times.
+    """
+
+    def __init__(self, services, probe_interval=0.1):
+        self.services = {service.name: service for service in services}
+        self.probe_interval = probe_interval
+        self.started_at = None
+
+    def start(self):
+        self.started_at = monotonic()
+        for service in self.services.values():
+            service.ready_event = asyncio.Event()
+            service.settled_event = asyncio.Event()
+        for service in self.services.values():
+            asyncio.ensure_future(self._supervise(service))
+
+    def is_ready(self, name):
+        service = self.services.get(name)
+        return (
+            service is not None
+            and service.ready_event is not None
+            and service.ready_event.is_set()
+        )
+
+    async def wait_ready(self, name):
+        """Wait until the service is ready, return False if it failed instead"""
+        service = self.services[name]
+        await service.settled_event.wait()
+        return service.ready_event.is_set()
+
+    async def _supervise(self, service):
+        for name in service.requires:
+            if name not in self.services:
+                logger.warning(
+                    "Supervisor: %s requires unknown service %s", service.name, name
+                )
+                continue
+            if not await self.wait_ready(name):
+                self._fail(service, "not starting, %s failed" % name)
+                return
+
+        delay = service.backoff
+        while True:
+            started = monotonic()
+            try:
+                await self._spawn(service)
+            except OSError as e:
+                self._fail(service, "unable to start: %s" % e)
+                return
+
+            returncode = await service.process.wait()
+            service.process = None
+            service.state = "exited"
+            if not service.should_restart(returncode):
+                if returncode:
+                    logger.warning(
+                        "Supervisor: %s exited with %d", service.name, returncode
+                    )
+                if not service.ready_event.is_set():
+                    self._fail(service, "exited with %d before ready" % returncode)
+                return
+
+            # A service that ran for a while gets a fresh backoff.
+            if monotonic() - started > service.max_backoff:
+                delay = service.backoff
+            logger.warning(
+                "Supervisor: %s exited with %d, restarting in %ss",
+                service.name,
+                returncode,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, service.max_backoff)
+            service.restarts += 1
+
+    async def _spawn(self, service):
+        service.state = "starting"
+        service.process = await asyncio.create_subprocess_exec(
+            *service.command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        if service.spawned_after is None:
+            service.spawned_after = monotonic() - self.started_at
+
+        if service.ready_event.is_set():
+            service.state = "running"
+            return
+        if service.ready is not None:
+            asyncio.ensure_future(self._probe(service))
+        else:
+            self._set_ready(service)
+
+    async def _probe(self, service):
+        deadline = monotonic() + service.ready_timeout
+        process = service.process
+        try:
+            while service.process is process and monotonic() < deadline:
+                try:
+                    ready = service.ready()
+                    if inspect.isawaitable(ready):
+                        ready = await ready
+                except Exception:
+                    ready = False
+                if ready:
+                    self._set_ready(service)
+                    return
+                await asyncio.sleep(self.probe_interval)
+        finally:
+            close = getattr(service.ready, "close", None)
+            if close is not None:
+                close()
+        if service.process is process:
+            self._fail(service, "not ready after %ss" % service.ready_timeout)
+
+    def _set_ready(self, service):
+        service.state = "running"
+        service.ready_after = monotonic() - self.started_at
+        service.ready_event.set()
+        self._settle(service)
+
+    def _fail(self, service, reason):
+        service.state = "failed"
+        logger.error("Supervisor: %s %s", service.name, reason)
+        if not service.ready_event.is_set():
+            service.failed = True
+            self._settle(service)
+
+    def _settle(self, service):
+        service.settled_event.set()
+        if all(s.settled_event.is_set() for s in self.services.values()):
+            failed = [s.name for s in self.services.values() if s.failed]
+            logger.info(
+                "Supervisor: all services %s\n%s",
+                "settled, failed: %s" % ", ".join(failed) if failed else "ready",
+                self.format_report(),
+            )
+
+    def report(self):
+        return {
+            name: {
+                "state": service.state,
+                "pid": service.process.pid if service.process else None,
+                "spawned_after": service.spawned_after,
+                "ready_after": service.ready_after,
+                "restarts": service.restarts,
+                "failed": service.failed,
+            }
+            for name, service in self.services.items()
+        }
+
+    def format_report(self):
+        lines = []
+        for name, info in sorted(
+            self.report().items(),
+            key=lambda item: item[1]["ready_after"] or float("inf"),
+        ):
+            ready = info["ready_after"]
+            lines.append(
+                "%-12s %-8s ready after %s"
+                % (name, info["state"], "%.3fs" % ready if ready is not None else "-")
+            )
+        return "\n".join(lines)
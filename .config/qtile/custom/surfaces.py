@@ -0,0 +1,150 @@
+import hashlib
+import mmap
+import os
+import struct
+
+from libqtile.log_utils import logger
+
+# magic, source mtime_ns, source size, width, height, stride
+HEADER = struct.Struct("<4sQQIII")
+MAGIC = b"QSF1"
+
+
+def scale_png(path, height):
+    """Decode the PNG at ``path`` and scale it to ``height`` pixels"""
+    import cairocffi
+
+    image = cairocffi.ImageSurface.create_from_png(path)
+    factor = height / image.get_height()
+    width = max(1, round(image.get_width() * factor))
+    surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, width, height)
+    ctx = cairocffi.Context(surface)
+    ctx.scale(factor, factor)
+    ctx.set_source_surface(image)
+    ctx.get_source().set_filter(cairocffi.FILTER_BEST)
+    ctx.paint()
+    surface.flush()
+    return surface
+
+
+class SurfaceCache:
+    """Rendered image surfaces, kept in memory and as raw ARGB32 files
+
+    ``get(path, render, *params)`` returns ``render(path, *params)`` for the
+    current version of ``path``: a surface rendered before by this process is
+    shared, one rendered by an earlier process is read back from
+    ``cache_dir`` without decoding the source, and only when the source's
+    mtime or size changed is it rendered again. With ``use_mmap`` cached
+    files are mapped copy-on-write instead of read, for big images. Without
+    ``keep`` surfaces are not held in memory between calls, for images that
+    are used once, like wallpapers. cairocffi is imported on first use; a
+    surface that can't be created without it is logged and None returned.
+    """
+
+    def __init__(self, cache_dir, use_mmap=False, keep=True):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.use_mmap = use_mmap
+        self.keep = keep
+        self.surfaces = {}
+        self.hits = 0
+        self.loads = 0
+        self.renders = 0
+
+    def _file(self, path, params):
+        name = hashlib.sha1(repr((path,) + params).encode()).hexdigest()
+        return os.path.join(self.cache_dir, name + ".raw")
+
+    def get(self, path, render, *params):
+        return self._get(path, render, params)
+
+    def peek(self, path, *params):
+        """Like get() but never renders, None when nothing is cached"""
+        return self._get(path, None, params)
+
+    def _get(self, path, render, params):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning("SurfaceCache: %s", e)
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size) + params
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        cache_file = self._file(path, params)
+        surface = self.load(cache_file, stat)
+        if surface is not None:
+            self.loads += 1
+        elif render is None:
+            return None
+        else:
+            try:
+                surface = render(path, *params)
+            except Exception:
+                logger.exception("SurfaceCache: unable to render %s", path)
+                return None
+            self.renders += 1
+            self.save(cache_file, stat, surface)
+
+        if not self.keep:
+            return surface
+        # Only the current version of each image is kept.
+        for old in [k for k in self.surfaces if k[0] == path and k[3:] == params]:
+            del self.surfaces[old]
+        self.surfaces[key] = surface
+        return surface
+
+    def load(self, cache_file, stat):
+        try:
+            import cairocffi
+
+            with open(cache_file, "rb") as f:
+                header = f.read(HEADER.size)
+                magic, mtime, size, width, height, stride = HEADER.unpack(header)
+                if magic != MAGIC or (mtime, size) != (stat.st_mtime_ns, stat.st_size):
+                    return None
+                length = stride * height
+                if self.use_mmap:
+                    if os.fstat(f.fileno()).st_size != HEADER.size + length:
+                        return None
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                    data = memoryview(mapped)[HEADER.size:]
+                else:
+                    data = bytearray(length)
+                    if f.readinto(data) != length:
+                        return None
+        except (ImportError, OSError, ValueError, struct.error):
+            return None
+        return cairocffi.ImageSurface.create_for_data(
+            data, cairocffi.FORMAT_ARGB32, width, height, stride
+        )
+
+    def save(self, cache_file, stat, surface):
+        surface.flush()
+        header = HEADER.pack(
+            MAGIC,
+            stat.st_mtime_ns,
+            stat.st_size,
+            surface.get_width(),
+            surface.get_height(),
+            surface.get_stride(),
+        )
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = cache_file + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(header)
+                f.write(surface.get_data())
+            os.replace(tmp, cache_file)
+        except OSError:
+            logger.exception("SurfaceCache: unable to write %s", cache_file)
+
+    def info(self):
+        return {
+            "surfaces": len(self.surfaces),
+            "hits": self.hits,
+            "loads": self.loads,
+            "renders": self.renders,
+        }
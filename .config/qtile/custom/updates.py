@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+from time import time
+
+from libqtile.log_utils import logger
+
+from custom.poll import run_command
+from custom.provider import Provider, ProviderText
+
+
+def count_lines(output):
+    return sum(1 for line in output.splitlines() if line.strip())
+
+
+class UpdateCounter(Provider):
+    """Number of pending repo and AUR package updates
+
+    The last counts are kept in ``cache_path`` so a restart shows them right
+    away. Every ``check_interval`` seconds the pacman database mtime is
+    compared with the cached one; the repo and AUR checks only run, side by
+    side, when it changed or the cached counts are older than ``ttl``. The
+    commands are configurable so a fake checkupdates can be used for testing.
+    """
+
+    def __init__(
+        self,
+        repo_command=("checkupdates",),
+        aur_command=("yay", "-Qum"),
+        ttl=1800,
+        timeout=120,
+        check_interval=60,
+        cache_path="~/.cache/qtile/updates.json",
+        pacman_db="/var/lib/pacman/local",
+    ):
+        Provider.__init__(self)
+        self.repo_command = repo_command
+        self.aur_command = aur_command
+        self.ttl = ttl
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.cache_path = os.path.expanduser(cache_path)
+        self.pacman_db = pacman_db
+
+        self.repo = 0
+        self.aur = 0
+        self.timestamp = 0
+        self.db_mtime = None
+        self._handle = None
+        self._refreshing = False
+
+    def start(self):
+        self.load()
+        self.check()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def load(self):
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+            self.repo = cache["repo"]
+            self.aur = cache["aur"]
+            self.timestamp = cache["timestamp"]
+            self.db_mtime = cache["db_mtime"]
+        except (OSError, ValueError, KeyError):
+            return
+        self.publish((self.repo, self.aur))
+
+    def save(self):
+        cache = {
+            "repo": self.repo,
+            "aur": self.aur,
+            "timestamp": self.timestamp,
+            "db_mtime": self.db_mtime,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            logger.exception("UpdateCounter: unable to write %s", self.cache_path)
+
+    def _pacman_db_mtime(self):
+        try:
+            return os.stat(self.pacman_db).st_mtime
+        except OSError:
+            return None
+
+    def check(self):
+        self._handle = asyncio.get_event_loop().call_later(self.check_interval, self.check)
+        if self._refreshing:
+            return
+        if (
+            self._pacman_db_mtime() != self.db_mtime
+            or time() - self.timestamp >= self.ttl
+        ):
+            asyncio.ensure_future(self.refresh())
+
+    async def refresh(self):
+        self._refreshing = True
+        db_mtime = self._pacman_db_mtime()
+        try:
+            # checkupdates exits with 2 and yay with 1 when there is nothing
+            # to update.
+            repo, aur = await asyncio.gather(
+                run_command(self.repo_command, self.timeout, returncodes=(0, 2)),
+                run_command(self.aur_command, self.timeout, returncodes=(0, 1)),
+                return_exceptions=True,
+            )
+        finally:
+            self._refreshing = False
+
+        for name, result in (("repo", repo), ("aur", aur)):
+            if isinstance(result, BaseException):
+                logger.warning("UpdateCounter: %s check failed: %r", name, result)
+            else:
+                setattr(self, name, count_lines(result))
+
+        self.db_mtime = db_mtime
+        if isinstance(repo, BaseException) and isinstance(aur, BaseException):
+            # Probably offline, try again in a few checks.
+            self.timestamp = time() - self.ttl + 5 * self.check_interval
+        else:
+            self.timestamp = time()
+            self.save()
+        self.publish((self.repo, self.aur))
+
+
+class UpdateCount(ProviderText):
+    """Displays the number of pending updates of an UpdateCounter"""
+
+    defaults = [
+        ("display_format", "Updates: {updates}", "Format with {updates}, {repo} and {aur}"),
+        ("no_update_string", "", "Text shown when there are no updates"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(UpdateCount.defaults)
+
+    def format(self, value):
+        repo, aur = value
+        if not repo + aur:
+            return self.no_update_string
+        return self.display_format.format(updates=repo + aur, repo=repo, aur=aur)
@@ -0,0 +1,270 @@
+import asyncio
+import re
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+from custom.poll import run_command
+from custom.provider import Provider, ProviderText
+
+LEVEL_RE = re.compile(r"\[(\d+)%\](?:.*?\[(on|off)\])?")
+EVENT_RE = re.compile(r"Event '(\w+)' on ([\w-]+)(?: #(\d+))?")
+DEFAULT_SINK_RE = re.compile(r"^Default Sink: (.+)$", re.MULTILINE)
+
+
+def parse_level(output):
+    """Return (volume, muted) from ``amixer sget`` output"""
+    match = LEVEL_RE.search(output)
+    if match is None:
+        raise ValueError("no volume in amixer output")
+    return int(match.group(1)), match.group(2) == "off"
+
+
+class Mixer(Provider):
+    """Volume control through one long-lived ``amixer -s`` process
+
+    Key presses only adjust a pending delta; once per ``frame`` seconds the
+    net change is applied as a single absolute ``sset`` and the new level is
+    published, so holding a volume key neither forks nor races processes.
+    The value is a ``(volume, muted)`` tuple.
+
+    Changes made elsewhere arrive through a single ``pactl subscribe`` child:
+    only events for the default sink (and server events, which may switch
+    it) trigger a re-query, coalesced per frame. A query result is ignored
+    while a change is pending or was written less than a frame before the
+    query started, as it may predate the change. If the stream dies it is
+    restarted with backoff, and the level is polled every ``poll_interval``
+    seconds until it is back. The amixer and pactl binaries are configurable
+    so tests can use fakes.
+    """
+
+    def __init__(
+        self,
+        device="pulse",
+        control="Master",
+        frame=0.05,
+        poll_interval=5,
+        amixer="amixer",
+        pactl="pactl",
+    ):
+        Provider.__init__(self)
+        self.control = control
+        self.frame = frame
+        self.control_command = (amixer, "-D", device, "-q", "-s")
+        self.query_command = (amixer, "-D", device, "sget", control)
+        self.poll_interval = poll_interval
+        self.pactl = pactl
+
+        self.volume = None
+        self.muted = False
+        self._process = None
+        self._spawning = False
+        self._delta = 0
+        self._toggle_mute = False
+        self._flush_handle = None
+        self._last_write = float("-inf")
+
+        self.default_sink = None
+        self._subscriber = None
+        self._subscribe_task = None
+        self._query_handle = None
+        self._poll_handle = None
+
+    def start(self):
+        asyncio.ensure_future(self.query())
+        self._subscribe_task = asyncio.ensure_future(self._subscribe())
+
+    def stop(self):
+        if self._process is not None and self._process.returncode is None:
+            self._process.stdin.close()
+        self._process = None
+        if self._subscribe_task is not None:
+            self._subscribe_task.cancel()
+            self._subscribe_task = None
+        if self._subscriber is not None and self._subscriber.returncode is None:
+            self._subscriber.kill()
+        self._subscriber = None
+        self._stop_polling()
+
+    async def _subscribe(self):
+        delay = 1
+        while True:
+            try:
+                self._subscriber = await asyncio.create_subprocess_exec(
+                    self.pactl,
+                    "subscribe",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except OSError as e:
+                logger.warning("Mixer: unable to start pactl subscribe: %s", e)
+            else:
+                started = monotonic()
+                self._stop_polling()
+                await self._resolve_default_sink()
+                async for line in self._subscriber.stdout:
+                    self._on_event(line.decode("utf-8", "replace"))
+                await self._subscriber.wait()
+                if monotonic() - started > 60:
+                    delay = 1
+
+            self._start_polling()
+            logger.warning("Mixer: pactl subscribe stopped, retrying in %ss", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def _on_event(self, line):
+        match = EVENT_RE.search(line)
+        if match is None:
+            return
+        event, facility, index = match.groups()
+        if facility == "server":
+            asyncio.ensure_future(self._resolve_default_sink())
+            self._request_query()
+        elif facility == "sink" and event == "change":
+            if self.default_sink is None or index == self.default_sink:
+                self._request_query()
+
+    async def _resolve_default_sink(self):
+        try:
+            info = await run_command((self.pactl, "info"), timeout=2)
+            sinks = await run_command((self.pactl, "list", "short", "sinks"), timeout=2)
+        except Exception as e:
+            logger.warning("Mixer: unable to find the default sink: %s", e)
+            self.default_sink = None
+            return
+        match = DEFAULT_SINK_RE.search(info)
+        self.default_sink = None
+        for line in sinks.splitlines():
+            fields = line.split("\t")
+            if match is not None and len(fields) > 1 and fields[1] == match.group(1):
+                self.default_sink = fields[0]
+
+    def _request_query(self):
+        if self._query_handle is None:
+            self._query_handle = asyncio.get_event_loop().call_later(
+                self.frame, self._query_due
+            )
+
+    def _query_due(self):
+        self._query_handle = None
+        asyncio.ensure_future(self.query())
+
+    def _start_polling(self):
+        if self._poll_handle is None:
+            self._poll()
+
+    def _poll(self):
+        self._poll_handle = asyncio.get_event_loop().call_later(
+            self.poll_interval, self._poll
+        )
+        asyncio.ensure_future(self.query())
+
+    def _stop_polling(self):
+        if self._poll_handle is not None:
+            self._poll_handle.cancel()
+            self._poll_handle = None
+
+    async def query(self):
+        """Read the current level, e.g. after it was changed elsewhere"""
+        started = monotonic()
+        try:
+            output = await run_command(self.query_command, timeout=2)
+            volume, muted = parse_level(output)
+        except Exception as e:
+            logger.warning("Mixer: unable to read the volume: %s", e)
+            return
+        if self.volume is not None and (
+            self._delta or self._toggle_mute or self._last_write > started - self.frame
+        ):
+            # Our own change may not be in this result, ask again after it.
+            self._request_query()
+            return
+        self.volume, self.muted = volume, muted
+        self.publish((self.volume, self.muted))
+
+    def change(self, delta):
+        self._delta += delta
+        self._schedule_flush()
+
+    def toggle_mute(self):
+        self._toggle_mute = not self._toggle_mute
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(
+                self.frame, self._flush
+            )
+
+    def _flush(self):
+        self._flush_handle = None
+        if self._process is None or self._process.returncode is not None:
+            if not self._spawning:
+                asyncio.ensure_future(self._spawn())
+            return
+        if self.volume is None:
+            # Don't know where we are yet, query() will flush again.
+            return
+
+        commands = []
+        if self._delta:
+            self.volume = max(0, min(100, self.volume + self._delta))
+            commands.append("sset %s %d%%\n" % (self.control, self.volume))
+        if self._toggle_mute:
+            self.muted = not self.muted
+            commands.append("sset %s toggle\n" % self.control)
+        self._delta = 0
+        self._toggle_mute = False
+
+        if commands:
+            self._process.stdin.write("".join(commands).encode())
+            self._last_write = monotonic()
+            self.publish((self.volume, self.muted))
+
+    async def _spawn(self):
+        self._spawning = True
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *self.control_command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except OSError as e:
+            logger.error("Mixer: unable to start amixer: %s", e)
+            self._delta = 0
+            self._toggle_mute = False
+            return
+        finally:
+            self._spawning = False
+        if self.volume is None:
+            await self.query()
+        self._flush()
+
+
+class Volume(ProviderText):
+    """Displays the volume of a Mixer"""
+
+    defaults = [
+        ("step", 5, "Volume change per mouse wheel step"),
+        ("muted_text", "M", "Text shown when muted"),
+        ("fmt", "{}%", "Format of the volume"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(Volume.defaults)
+        self.add_callbacks(
+            {
+                "Button1": self.provider.toggle_mute,
+                "Button4": lambda: self.provider.change(self.step),
+                "Button5": lambda: self.provider.change(-self.step),
+            }
+        )
+
+    def format(self, value):
+        volume, muted = value
+        if muted:
+            return self.muted_text
+        return self.fmt.format(volume)
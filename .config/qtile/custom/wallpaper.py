@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+from custom.surfaces import SurfaceCache
+
+
+def render_wallpaper(path, width, height, mode):
+    """Decode the image at ``path`` and lay it out on a width x height screen
+
+    ``mode`` works like qtile's ``wallpaper_mode``: "fill" covers the screen
+    keeping the aspect ratio, "stretch" scales both axes, anything else puts
+    the image unscaled in the top left corner.
+    """
+    import cairocffi
+    import cairocffi.pixbuf
+
+    with open(path, "rb") as f:
+        image, _ = cairocffi.pixbuf.decode_to_image_surface(f.read())
+    image_width, image_height = image.get_width(), image.get_height()
+
+    surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, width, height)
+    ctx = cairocffi.Context(surface)
+    if mode == "fill":
+        factor = max(width / image_width, height / image_height)
+        ctx.translate(
+            (width - image_width * factor) / 2, (height - image_height * factor) / 2
+        )
+        ctx.scale(factor, factor)
+    elif mode == "stretch":
+        ctx.scale(width / image_width, height / image_height)
+    ctx.set_source_surface(image)
+    ctx.get_source().set_filter(cairocffi.FILTER_BEST)
+    ctx.paint()
+    surface.flush()
+    return surface
+
+
+def paint_root(qtile, screen, surface):
+    """Paint ``surface`` at the screen's position on the X root pixmap
+
+    This is what qtile does with a Screen's wallpaper, minus decoding and
+    scaling the image.
+    """
+    import xcffib.xproto
+    import cairocffi.xcb
+
+    conn = qtile.core.conn
+    root = conn.default_screen.root
+    width = conn.default_screen.width_in_pixels
+    height = conn.default_screen.height_in_pixels
+
+    pixmap = root.get_property("_XROOTPMAP_ID", xcffib.xproto.Atom.PIXMAP, int)
+    if not pixmap:
+        pixmap = root.get_property("ESETROOT_PMAP_ID", xcffib.xproto.Atom.PIXMAP, int)
+    if pixmap:
+        pixmap = pixmap[0]
+    else:
+        pixmap = conn.conn.generate_id()
+        conn.conn.core.CreatePixmap(
+            conn.default_screen.root_depth, pixmap, root.wid, width, height
+        )
+
+    target = cairocffi.xcb.XCBSurface(
+        conn.conn, pixmap, conn.default_screen.default_visual, width, height
+    )
+    ctx = cairocffi.Context(target)
+    ctx.set_source_surface(surface, screen.x, screen.y)
+    ctx.paint()
+    target.finish()
+
+    conn.conn.core.ChangeProperty(
+        xcffib.xproto.PropMode.Replace,
+        root.wid,
+        conn.atoms["_XROOTPMAP_ID"],
+        xcffib.xproto.Atom.PIXMAP,
+        32,
+        1,
+        [pixmap],
+    )
+    conn.conn.core.ChangeWindowAttributes(
+        root.wid, xcffib.xproto.CW.BackPixmap, [pixmap]
+    )
+    conn.conn.core.ClearArea(0, root.wid, 0, 0, width, height)
+    conn.conn.flush()
+
+
+class Wallpaper:
+    """Screen backgrounds laid out once per screen size and cached on disk
+
+    Use this instead of a Screen's ``wallpaper``, which decodes and scales the
+    image on every start. The result for each (image mtime, screen size,
+    mode) is kept as a raw file that later starts map into memory. Missing
+    ones are rendered in a worker thread, so the bars are drawn first and
+    the background follows. Nothing stays in memory once the root pixmap is
+    painted; painting again, e.g. when a monitor is plugged in, maps the file
+    again. cairocffi is imported by the worker; without it the error is
+    logged and the background left as it is.
+    """
+
+    def __init__(self, path, mode="fill", cache_dir="~/.cache/qtile/wallpapers"):
+        self.path = os.path.expanduser(path)
+        self.mode = mode
+        self.cache = SurfaceCache(cache_dir, use_mmap=True, keep=False)
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def paint(self, qtile):
+        """Paint every screen, from the cache when possible"""
+        start = monotonic()
+        missing = []
+        for screen in qtile.screens:
+            params = (screen.width, screen.height, self.mode)
+            surface = None
+            if self._lock.acquire(blocking=False):
+                try:
+                    surface = self.cache.peek(self.path, *params)
+                finally:
+                    self._lock.release()
+            if surface is None:
+                missing.append(screen)
+            else:
+                self._paint(qtile, screen, surface, start)
+        if missing:
+            asyncio.ensure_future(self._render(qtile, missing, start))
+
+    async def _render(self, qtile, screens, start):
+        loop = asyncio.get_event_loop()
+        for screen in screens:
+            params = (screen.width, screen.height, self.mode)
+            surface = await loop.run_in_executor(None, self._get, params)
+            if surface is not None:
+                self._paint(qtile, screen, surface, start)
+
+    def _get(self, params):
+        with self._lock:
+            return self.cache.get(self.path, render_wallpaper, *params)
+
+    def _paint(self, qtile, screen, surface, start):
+        try:
+            paint_root(qtile, screen, surface)
+        except Exception:
+            logger.exception("Wallpaper: unable to paint screen %d", screen.index)
+            return
+        self.timings[screen.index] = monotonic() - start
+
+    def info(self):
+        info = self.cache.info()
+        info["painted_after"] = self.timings
+        return info
@@ -27,6 +27,8 @@
 from libqtile import bar, hook, pangocffi
 from libqtile.widget import base
 
+from custom.instrument import redraw
+
 
 class WindowName(base._TextBox):
     """Displays the name of the window that currently has focus"""
@@ -45,29 +47,85 @@ class WindowName(base._TextBox):
             "string to display when no windows are focused on current group",
         ),
         ("max_chars", 0, "max number of characters to display in the widget"),
+        (
+            "title_debounce",
+            0.1,
+            "seconds to wait for a window title to settle before redrawing, "
+            "0 to redraw on every title change",
+        ),
+        ("icon_theme", None, "IconTheme to show the focused window's icon from"),
+        ("icon_size", None, "Icon size in pixels, the bar height minus 4 if None"),
+        ("icon_spacing", 4, "Space between the icon and the window name"),
     ]
 
     def __init__(self, width=bar.STRETCH, **config):
         base._TextBox.__init__(self, width=width, **config)
         self.add_defaults(WindowName.defaults)
+        self.redraws = 0
+        self.icon = None
+        self._cache = {}
+        self._pending = None
 
     def _configure(self, qtile, bar):
         base._TextBox._configure(self, qtile, bar)
         hook.subscribe.startup_once(self.update)
-        hook.subscribe.client_name_updated(self.update)
+        hook.subscribe.client_name_updated(self.title_changed)
         hook.subscribe.focus_change(self.update)
         hook.subscribe.float_change(self.update)
+        hook.subscribe.client_killed(self.forget)
+        if self.icon_theme is not None:
+            if self.icon_size is None:
+                self.icon_size = self.bar.height - 4
+            hook.subscribe.client_new(self.load_icon)
+            # The first focus event shouldn't wait for the index.
+            self.icon_theme.preload(qtile).add_done_callback(lambda _: self.update())
 
         @hook.subscribe.current_screen_change
         def on_screen_changed():
             if self.for_current_screen:
                 self.update()
 
-    def update(self, *args):
+    def current_window(self):
         if self.for_current_screen:
-            w = self.qtile.current_screen.group.current_window
-        else:
-            w = self.bar.screen.group.current_window
+            return self.qtile.current_screen.group.current_window
+        return self.bar.screen.group.current_window
+
+    def title_changed(self, window):
+        if window is not self.current_window():
+            return
+        if not self.title_debounce:
+            self.update()
+        elif self._pending is None:
+            self._pending = self.timeout_add(self.title_debounce, self.update)
+
+    def forget(self, window):
+        self._cache.pop(window.wid, None)
+
+    def icon_names(self, window):
+        # The class usually names the application, the instance less often.
+        return list(reversed(window.window.get_wm_class() or ()))
+
+    def load_icon(self, window):
+        """Rasterize the icon of a new window outside of the focus path"""
+
+        def load():
+            self.icon_theme.surface(self.icon_names(window), self.icon_size)
+            if window is self.current_window():
+                self.update()
+
+        self.qtile.call_soon(load)
+
+    def find_icon(self, window):
+        if self.icon_theme is None or window is None:
+            return None
+        names = self.icon_names(window)
+        icon = self.icon_theme.cached(names, self.icon_size)
+        if icon is None and self.icon_theme.pending(names, self.icon_size):
+            # Known icon that was never drawn, e.g. after a restart.
+            self.load_icon(window)
+        return icon
+
+    def format_window(self, w):
         state = ""
         if self.show_state and w is not None:
             if w.maximized:
@@ -76,15 +134,80 @@ class WindowName(base._TextBox):
                 state = "_ "
             elif w.floating:
                 state = "V "
-        unescaped = "%s%s" % (
-            state,
-            w.name if w and w.name else self.empty_group_string,
-        )
-        full_string = pangocffi.markup_escape_text(unescaped)
+        name = w.name if w and w.name else self.empty_group_string
+
+        key = w.wid if w is not None else None
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == (state, name):
+            return cached[1]
+
+        full_string = pangocffi.markup_escape_text("%s%s" % (state, name))
         if len(full_string) > self.max_chars > 0:
-            trunc_string = full_string[: self.max_chars] + "…"
-            self.text = trunc_string
+            text = full_string[: self.max_chars] + "…"
+        else:
+            text = full_string
+        self._cache[key] = ((state, name), text)
+        return text
+
+    def update(self, *args):
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+        window = self.current_window()
+        text = self.format_window(window)
+        icon = self.find_icon(window)
+        if text == self.text and icon is self.icon:
+            return
+        self.text = text
+        self.icon = icon
+        self.redraws += 1
+        if self.length_type == bar.STRETCH:
+            # Our length is decided by the bar, not by the text.
+            self.draw()
         else:
-            self.text = full_string
-        self.bar.draw()
+            redraw("bar:WindowName", self.bar.draw)
+
+    def reconfigure(self, changes):
+        """Called by HotReload after ``changes`` were set on this widget"""
+        # The cached titles depend on show_state, max_chars and so on.
+        self._cache = {}
+        self.update()
+
+    def icon_width(self):
+        if self.icon is None:
+            return 0
+        return self.icon.get_width() + self.icon_spacing
+
+    def calculate_length(self):
+        length = base._TextBox.calculate_length(self)
+        return length + self.icon_width() if length else 0
+
+    def draw(self):
+        if self.icon is None:
+            base._TextBox.draw(self)
+            return
+        offsetx = getattr(self, "offsetx", None)
+        if offsetx is None:
+            offsetx = self.offset
+        if offsetx is None:
+            # Not placed by the bar yet
+            return
+        self.drawer.clear(self.background or self.bar.background)
+        x = self.actual_padding or 0
+        self.drawer.ctx.set_source_surface(
+            self.icon, x, (self.bar.height - self.icon.get_height()) // 2
+        )
+        self.drawer.ctx.paint()
+        self.layout.draw(
+            x + self.icon_width(),
+            int(self.bar.height / 2.0 - self.layout.height / 2.0) + 1,
+        )
+        self.drawer.draw(offsetx=offsetx, width=self.width)
 
+    def info(self):
+        info = base._TextBox.info(self)
+        info["redraws"] = self.redraws
+        if self.icon_theme is not None:
+            info["icon_theme"] = self.icon_theme.info()
+        return info
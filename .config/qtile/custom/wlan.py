@@ -0,0 +1,217 @@
+import asyncio
+from time import monotonic
+
+from libqtile.log_utils import logger
+
+from custom.provider import Provider, ProviderText
+
+NM = "org.freedesktop.NetworkManager"
+NM_PATH = "/org/freedesktop/NetworkManager"
+WIRELESS_INTERFACE = "org.freedesktop.NetworkManager.Device.Wireless"
+ACCESS_POINT_INTERFACE = "org.freedesktop.NetworkManager.AccessPoint"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+MATCH_RULES = [
+    "type='signal',sender='org.freedesktop.NetworkManager',"
+    "interface='org.freedesktop.DBus.Properties',member='PropertiesChanged'",
+    "type='signal',sender='org.freedesktop.DBus',interface='org.freedesktop.DBus',"
+    "member='NameOwnerChanged',arg0='org.freedesktop.NetworkManager'",
+]
+
+
+class Wireless(Provider):
+    """ESSID and signal strength of a wireless interface, from NetworkManager
+
+    Association changes arrive as D-Bus signals and are published right
+    away. Strength changes of the access point are cached and published at
+    most once per ``strength_interval`` seconds, so a fluctuating signal
+    doesn't redraw the bar constantly. The value is an ``(essid, strength)``
+    tuple, with an essid of None when disconnected. dbus_next is only
+    imported on start; without it the interface is shown as disconnected.
+    """
+
+    def __init__(self, interface="wlan0", strength_interval=30, bus_address=None):
+        Provider.__init__(self)
+        self.interface = interface
+        self.strength_interval = strength_interval
+        self.bus_address = bus_address
+
+        self.bus = None
+        self.device = None
+        self.access_point = None
+        self.essid = None
+        self.strength = 0
+        self._published_at = 0
+        self._strength_handle = None
+
+    def start(self):
+        asyncio.ensure_future(self._connect())
+
+    def stop(self):
+        if self._strength_handle is not None:
+            self._strength_handle.cancel()
+            self._strength_handle = None
+        if self.bus is not None:
+            self.bus.disconnect()
+            self.bus = None
+
+    async def _call(self, path, interface, member, signature="", body=()):
+        from dbus_next import Message, MessageType
+
+        reply = await self.bus.call(
+            Message(
+                destination=NM,
+                path=path,
+                interface=interface,
+                member=member,
+                signature=signature,
+                body=list(body),
+            )
+        )
+        if reply.message_type == MessageType.ERROR:
+            raise RuntimeError(reply.error_name)
+        return reply.body
+
+    async def _connect(self):
+        try:
+            from dbus_next import BusType, Message
+            from dbus_next.aio import MessageBus
+        except ImportError as e:
+            logger.error("Wireless: %s, no wireless state", e)
+            self._set_access_point("/")
+            return
+
+        if self.bus_address:
+            bus = MessageBus(bus_address=self.bus_address)
+        else:
+            bus = MessageBus(bus_type=BusType.SYSTEM)
+        try:
+            self.bus = await bus.connect()
+        except Exception:
+            logger.exception("Wireless: unable to connect to D-Bus")
+            self._set_access_point("/")
+            return
+
+        self.bus.add_message_handler(self._on_message)
+        for rule in MATCH_RULES:
+            await self.bus.call(
+                Message(
+                    destination="org.freedesktop.DBus",
+                    path="/org/freedesktop/DBus",
+                    interface="org.freedesktop.DBus",
+                    member="AddMatch",
+                    signature="s",
+                    body=[rule],
+                )
+            )
+        await self._load_device()
+
+    async def _load_device(self):
+        try:
+            (self.device,) = await self._call(
+                NM_PATH, NM, "GetDeviceByIpIface", "s", [self.interface]
+            )
+            (access_point,) = await self._call(
+                self.device, PROPERTIES_INTERFACE, "Get", "ss",
+                [WIRELESS_INTERFACE, "ActiveAccessPoint"],
+            )
+        except RuntimeError as e:
+            # NetworkManager is not running, NameOwnerChanged tells us when it is.
+            logger.info("Wireless: %s", e)
+            self.device = None
+            self._set_access_point("/")
+            return
+        await self._load_access_point(access_point.value)
+
+    async def _load_access_point(self, path):
+        if path == "/":
+            self._set_access_point(path)
+            return
+        try:
+            (properties,) = await self._call(
+                path, PROPERTIES_INTERFACE, "GetAll", "s", [ACCESS_POINT_INTERFACE]
+            )
+        except RuntimeError as e:
+            logger.warning("Wireless: unable to read %s: %s", path, e)
+            return
+        ssid = properties["Ssid"].value
+        self._set_access_point(
+            path, bytes(ssid).decode("utf-8", "replace"), properties["Strength"].value
+        )
+
+    def _set_access_point(self, path, essid=None, strength=0):
+        self.access_point = path
+        self.essid = essid
+        self.strength = strength
+        self._publish()
+
+    def _on_message(self, message):
+        from dbus_next import MessageType
+
+        if message.message_type != MessageType.SIGNAL:
+            return
+
+        if message.member == "PropertiesChanged":
+            interface, changed, _ = message.body
+            if interface == WIRELESS_INTERFACE and message.path == self.device:
+                if "ActiveAccessPoint" in changed:
+                    path = changed["ActiveAccessPoint"].value
+                    asyncio.ensure_future(self._load_access_point(path))
+            elif interface == ACCESS_POINT_INTERFACE and message.path == self.access_point:
+                if "Ssid" in changed:
+                    self.essid = bytes(changed["Ssid"].value).decode("utf-8", "replace")
+                    self._publish()
+                if "Strength" in changed:
+                    self.strength = changed["Strength"].value
+                    self._publish_strength()
+
+        elif message.member == "NameOwnerChanged":
+            _, _, new_owner = message.body
+            if new_owner:
+                asyncio.ensure_future(self._load_device())
+            else:
+                self.device = None
+                self._set_access_point("/")
+
+    def _publish_strength(self):
+        if self._strength_handle is not None:
+            return
+        wait = self._published_at + self.strength_interval - monotonic()
+        if wait <= 0:
+            self._publish()
+        else:
+            self._strength_handle = asyncio.get_event_loop().call_later(
+                wait, self._publish
+            )
+
+    def _publish(self):
+        if self._strength_handle is not None:
+            self._strength_handle.cancel()
+            self._strength_handle = None
+        self._published_at = monotonic()
+        self.publish((self.essid, self.strength))
+
+
+class Wlan(ProviderText):
+    """Displays the ESSID and signal strength of a Wireless provider"""
+
+    defaults = [
+        (
+            "display_format",
+            "{essid} {percent:2.0%}",
+            "Format with {essid}, {quality} (0-100) and {percent}",
+        ),
+        ("disconnected_message", "Disconnected", "Text shown when disconnected"),
+    ]
+
+    def __init__(self, **config):
+        ProviderText.__init__(self, **config)
+        self.add_defaults(Wlan.defaults)
+
+    def format(self, value):
+        essid, strength = value
+        if essid is None:
+            return self.disconnected_message
+        return self.display_format.format(
+            essid=essid, quality=strength, percent=strength / 100
+        )
@@ -0,0 +1,15 @@
+"""Run the tests against the harness stubs of libqtile, dbus_next and cairocffi
+
+Only the parts that don't need a running qtile are tested: parsers,
+providers fed by fake files and commands, and the bookkeeping around them.
+"""
+import os
+import sys
+
+CONFIG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONFIG_DIR)
+
+from custom.harness import stub_modules  # noqa: E402
+
+for _name, _module in stub_modules().items():
+    sys.modules.setdefault(_name, _module)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+
+from custom.backlight import Backlight
+
+
+def fake_sysfs(tmp_path, brightness=100, max_brightness=200):
+    device = tmp_path / "intel_backlight"
+    device.mkdir()
+    (device / "brightness").write_text("%d\n" % brightness)
+    (device / "max_brightness").write_text("%d\n" % max_brightness)
+    return device
+
+
+def level(device):
+    # Unlike sysfs, a regular file keeps the tail of a longer old value.
+    return int((device / "brightness").read_text())
+
+
+def backlight(tmp_path, **kwargs):
+    return Backlight(device="intel_backlight", sysfs_root=str(tmp_path), **kwargs)
+
+
+def run(provider, *changes, wait=0.2):
+    async def main():
+        provider.start()
+        for percent in changes:
+            provider.change(percent)
+        await asyncio.sleep(wait)
+        provider.stop()
+
+    asyncio.run(main())
+
+
+def test_jump_to_target(tmp_path):
+    device = fake_sysfs(tmp_path)
+    provider = backlight(tmp_path, frame=0.01, ramp=0)
+    values = []
+    provider.subscribers.append(values.append)
+    run(provider, 5, 5)
+    assert level(device) == 120
+    assert values == [50, 60]
+
+
+def test_ramp_steps_towards_target(tmp_path):
+    device = fake_sysfs(tmp_path)
+    provider = backlight(tmp_path, frame=0.01, ramp=0.04)
+    values = []
+    provider.subscribers.append(values.append)
+    run(provider, -20)
+    assert level(device) == 60
+    assert values == [50, 45, 40, 35, 30]
+
+
+def test_target_is_clamped(tmp_path):
+    device = fake_sysfs(tmp_path)
+    provider = backlight(tmp_path, frame=0.01, ramp=0, minimum=10)
+    run(provider, -100)
+    assert level(device) == 10
+
+
+def test_change_picks_up_outside_writes(tmp_path):
+    device = fake_sysfs(tmp_path)
+    provider = backlight(tmp_path, frame=0.01, ramp=0)
+
+    async def main():
+        provider.start()
+        (device / "brightness").write_text("180\n")
+        provider.change(5)
+        await asyncio.sleep(0.1)
+        provider.stop()
+
+    asyncio.run(main())
+    assert level(device) == 190
+
+
+def test_missing_device(tmp_path):
+    provider = backlight(tmp_path)
+    run(provider, 5, wait=0)
+    assert provider.value is None
+
+
+def test_brightnessctl_without_write_access(tmp_path):
+    device = fake_sysfs(tmp_path)
+    brightnessctl = tmp_path / "brightnessctl"
+    brightnessctl.write_text(
+        "#!%s\nimport sys\nopen(%r, 'w').write(sys.argv[4] + '\\n')\n"
+        % (sys.executable, str(device / "brightness"))
+    )
+    os.chmod(brightnessctl, 0o755)
+    provider = backlight(tmp_path, frame=0.01, ramp=0, brightnessctl=str(brightnessctl))
+    provider._open()
+    provider.writable = False
+    provider.use_logind = False
+    run(provider, 10, wait=0.5)
+    assert level(device) == 120
+    assert provider.brightness == 120
@@ -0,0 +1,139 @@
+import asyncio
+import socket
+from types import SimpleNamespace
+
+from custom.battery import Battery, BatteryStatus, PowerSupply, read_uevent
+
+DISCHARGING = """POWER_SUPPLY_NAME=BAT0
+POWER_SUPPLY_STATUS=Discharging
+POWER_SUPPLY_PRESENT=1
+POWER_SUPPLY_POWER_NOW=10000000
+POWER_SUPPLY_ENERGY_FULL=50000000
+POWER_SUPPLY_ENERGY_NOW=20000000
+POWER_SUPPLY_CAPACITY=40
+"""
+
+PLUG_EVENT = b"\0".join(
+    [
+        b"change@/devices/LNXSYSTM:00/ACPI0003:00/power_supply/AC",
+        b"ACTION=change",
+        b"SUBSYSTEM=power_supply",
+        b"POWER_SUPPLY_NAME=AC",
+        b"POWER_SUPPLY_ONLINE=1",
+    ]
+)
+
+
+def fake_battery(tmp_path, uevent=DISCHARGING):
+    battery = tmp_path / "BAT0"
+    battery.mkdir(exist_ok=True)
+    (battery / "uevent").write_text(uevent)
+    return battery
+
+
+def supply(tmp_path, **kwargs):
+    return PowerSupply(sysfs_root=str(tmp_path), netlink=False, **kwargs)
+
+
+def test_read_uevent(tmp_path):
+    fields = read_uevent(str(fake_battery(tmp_path)))
+    assert fields["STATUS"] == "Discharging"
+    assert fields["ENERGY_NOW"] == "20000000"
+    assert "NAME" in fields and "POWER_SUPPLY_NAME" not in fields
+
+
+def test_status_from_energy(tmp_path):
+    status = supply(tmp_path)._status(read_uevent(str(fake_battery(tmp_path))))
+    assert status == BatteryStatus("Discharging", 0.4, 2 * 3600)
+
+
+def test_status_from_charge_and_capacity(tmp_path):
+    provider = supply(tmp_path)
+    charging = {
+        "STATUS": "Charging",
+        "CHARGE_NOW": "3000",
+        "CHARGE_FULL": "4000",
+        "CURRENT_NOW": "-2000",
+    }
+    assert provider._status(charging) == BatteryStatus("Charging", 0.75, 1800)
+    assert provider._status({"STATUS": "Full", "CAPACITY": "100"}) == BatteryStatus(
+        "Full", 1.0, None
+    )
+
+
+def test_estimate_uses_mean_draw_of_state(tmp_path):
+    provider = supply(tmp_path)
+    fields = {"STATUS": "Discharging", "ENERGY_NOW": "30", "ENERGY_FULL": "60"}
+    provider._status(dict(fields, POWER_NOW="10"))
+    assert provider._status(dict(fields, POWER_NOW="20")).seconds == 2 * 3600
+    charging = dict(fields, STATUS="Charging", POWER_NOW="30")
+    assert provider._status(charging).seconds == 3600
+
+
+def test_next_interval(tmp_path):
+    provider = supply(tmp_path, low_percentage=0.1)
+    assert provider.next_interval(BatteryStatus("Full", 1.0, None)) == 300
+    assert provider.next_interval(BatteryStatus("Discharging", 0.15, 900)) == 10
+    assert provider.next_interval(BatteryStatus("Discharging", 0.5, 9000)) == 60
+    assert provider.next_interval(BatteryStatus("Charging", 0.15, 900)) == 60
+
+
+def test_uevents_trigger_one_read(tmp_path):
+    battery = fake_battery(tmp_path)
+    kernel, ours = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    provider = supply(tmp_path, uevent_socket=ours)
+    values = []
+
+    async def main():
+        provider.subscribe(values.append)
+        (battery / "uevent").write_text(
+            DISCHARGING.replace("Discharging", "Charging")
+        )
+        kernel.send(PLUG_EVENT)
+        kernel.send(PLUG_EVENT.replace(b"/AC", b"/BAT0"))
+        kernel.send(b"add@/devices/usb1\0SUBSYSTEM=usb")
+        await asyncio.sleep(0.05)
+        provider.unsubscribe(values.append)
+
+    asyncio.run(main())
+    kernel.close()
+    ours.close()
+    assert [status.state for status in values] == ["Discharging", "Charging"]
+    assert provider.reads == 2
+    assert provider.uevents == 1
+
+
+def test_missing_battery(tmp_path):
+    provider = supply(tmp_path)
+
+    async def main():
+        provider.read()
+        provider.stop()
+
+    asyncio.run(main())
+    assert provider.value == BatteryStatus("Unknown", 0.0, None)
+
+
+class Widget(Battery):
+    """A Battery widget counting its redraws"""
+
+    def __init__(self, **config):
+        Battery.__init__(self, provider=None, foreground="ffffff", **config)
+        self.text = ""
+        self.layout = SimpleNamespace(colour=None, width=0)
+        self.bar = SimpleNamespace(draw=lambda: None)
+        self.drawn = 0
+
+    def draw(self):
+        self.drawn += 1
+
+
+def test_colour_change_is_redrawn():
+    widget = Widget(display_format="{char}", low_percentage=0.2)
+    widget.on_value(BatteryStatus("Discharging", 0.25, 3600))
+    assert (widget.text, widget.layout.colour) == ("V", "ffffff")
+    widget.on_value(BatteryStatus("Discharging", 0.15, 2000))
+    assert (widget.text, widget.layout.colour) == ("V", "FF0000")
+    assert widget.drawn == 2
+    widget.on_value(BatteryStatus("Discharging", 0.14, 1900))
+    assert widget.drawn == 2
@@ -0,0 +1,165 @@
+import asyncio
+
+from dbus_next import MessageType
+
+from custom.bluetooth import (
+    ADAPTER_INTERFACE,
+    DEVICE_INTERFACE,
+    Bluetooth,
+    BluetoothState,
+)
+
+ADAPTER = "/org/bluez/hci0"
+HEADSET = "/org/bluez/hci0/dev_00_1B_66_AA_BB_CC"
+MOUSE = "/org/bluez/hci0/dev_E4_17_D8_11_22_33"
+
+
+class Variant:
+    def __init__(self, value):
+        self.value = value
+
+
+def variants(**properties):
+    return {name: Variant(value) for name, value in properties.items()}
+
+
+class Message:
+    def __init__(self, member, path="/", body=(), message_type=MessageType.SIGNAL):
+        self.message_type = message_type
+        self.member = member
+        self.path = path
+        self.body = list(body)
+        self.error_name = None
+
+
+def added(path, interface, **properties):
+    return Message("InterfacesAdded", "/", [path, {interface: variants(**properties)}])
+
+
+def changed(path, interface, invalidated=(), **properties):
+    return Message(
+        "PropertiesChanged", path, [interface, variants(**properties), list(invalidated)]
+    )
+
+
+class MockBlueZ:
+    """A bus on which BlueZ answers GetManagedObjects with ``objects``"""
+
+    def __init__(self, objects=None):
+        self.objects = objects
+
+    async def call(self, message):
+        if self.objects is None:
+            reply = Message(None, message_type=MessageType.ERROR)
+            reply.error_name = "org.freedesktop.DBus.Error.ServiceUnknown"
+            return reply
+        body = [
+            {
+                path: {name: variants(**props) for name, props in interfaces.items()}
+                for path, interfaces in self.objects.items()
+            }
+        ]
+        return Message(None, body=body, message_type=MessageType.METHOD_RETURN)
+
+    def disconnect(self):
+        pass
+
+
+def state():
+    provider = BluetoothState()
+    values = []
+    provider.subscribers.append(values.append)
+    return provider, values
+
+
+def test_devices_from_interface_and_property_signals():
+    provider, values = state()
+    provider._on_message(added(ADAPTER, ADAPTER_INTERFACE, Powered=True))
+    provider._on_message(
+        added(HEADSET, DEVICE_INTERFACE, Alias="WH-1000XM4", Connected=False)
+    )
+    provider._on_message(changed(HEADSET, DEVICE_INTERFACE, Connected=True))
+    provider._on_message(
+        added(MOUSE, DEVICE_INTERFACE, Name="MX Master", Connected=True)
+    )
+    provider._on_message(changed(HEADSET, DEVICE_INTERFACE, RSSI=-60))
+    assert values == [
+        (True, ()),
+        (True, ("WH-1000XM4",)),
+        (True, ("MX Master", "WH-1000XM4")),
+    ]
+
+
+def test_adapter_power_and_removal():
+    provider, values = state()
+    provider._on_message(added(ADAPTER, ADAPTER_INTERFACE, Powered=True))
+    provider._on_message(added(MOUSE, DEVICE_INTERFACE, Alias="Mouse", Connected=True))
+    provider._on_message(
+        Message("InterfacesRemoved", "/", [MOUSE, [DEVICE_INTERFACE]])
+    )
+    provider._on_message(changed(ADAPTER, ADAPTER_INTERFACE, Powered=False))
+    assert values == [(True, ()), (True, ("Mouse",)), (True, ()), (False, ())]
+
+
+def test_invalidated_properties_are_dropped():
+    provider, values = state()
+    provider._on_message(added(HEADSET, DEVICE_INTERFACE, Alias="Buds", Connected=True))
+    provider._on_message(changed(HEADSET, DEVICE_INTERFACE, invalidated=["Alias"]))
+    assert provider.connected_devices() == [""]
+
+
+def test_other_messages_are_ignored():
+    provider, values = state()
+    provider._on_message(
+        Message("InterfacesAdded", message_type=MessageType.METHOD_CALL)
+    )
+    provider._on_message(
+        changed("/org/bluez/hci0", "org.bluez.Media1", Playing=True)
+    )
+    assert values == []
+
+
+def test_bluez_going_away_clears_the_model():
+    provider, values = state()
+    provider._on_message(added(ADAPTER, ADAPTER_INTERFACE, Powered=True))
+    provider._on_message(
+        Message("NameOwnerChanged", body=["org.bluez", ":1.5", ""])
+    )
+    assert values[-1] == (False, ())
+    assert provider.adapters == {}
+
+
+def test_objects_loaded_from_mock_bluez():
+    provider, values = state()
+    provider.bus = MockBlueZ(
+        {
+            ADAPTER: {ADAPTER_INTERFACE: {"Powered": True}},
+            HEADSET: {DEVICE_INTERFACE: {"Alias": "Headset", "Connected": True}},
+            MOUSE: {DEVICE_INTERFACE: {"Alias": "Mouse", "Connected": False}},
+        }
+    )
+    asyncio.run(provider._load_objects())
+    assert values == [(True, ("Headset",))]
+
+
+def test_bluez_not_running():
+    provider, values = state()
+    provider.bus = MockBlueZ()
+    asyncio.run(provider._load_objects())
+    assert values == [(False, ())]
+
+
+def test_connect_failure_publishes_off():
+    provider, values = state()
+    provider.bus_address = "unix:path=/nonexistent"
+    asyncio.run(provider._connect())
+    assert values == [(False, ())]
+
+
+def test_format():
+    widget = Bluetooth(provider=BluetoothState())
+    off = widget.format((False, ()))
+    assert widget.off_text in off and widget.color_off in off
+    on = widget.format((True, ("Buds", "Mouse")))
+    assert ">Buds</span>, <span" in on
+    assert widget.color_on in on and widget.off_text not in on
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from custom.groupbox import SegmentedGroupBox
+from custom.harness import Stub
+
+
+class Bar:
+    def __init__(self):
+        self.height = 24
+        self.background = "#242831"
+        self.screen = None
+        self.draws = 0
+
+    def draw(self):
+        self.draws += 1
+
+
+class GroupBox(SegmentedGroupBox):
+    """A SegmentedGroupBox whose GroupBox methods measure and draw nothing"""
+
+    def __init__(self, **config):
+        SegmentedGroupBox.__init__(
+            self, margin_x=3, spacing=2, cluster_gap=6, **config
+        )
+        self.drawn = 0
+
+    def box_width(self, groups):
+        return 10 * max(len(group.label) for group in groups)
+
+    def draw(self):
+        self.drawn += 1
+
+
+def groupbox(*labels):
+    widget = GroupBox(clusters=[["1", "2"], ["3"]])
+    widget.qtile = SimpleNamespace(
+        groups=[
+            SimpleNamespace(name=name, label=label)
+            for name, label in zip("123", labels)
+        ]
+    )
+    widget.bar = Bar()
+    widget.drawer = Stub()
+    return widget
+
+
+def test_layout_has_a_gap_between_clusters():
+    widget = groupbox("a", "b", "c")
+    assert widget.calculate_length() == 3 + 10 + 2 + 10 + 6 + 10 + 3
+    assert [x for _, x, _ in widget.boxes] == [3, 15, 31]
+
+
+def test_refresh_repaints_only_the_widget_when_the_length_is_kept():
+    widget = groupbox("a", "b", "c")
+    widget.calculate_length()
+    widget.offsetx = 40
+    widget.refresh()
+    widget.qtile.groups[0].label = "x"
+    widget.refresh()
+    assert (widget.bar.draws, widget.drawn) == (0, 2)
+
+
+def test_refresh_draws_the_bar_when_the_length_changes():
+    widget = groupbox("a", "b", "c")
+    widget.calculate_length()
+    widget.offsetx = 40
+    widget.qtile.groups[2].label = "ccc"
+    widget.refresh()
+    assert (widget.bar.draws, widget.drawn) == (1, 0)
+
+
+def test_refresh_leaves_an_unplaced_widget_to_the_bar():
+    widget = groupbox("a", "b", "c")
+    widget.calculate_length()
+    widget.refresh()
+    assert (widget.bar.draws, widget.drawn) == (0, 0)
@@ -0,0 +1,89 @@
+
+import pytest
+
+from custom import instrument as perf
+from custom.provider import Provider, ProviderText
+from libqtile import hook
+
+
+class Layout:
+    """A text layout one pixel wide per character"""
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.colour = None
+
+    @property
+    def width(self):
+        return len(self.widget.text)
+
+
+class Text(ProviderText):
+    def __init__(self, provider, bar):
+        ProviderText.__init__(self, provider=provider, name=type(provider).__name__)
+        self.text = ""
+        self.layout = Layout(self)
+        self.bar = bar
+
+    def draw(self):
+        pass
+
+
+class Bar:
+    def __init__(self):
+        self.widgets = []
+
+    def draw(self):
+        for widget in self.widgets:
+            widget.draw()
+
+
+class Volume(Provider):
+    pass
+
+
+class Battery(Provider):
+    pass
+
+
+@pytest.fixture
+def widgets(monkeypatch):
+    monkeypatch.setenv(perf.ENV_VARIABLE, "1")
+    monkeypatch.setattr(perf._State, "widgets", {})
+    monkeypatch.setattr(perf._State, "triggers", [])
+    bar = Bar()
+    # Firing a hook redraws the first widget, like a hook subscriber would.
+    monkeypatch.setattr(hook, "fire", lambda event: bar.widgets[0].draw())
+    bar.widgets = [Text(Volume(), bar), Text(Battery(), bar)]
+    perf.instrument(bar.widgets)
+    yield bar.widgets
+    perf._State.enabled = False
+
+
+def causes(widget):
+    triggers = widget.perf.info()["triggers"]
+    return {cause: info["count"] for cause, info in triggers.items()}
+
+
+def test_draws_are_attributed_to_their_cause(widgets):
+    volume, battery = widgets
+    volume.on_value("50%")
+    volume.on_value("60%")
+    battery.on_value("80%")
+    volume.on_value("100%")
+    hook.fire("setgroup")
+    assert causes(volume) == {
+        "bar:Volume": 2,
+        "Volume": 1,
+        "bar:Battery": 1,
+        "setgroup": 1,
+    }
+    assert causes(battery) == {"bar:Volume": 2, "bar:Battery": 1}
+    assert volume.perf.info()["draw"]["count"] == 5
+    assert volume.perf.info()["poll"]["count"] == 3
+
+
+def test_redraw_without_instrumentation():
+    drawn = []
+    perf.redraw("bar:Volume", lambda: drawn.append(list(perf._State.triggers)))
+    assert drawn == [[]]
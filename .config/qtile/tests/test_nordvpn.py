@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from custom.nordvpn import (
+    CONNECTED_FORMAT,
+    DISCONNECTED_FORMAT,
+    ServerLists,
+    parse_list,
+    parse_status,
+    status_text,
+)
+
+CONNECTED = """\r-\r  \rStatus: Connected
+Current server: de1042.nordvpn.com
+Country: Germany
+City: Frankfurt
+Uptime: 1 hour 3 minutes
+"""
+
+
+def fake_cli(tmp_path, body):
+    path = tmp_path / "nordvpn"
+    path.write_text("#!%s\nimport sys, time\n%s\n" % (sys.executable, body))
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def test_parse_status():
+    fields = parse_status(CONNECTED)
+    assert fields["status"] == "Connected"
+    assert fields["current server"] == "de1042.nordvpn.com"
+    assert fields["country"] == "Germany"
+
+
+def test_status_text():
+    assert status_text(CONNECTED) == CONNECTED_FORMAT.format(country="Germany")
+    assert status_text("Status: Disconnected\n") == DISCONNECTED_FORMAT
+    assert status_text(CONNECTED, connected_format="{city}") == "Frankfurt"
+    with pytest.raises(ValueError):
+        status_text("Please check your internet connection\n")
+
+
+def test_parse_list():
+    output = "\r-\r  \rUnited_States, Germany,\tAlbania\nBelgium, -\n"
+    assert parse_list(output) == ["Albania", "Belgium", "Germany", "United_States"]
+    assert parse_list("") == []
+
+
+def test_lists_are_cached(tmp_path):
+    command = fake_cli(tmp_path, "print('Germany, Albania')")
+    cache_path = str(tmp_path / "cache.json")
+    lists = ServerLists(command=command, cache_path=cache_path)
+    assert asyncio.run(lists.countries()) == ["Albania", "Germany"]
+
+    os.remove(command)
+    lists = ServerLists(command=command, cache_path=cache_path)
+    assert asyncio.run(lists.countries()) == ["Albania", "Germany"]
+
+
+def test_cancelled_fetch_resolves_other_waiters(tmp_path):
+    command = fake_cli(tmp_path, "time.sleep(5)")
+    lists = ServerLists(command=command, cache_path=str(tmp_path / "cache.json"))
+
+    async def main():
+        first = asyncio.ensure_future(lists.countries())
+        await asyncio.sleep(0.1)
+        second = asyncio.ensure_future(lists.countries())
+        await asyncio.sleep(0.1)
+        first.cancel()
+        return await asyncio.wait_for(second, 1)
+
+    assert asyncio.run(main()) == []
+    assert lists._fetching == {}
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from custom.harness import Stub
+from custom.pill import Pill
+from libqtile.widget import base
+
+
+class Cap:
+    def __init__(self, width):
+        self.width = width
+        self.height = 10
+
+    def draw(self, x, y):
+        pass
+
+
+class Child(base._Widget):
+    def __init__(self, length):
+        base._Widget.__init__(self, length=length)
+        self.length = length
+        self.drawn_at = None
+        self.pressed = None
+
+    def draw(self):
+        self.drawn_at = self.offsetx
+
+    def button_press(self, x, y, button):
+        self.pressed = (x, button)
+
+
+def pill(*widgets):
+    widget = Pill(*widgets, margin=4)
+    widget.caps = [Cap(6), Cap(8)]
+    widget.offsetx = 100
+    widget.bar = SimpleNamespace(height=24, background="#242831")
+    widget.drawer = Stub()
+    return widget
+
+
+def test_children_are_placed_after_the_head():
+    first, second = Child(20), Child(30)
+    widget = pill(first, second)
+    widget.draw()
+    assert (first.drawn_at, second.drawn_at) == (106, 126)
+    assert widget.calculate_length() == 6 + 20 + 30 + 8 + 4
+
+
+def test_clicks_go_to_the_child_under_the_pointer():
+    first, second = Child(20), Child(30)
+    widget = pill(first, second)
+    widget.button_press(30, 5, 1)
+    assert first.pressed is None
+    assert second.pressed == (4, 1)
+    widget.button_press(2, 5, 1)
+    assert first.pressed is None
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+
+from custom.poll import PollService, Source
+
+
+def echo(text, exit_status=0):
+    return (
+        sys.executable,
+        "-c",
+        "import sys; print(%r); sys.exit(%d)" % (text, exit_status),
+    )
+
+
+def poll(service, source):
+    asyncio.run(service._poll(source))
+
+
+def test_next_delay_backs_off_exponentially():
+    source = Source("updates", echo(""), interval=60, max_backoff=300)
+    assert source.next_delay() == 60
+    source.consecutive_failures = 1
+    assert source.next_delay() == 120
+    source.consecutive_failures = 2
+    assert source.next_delay() == 240
+    source.consecutive_failures = 3
+    assert source.next_delay() == 300
+
+
+def test_failures_back_off_and_success_resets():
+    service = PollService()
+    source = service.add(Source("updates", echo("3", exit_status=2), interval=10))
+    poll(service, source)
+    poll(service, source)
+    assert source.failures == 2
+    assert source.consecutive_failures == 2
+    assert source.next_delay() == 40
+    assert source.value is None
+
+    source.command = echo("3")
+    poll(service, source)
+    assert source.consecutive_failures == 0
+    assert source.last_error is None
+    assert source.next_delay() == 10
+    assert source.value == "3"
+    assert source.runs == 3
+
+
+def test_parser_error_keeps_last_value():
+    service = PollService()
+    source = service.add(Source("updates", echo("3"), parser=int))
+    poll(service, source)
+    source.command = echo("many")
+    poll(service, source)
+    assert source.value == 3
+    assert source.failures == 1
+    assert source.changes == 1
+
+
+def test_timeout_counts_as_failure():
+    service = PollService()
+    command = (sys.executable, "-c", "import time; time.sleep(5)")
+    source = service.add(Source("slow", command, timeout=0.1))
+    poll(service, source)
+    assert source.timeouts == 1
+    assert source.consecutive_failures == 1
+
@@ -0,0 +1,128 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+import custom.procs
+from custom.procs import (
+    CLOCK_TICKS,
+    PAGE_SIZE,
+    ProcessPicker,
+    ProcessTable,
+    read_process,
+)
+
+
+def write_process(root, pid, ppid, name, ticks, start=100, pages=10, cmdline=None):
+    directory = root / str(pid)
+    directory.mkdir(exist_ok=True)
+    # utime and stime are fields 14 and 15, starttime is 22.
+    fields = ["S", ppid] + [0] * 9 + [ticks, 0] + [0] * 6 + [start]
+    (directory / "stat").write_text(
+        "%d (%s) %s\n" % (pid, name, " ".join(map(str, fields)))
+    )
+    (directory / "statm").write_text("100 %d 5 1 0 20 0\n" % pages)
+    (directory / "cmdline").write_bytes((cmdline or name).encode() + b"\0--flag\0")
+
+
+def fake_proc(tmp_path, uptime=1000.0):
+    (tmp_path / "uptime").write_text("%.2f 500.00\n" % uptime)
+    (tmp_path / "self").mkdir()
+    return tmp_path
+
+
+def test_read_process(tmp_path):
+    root = fake_proc(tmp_path)
+    write_process(root, 42, 1, "Web Content) x", ticks=7, pages=3)
+    process = read_process(str(root / "42"), 42)
+    assert process.name == "Web Content) x"
+    assert (process.ppid, process.state, process.ticks) == (1, "S", 7)
+    assert process.rss == 3 * PAGE_SIZE
+    assert process.command == "Web Content) x --flag"
+    assert read_process(str(root / "43"), 43) is None
+
+
+def test_cpu_between_snapshots(tmp_path):
+    root = fake_proc(tmp_path)
+    write_process(root, 10, 1, "busy", ticks=1000)
+    write_process(root, 11, 1, "idle", ticks=5000)
+    table = ProcessTable(proc_root=str(root))
+    table.snapshot()
+
+    write_process(root, 10, 1, "busy", ticks=1000 + CLOCK_TICKS)
+    table.snapshot(force=True)
+    table.previous_at = table.taken_at - 2
+    processes = table.processes
+    assert table.cpu(processes[10]) == pytest.approx(50)
+    assert table.cpu(processes[11]) == 0
+
+
+def test_cpu_without_previous_snapshot(tmp_path):
+    root = fake_proc(tmp_path, uptime=110.0)
+    write_process(root, 10, 1, "new", ticks=5 * CLOCK_TICKS, start=10 * CLOCK_TICKS)
+    table = ProcessTable(proc_root=str(root))
+    process = table.snapshot()[10]
+    assert table.cpu(process) == pytest.approx(5)
+
+
+def test_reused_pid_is_not_compared(tmp_path):
+    root = fake_proc(tmp_path, uptime=200.0)
+    write_process(root, 10, 1, "old", ticks=50 * CLOCK_TICKS)
+    table = ProcessTable(proc_root=str(root))
+    table.snapshot()
+    write_process(root, 10, 1, "new", ticks=CLOCK_TICKS, start=100 * CLOCK_TICKS)
+    process = table.snapshot(force=True)[10]
+    assert table.cpu(process) == pytest.approx(1)
+
+
+def test_snapshot_is_reused_within_ttl(tmp_path):
+    root = fake_proc(tmp_path)
+    write_process(root, 10, 1, "a", ticks=1)
+    table = ProcessTable(proc_root=str(root), ttl=60)
+    first = table.snapshot()
+    write_process(root, 11, 1, "b", ticks=1)
+    assert table.fresh()
+    assert table.snapshot() is first
+    assert 11 in table.snapshot(force=True)
+
+
+def test_other_users_are_skipped(tmp_path):
+    root = fake_proc(tmp_path)
+    write_process(root, 10, 1, "a", ticks=1)
+    table = ProcessTable(proc_root=str(root), uid=-1)
+    assert table.snapshot() == {}
+
+
+def test_tree_sorted_by_subtree(tmp_path):
+    root = fake_proc(tmp_path)
+    write_process(root, 10, 1, "shell", ticks=0, pages=1)
+    write_process(root, 11, 10, "compiler", ticks=0, pages=50)
+    write_process(root, 20, 1, "editor", ticks=0, pages=30)
+    write_process(root, 12, 10, "pager", ticks=0, pages=2)
+    table = ProcessTable(proc_root=str(root))
+    tree = [(depth, process.name) for depth, process, _ in table.tree("rss")]
+    assert tree == [(0, "shell"), (1, "compiler"), (1, "pager"), (0, "editor")]
+
+
+def test_picker_opens_at_once_and_samples_after(tmp_path, monkeypatch):
+    root = fake_proc(tmp_path)
+    write_process(root, 10, 1, "busy", ticks=1000)
+    shown = []
+
+    async def dmenu(lines, prompt):
+        shown.append(monotonic() - start)
+        return None
+
+    async def main():
+        await picker.run()
+        assert table.previous == {}
+        await asyncio.sleep(0.2)
+
+    monkeypatch.setattr(custom.procs, "dmenu", dmenu)
+    table = ProcessTable(proc_root=str(root))
+    picker = ProcessPicker(table, sample=0.1)
+    start = monotonic()
+    asyncio.run(main())
+    assert shown[0] < 0.1
+    # The second sample gives the next menu a baseline for CPU usage.
+    assert 10 in table.previous
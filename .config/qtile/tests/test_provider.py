@@ -0,0 +1,69 @@
+from custom.provider import Provider
+
+
+class Counter(Provider):
+    def __init__(self, initial=None):
+        Provider.__init__(self)
+        self.initial = initial
+        self.starts = 0
+        self.stops = 0
+
+    def start(self):
+        self.starts += 1
+        if self.initial is not None:
+            self.publish(self.initial)
+
+    def stop(self):
+        self.stops += 1
+
+
+def test_publish_only_changes():
+    provider = Counter()
+    values = []
+    provider.subscribe(values.append)
+    provider.publish((True, ("headset",)))
+    provider.publish((True, ("headset",)))
+    provider.publish((False, ()))
+    assert values == [(True, ("headset",)), (False, ())]
+
+
+def test_started_by_first_and_stopped_by_last_subscriber():
+    provider = Counter()
+    first, second = [], []
+    provider.subscribe(first.append)
+    provider.subscribe(second.append)
+    assert provider.starts == 1
+    provider.unsubscribe(first.append)
+    assert provider.stops == 0
+    provider.unsubscribe(second.append)
+    provider.unsubscribe(second.append)
+    assert provider.stops == 1
+
+
+def test_late_subscriber_gets_current_value():
+    provider = Counter()
+    provider.subscribe(lambda value: None)
+    provider.publish(42)
+    values = []
+    provider.subscribe(values.append)
+    assert values == [42]
+
+
+def test_value_published_by_start_is_delivered_once():
+    provider = Counter(initial="on")
+    values = []
+    provider.subscribe(values.append)
+    assert values == ["on"]
+
+
+def test_failing_subscriber_does_not_stop_the_others():
+    provider = Counter()
+    values = []
+
+    def fail(value):
+        raise RuntimeError(value)
+
+    provider.subscribe(fail)
+    provider.subscribe(values.append)
+    provider.publish(1)
+    assert values == [1]
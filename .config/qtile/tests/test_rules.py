@@ -0,0 +1,137 @@
+import re
+
+from custom.harness import Match
+from custom.rules import RuleIndex, WindowRules
+
+
+class XWindow:
+    """The X window of a client, like libqtile.backend.x11.xcbq.Window"""
+
+    def __init__(self, wm_class, wm_type, role):
+        self.wm_class = wm_class
+        self.wm_type = wm_type
+        self.role = role
+
+    def get_wm_class(self):
+        return tuple(self.wm_class or ())
+
+    def get_wm_type(self):
+        return self.wm_type
+
+    def get_wm_window_role(self):
+        return self.role
+
+
+class Client:
+    """A managed client, like libqtile.window.Window in qtile 0.17"""
+
+    def __init__(self, wm_class=None, name=None, wm_type="normal", role=None):
+        self.name = name
+        self.window = XWindow(wm_class, wm_type, role)
+
+    def match(self, match):
+        return match.compare(self)
+
+
+def scan(rules, client):
+    for target, match in rules:
+        if match.compare(client):
+            return target
+    return None
+
+
+def test_wm_class_matches_instance_and_class():
+    index = RuleIndex(
+        [("web", Match(wm_class="Navigator")), ("term", Match(wm_class="Alacritty"))]
+    )
+    assert index.lookup(Client(["Navigator", "firefox"])) == "web"
+    assert index.lookup(Client(["alacritty", "Alacritty"])) == "term"
+    assert index.lookup(Client(["xterm", "XTerm"])) is None
+
+
+def test_wm_class_pattern_matches_any_element():
+    index = RuleIndex([("office", Match(wm_class=re.compile("libreoffice")))])
+    assert index.lookup(Client(["libreoffice-writer", "LibreOffice"])) == "office"
+    assert index.lookup(Client(["soffice", "libreoffice-calc"])) == "office"
+
+
+def test_wm_instance_class_only_matches_instance():
+    index = RuleIndex([("chat", Match(wm_instance_class="discord"))])
+    assert index.lookup(Client(["discord", "Discord"])) == "chat"
+    assert index.lookup(Client(["Discord", "discord"])) is None
+
+
+def test_strings_are_include_matches():
+    index = RuleIndex(
+        [
+            ("docs", Match(wm_class="org.pwmt.zathura")),
+            ("float", Match(title="pinentry")),
+            ("float", Match(role="pop-up")),
+        ]
+    )
+    # A WM_CLASS string that is part of the wm_class rule.
+    assert index.lookup(Client(["zathura", "Zathura"])) == "docs"
+    # A title or role rule that is part of the value.
+    assert index.lookup(Client(["pinentry-gtk-2", "Pinentry"], name="pinentry-gtk-2"))
+    assert index.lookup(Client(["firefox", "firefox"], role="pop-up-window"))
+    assert index.lookup(Client(["pinentry", "Pinentry"], name="PIN")) is None
+
+
+def test_first_rule_wins():
+    index = RuleIndex(
+        [
+            ("first", Match(title="pinentry")),
+            ("second", Match(wm_class="pinentry")),
+        ]
+    )
+    assert index.lookup(Client(["pinentry", "Pinentry"], name="pinentry")) == "first"
+
+
+def test_same_result_as_scanning_the_rules():
+    rules = [
+        ("web", Match(wm_class="firefox")),
+        ("docs", Match(wm_class="org.pwmt.zathura")),
+        ("gimp", Match(title="GNU Image Manipulation Program")),
+        ("dialog", Match(wm_type="dialog")),
+        ("term", Match(wm_class=re.compile("[Aa]lacritty"))),
+        ("both", Match(wm_class="code-oss", title="Settings")),
+        ("func", Match(func=lambda client: client.name == "scratch")),
+        ("role", Match(role="browser")),
+    ]
+    clients = [
+        Client(["Navigator", "firefox"], name="Mozilla Firefox", role="browser"),
+        Client(["firefox", "firefox"], name="Library", wm_type="dialog"),
+        Client(["zathura", "Zathura"], name="paper.pdf"),
+        Client(["gimp", "Gimp"], name="GNU Image Manipulation Program"),
+        Client(["code-oss", "code-oss"], name="Settings - Code"),
+        Client(["Alacritty", "Alacritty"], name="scratch"),
+        Client(["xterm", "XTerm"], name="scratch"),
+        Client([], name=None, wm_type=None),
+        Client(["chromium", "Chromium"], name="New Tab", role="browser"),
+    ]
+    index = RuleIndex(rules)
+    for client in clients + clients:
+        assert index.lookup(client) == scan(rules, client)
+
+
+def test_window_rules():
+    workspaces = [{"name": "www", "matches": [Match(wm_class="firefox")]}]
+    rules = WindowRules(workspaces, [Match(wm_class="ssh-askpass")])
+    assert rules.group_for(Client(["Navigator", "firefox"])) == "www"
+    assert rules.floats(Client(["ssh-askpass", "Ssh-askpass"]))
+    assert not rules.floats(Client(["Navigator", "firefox"]))
+
+
+def test_floats_as_a_floating_rule():
+    rules = WindowRules([], [Match(title="branchdialog")])
+    rule = Match(func=rules.floats)
+    assert Client(["gitk", "Gitk"], name="branchdialog").match(rule)
+    assert not Client(["gitk", "Gitk"], name="gitk").match(rule)
+
+
+def test_lookup_errors_do_not_escape():
+    rules = WindowRules([{"name": "www", "matches": [Match(title="x")]}], [])
+    broken = Client(["a", "A"])
+    del broken.window
+    assert rules.group_for(broken) is None
+    assert not rules.floats(broken)
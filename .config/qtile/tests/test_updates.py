@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import sys
+from time import monotonic, time
+
+import pytest
+
+from custom.updates import UpdateCount, UpdateCounter, count_lines
+
+
+@pytest.fixture
+def fake_bin(tmp_path, monkeypatch):
+    """Install fake executables in a directory put first on PATH"""
+    directory = tmp_path / "bin"
+    directory.mkdir()
+    monkeypatch.setenv("PATH", "%s:%s" % (directory, os.environ["PATH"]))
+
+    def install(name, output="", exit_status=0, delay=0):
+        path = directory / name
+        path.write_text(
+            "#!%s\nimport sys, time\ntime.sleep(%r)\nsys.stdout.write(%r)\nsys.exit(%d)\n"
+            % (sys.executable, delay, output, exit_status)
+        )
+        os.chmod(path, 0o755)
+
+    return install
+
+
+@pytest.fixture
+def pacman_db(tmp_path):
+    path = tmp_path / "local"
+    path.mkdir()
+    return path
+
+
+def counter(tmp_path, pacman_db, **kwargs):
+    return UpdateCounter(
+        cache_path=str(tmp_path / "cache" / "updates.json"),
+        pacman_db=str(pacman_db),
+        **kwargs
+    )
+
+
+def test_counts_are_published_and_cached(tmp_path, pacman_db, fake_bin):
+    fake_bin("checkupdates", "linux 6.1-1 -> 6.2-1\nvim 9.0-1 -> 9.0-2\n")
+    fake_bin("yay", "spotify 1.1-1 -> 1.2-1\n")
+    provider = counter(tmp_path, pacman_db)
+    asyncio.run(provider.refresh())
+    assert provider.value == (2, 1)
+
+    with open(provider.cache_path) as f:
+        cache = json.load(f)
+    assert (cache["repo"], cache["aur"]) == (2, 1)
+    assert cache["db_mtime"] == os.stat(pacman_db).st_mtime
+    assert time() - cache["timestamp"] < 5
+
+
+def test_nothing_to_update_exit_statuses(tmp_path, pacman_db, fake_bin):
+    # checkupdates exits with 2 and yay -Qum with 1 when all is up to date.
+    fake_bin("checkupdates", exit_status=2)
+    fake_bin("yay", exit_status=1)
+    provider = counter(tmp_path, pacman_db)
+    provider.repo, provider.aur = 4, 1
+    asyncio.run(provider.refresh())
+    assert provider.value == (0, 0)
+    assert os.path.exists(provider.cache_path)
+
+
+def test_failed_checks_keep_the_counts(tmp_path, pacman_db, fake_bin):
+    fake_bin("checkupdates", "vim 9.0-1 -> 9.0-2\n", exit_status=1)
+    fake_bin("yay", exit_status=3)
+    provider = counter(tmp_path, pacman_db, ttl=1800, check_interval=60)
+    provider.repo, provider.aur = 4, 1
+    asyncio.run(provider.refresh())
+    assert provider.value == (4, 1)
+    assert not os.path.exists(provider.cache_path)
+    # Retried after five checks instead of a whole ttl.
+    assert provider.timestamp == pytest.approx(time() - 1800 + 300, abs=5)
+
+
+def test_one_failed_check_updates_the_other(tmp_path, pacman_db, fake_bin):
+    fake_bin("checkupdates", "vim 9.0-1 -> 9.0-2\n")
+    fake_bin("yay", exit_status=3)
+    provider = counter(tmp_path, pacman_db)
+    provider.aur = 7
+    asyncio.run(provider.refresh())
+    assert provider.value == (1, 7)
+
+
+def test_checks_run_side_by_side(tmp_path, pacman_db, fake_bin):
+    fake_bin("checkupdates", "a 1 -> 2\n", delay=0.5)
+    fake_bin("yay", "b 1 -> 2\n", delay=0.5)
+    provider = counter(tmp_path, pacman_db)
+    start = monotonic()
+    asyncio.run(provider.refresh())
+    assert monotonic() - start < 0.9
+    assert provider.value == (1, 1)
+
+
+def refreshes(provider):
+    calls = []
+
+    async def refresh():
+        calls.append(True)
+
+    async def main():
+        provider.refresh = refresh
+        provider.start()
+        await asyncio.sleep(0)
+        provider.stop()
+
+    asyncio.run(main())
+    return len(calls)
+
+
+def write_cache(provider, **fields):
+    cache = {"repo": 3, "aur": 2, "timestamp": time(), "db_mtime": None}
+    cache.update(fields)
+    os.makedirs(os.path.dirname(provider.cache_path))
+    with open(provider.cache_path, "w") as f:
+        json.dump(cache, f)
+
+
+def test_fresh_cache_is_used_without_checking(tmp_path, pacman_db):
+    provider = counter(tmp_path, pacman_db)
+    write_cache(provider, db_mtime=os.stat(pacman_db).st_mtime)
+    assert refreshes(provider) == 0
+    assert provider.value == (3, 2)
+
+
+def test_pacman_db_change_invalidates_the_cache(tmp_path, pacman_db):
+    provider = counter(tmp_path, pacman_db)
+    write_cache(provider, db_mtime=os.stat(pacman_db).st_mtime - 60)
+    assert refreshes(provider) == 1
+    assert provider.value == (3, 2)
+
+
+def test_expired_cache_is_checked_again(tmp_path, pacman_db):
+    provider = counter(tmp_path, pacman_db, ttl=1800)
+    write_cache(
+        provider, db_mtime=os.stat(pacman_db).st_mtime, timestamp=time() - 1801
+    )
+    assert refreshes(provider) == 1
+
+
+def test_missing_cache_is_checked(tmp_path, pacman_db):
+    provider = counter(tmp_path, pacman_db)
+    assert refreshes(provider) == 1
+    assert provider.value is None
+
+
+def test_count_lines():
+    assert count_lines("") == 0
+    assert count_lines("linux 6.1-1 -> 6.2-1\n\nvim 9.0-1 -> 9.0-2\n") == 2
+
+
+def test_format():
+    widget = UpdateCount(provider=UpdateCounter(), no_update_string="ok")
+    assert widget.format((0, 0)) == "ok"
+    assert widget.format((2, 1)) == "Updates: 3"
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+from time import monotonic
+
+import pytest
+
+from custom.volume import Mixer, parse_level
+
+SGET = """Simple mixer control 'Master',0
+  Capabilities: pvolume pswitch pswitch-joined
+  Playback channels: Front Left - Front Right
+  Limits: Playback 0 - 65536
+  Mono:
+  Front Left: Playback 26214 [40%] [on]
+  Front Right: Playback 26214 [40%] [on]
+"""
+
+
+def fake_amixer(tmp_path, output):
+    path = tmp_path / "amixer"
+    path.write_text("#!%s\nprint(%r)\n" % (sys.executable, output))
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def test_parse_level():
+    assert parse_level(SGET) == (40, False)
+    assert parse_level(SGET.replace("[on]", "[off]")) == (40, True)
+    assert parse_level("  Mono: Playback [75%]") == (75, False)
+    with pytest.raises(ValueError):
+        parse_level("amixer: Unable to find simple control 'Master',0")
+
+
+def test_query_publishes_level(tmp_path):
+    mixer = Mixer(amixer=fake_amixer(tmp_path, SGET))
+    asyncio.run(mixer.query())
+    assert mixer.value == (40, False)
+    assert mixer.volume == 40
+
+
+def test_query_keeps_pending_change(tmp_path):
+    mixer = Mixer(amixer=fake_amixer(tmp_path, SGET), frame=0.01)
+    mixer.volume = 50
+    mixer._delta = 5
+
+    async def main():
+        await mixer.query()
+        return mixer._query_handle is not None
+
+    assert asyncio.run(main())
+    assert (mixer.volume, mixer._delta) == (50, 5)
+
+
+def test_query_started_right_after_a_write_is_ignored(tmp_path):
+    mixer = Mixer(amixer=fake_amixer(tmp_path, SGET), frame=0.5)
+    mixer.volume = 55
+    mixer._last_write = monotonic()
+
+    async def main():
+        await mixer.query()
+        mixer._query_handle.cancel()
+
+    asyncio.run(main())
+    assert mixer.volume == 55
+
+
+def test_events_of_other_sinks_are_ignored():
+    mixer = Mixer()
+    mixer.default_sink = "3"
+
+    async def main():
+        mixer._on_event("Event 'change' on sink #4\n")
+        ignored = mixer._query_handle is None
+        mixer._on_event("Event 'change' on sink #3\n")
+        return ignored, mixer._query_handle is not None
+
+    assert asyncio.run(main()) == (True, True)
@@ -0,0 +1,78 @@
+from custom.windowname import WindowName
+
+
+class XWindow:
+    def __init__(self, wm_class):
+        self.wm_class = wm_class
+
+    def get_wm_class(self):
+        return tuple(self.wm_class)
+
+
+class Window:
+    """A managed client, like libqtile.window.Window in qtile 0.17"""
+
+    def __init__(self, wm_class, name="", wid=1):
+        self.window = XWindow(wm_class)
+        self.name = name
+        self.wid = wid
+
+
+class FakeTheme:
+    def __init__(self, cached=None, pending=False):
+        self._cached = cached
+        self._pending = pending
+        self.asked = []
+
+    def cached(self, names, size):
+        self.asked.append(names)
+        return self._cached
+
+    def pending(self, names, size):
+        return self._pending
+
+    def surface(self, names, size):
+        self.asked.append(names)
+
+
+class FakeQtile:
+    def __init__(self):
+        self.calls = []
+
+    def call_soon(self, func):
+        self.calls.append(func)
+
+
+def window_name(theme):
+    widget = WindowName(icon_theme=theme, icon_size=20)
+    widget.qtile = FakeQtile()
+    return widget
+
+
+def test_icon_names_are_class_then_instance():
+    widget = window_name(FakeTheme())
+    assert widget.icon_names(Window(["Navigator", "firefox"])) == [
+        "firefox",
+        "Navigator",
+    ]
+    assert widget.icon_names(Window([])) == []
+
+
+def test_cached_icon_is_found_without_loading():
+    theme = FakeTheme(cached="surface")
+    widget = window_name(theme)
+    assert widget.find_icon(Window(["alacritty", "Alacritty"])) == "surface"
+    assert theme.asked == [["Alacritty", "alacritty"]]
+    assert widget.qtile.calls == []
+
+
+def test_pending_icon_is_loaded_outside_the_draw():
+    theme = FakeTheme(pending=True)
+    widget = window_name(theme)
+    assert widget.find_icon(Window(["gimp", "Gimp"])) is None
+    assert len(widget.qtile.calls) == 1
+
+
+def test_no_icon_without_window_or_theme():
+    assert window_name(FakeTheme()).find_icon(None) is None
+    assert window_name(None).find_icon(Window(["a", "A"])) is None